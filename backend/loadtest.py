@@ -0,0 +1,109 @@
+"""
+Load test the analysis pipelines against an OpenAI-compatible server.
+
+    MOCK_LLM_LATENCY_MEDIAN_S=3 MOCK_LLM_429_RATE=0.02 uvicorn backend.mock_llm_server:app --port 8100
+    LLM_BASE_URL=http://127.0.0.1:8100/v1 python -m backend.loadtest <job_id> [<job_id> ...]
+
+Runs run_analysis, run_global_analysis and run_section_analysis in-process on
+existing jobs (uploads/<job_id>), all jobs of a stage concurrently, and
+prints pages/minute per stage, peak memory, the scheduler, retry and
+event-loop metrics and each job's LLM telemetry totals. Results and statuses are persisted like a run started
+from the UI, so stop the backend first.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+
+from dotenv import load_dotenv
+
+# Service modules read their tuning knobs from the environment at import time.
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+from .services import cpu_pool, doc_pool, job_store, llm_telemetry, loop_monitor, paired_sections  # noqa: E402
+from .services.analysis_pipeline import run_analysis  # noqa: E402
+from .services.global_analysis_pipeline import run_global_analysis  # noqa: E402
+from .services.llm_retry import retry_metrics  # noqa: E402
+from .services.llm_scheduler import scheduler_metrics  # noqa: E402
+from .services.section_analysis_pipeline import run_section_analysis  # noqa: E402
+
+STAGES = ("layout", "global", "section")
+
+
+def _page_pairs(job_id: str) -> int:
+    job = job_store.get_job(job_id)
+    return sum(max(p.page_count_reference, p.page_count_test) for p in job.pairs)
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+async def _run_stage(stage: str, job_ids: list[str], mode: str, bypass_cache: bool) -> None:
+    if stage == "layout":
+        runs = [run_analysis(job_id, mode=mode, bypass_cache=bypass_cache) for job_id in job_ids]
+    elif stage == "global":
+        runs = [run_global_analysis(job_id, bypass_cache=bypass_cache) for job_id in job_ids]
+    else:
+        runs = [run_section_analysis(job_id, bypass_cache=bypass_cache) for job_id in job_ids]
+    pages = sum(_page_pairs(job_id) for job_id in job_ids)
+    start = time.monotonic()
+    await asyncio.gather(*runs)
+    elapsed = time.monotonic() - start
+    print(
+        f"{stage:>8}: {pages} page pairs in {elapsed:.1f}s "
+        f"= {pages / elapsed * 60 if elapsed else 0:.1f} pages/min"
+    )
+
+
+async def _run(job_ids: list[str], stages: list[str], mode: str, bypass_cache: bool) -> dict:
+    cpu_pool.start()
+    loop_monitor.start()
+    try:
+        for stage in stages:
+            await _run_stage(stage, job_ids, mode, bypass_cache)
+        return {
+            "llm_scheduler": scheduler_metrics(),
+            "llm_retries": retry_metrics(),
+            "event_loop": loop_monitor.loop_metrics(),
+            "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+            "telemetry": {job_id: llm_telemetry.job_telemetry(job_id)["total"] for job_id in job_ids},
+        }
+    finally:
+        await loop_monitor.stop()
+        await paired_sections.close_client()
+        # Wait for the workers to exit so RUSAGE_CHILDREN covers them
+        cpu_pool.shutdown(wait=True)
+        doc_pool.close_all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("job_ids", nargs="+")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated: layout,global,section")
+    parser.add_argument("--mode", default="paired", help="section detection mode (paired, single, raw)")
+    parser.add_argument("--use-cache", action="store_true", help="allow LLM response cache hits")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    missing = [job_id for job_id in args.job_ids if job_store.get_job(job_id) is None]
+    if missing:
+        parser.error(f"unknown jobs: {', '.join(missing)}")
+    if not os.environ.get("LLM_BASE_URL"):
+        print("warning: LLM_BASE_URL is not set; requests go to the configured provider")
+
+    report = asyncio.run(_run(args.job_ids, stages, args.mode, bypass_cache=not args.use_cache))
+    # cpu_pool.shutdown(wait=True) has reaped the worker processes, so their peak is known now
+    report["peak_rss_workers_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,30 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import os
+from contextlib import asynccontextmanager
 
-from .routers import analysis, jobs
+from dotenv import load_dotenv
 
-app = FastAPI(title="PDF Compare API")
+# Service modules read their tuning knobs from the environment at import time.
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+
+from .routers import analysis, jobs, metrics  # noqa: E402
+from .services import cpu_pool, doc_pool, loop_monitor, paired_sections  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cpu_pool.start()
+    loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    await paired_sections.close_client()
+    cpu_pool.shutdown()
+    doc_pool.close_all()
+
+
+app = FastAPI(title="PDF Compare API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,3 +35,4 @@ app.add_middleware(
 
 app.include_router(jobs.router)
 app.include_router(analysis.router)
+app.include_router(metrics.router)
@@ -0,0 +1,260 @@
+"""
+OpenAI-compatible mock LLM server for offline load tests.
+
+    uvicorn backend.mock_llm_server:app --port 8100
+    LLM_BASE_URL=http://127.0.0.1:8100/v1   # in the backend's .env
+
+Serves POST /v1/chat/completions (plain and streamed) with:
+
+  * latency: log-normal time to first token (MOCK_LLM_LATENCY_MEDIAN_S,
+    MOCK_LLM_LATENCY_SIGMA, capped at MOCK_LLM_LATENCY_MAX_S) plus output
+    tokens at MOCK_LLM_TOKENS_PER_S (0 = instant);
+  * errors: random 429s (MOCK_LLM_429_RATE) and 500s (MOCK_LLM_500_RATE),
+    and 429s once MOCK_LLM_RPM requests per minute or MOCK_LLM_MAX_CONCURRENCY
+    concurrent requests are exceeded; 429s carry MOCK_LLM_RETRY_AFTER_S;
+  * responses: replayed from MOCK_LLM_REPLAY_DIR by request fingerprint
+    (recorded with LLM_RECORD_DIR, see services/llm_replay), otherwise
+    synthesized deterministically from the request's JSON schema.
+
+GET /mock/stats reports request counts, errors and concurrency.
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .services.llm_replay import replay_key
+
+MOCK_LLM_LATENCY_MEDIAN_S = float(os.environ.get("MOCK_LLM_LATENCY_MEDIAN_S", "2.0"))
+MOCK_LLM_LATENCY_SIGMA = float(os.environ.get("MOCK_LLM_LATENCY_SIGMA", "0.5"))
+MOCK_LLM_LATENCY_MAX_S = float(os.environ.get("MOCK_LLM_LATENCY_MAX_S", "60"))
+MOCK_LLM_TOKENS_PER_S = float(os.environ.get("MOCK_LLM_TOKENS_PER_S", "0"))
+MOCK_LLM_429_RATE = float(os.environ.get("MOCK_LLM_429_RATE", "0"))
+MOCK_LLM_500_RATE = float(os.environ.get("MOCK_LLM_500_RATE", "0"))
+MOCK_LLM_RPM = int(os.environ.get("MOCK_LLM_RPM", "0"))
+MOCK_LLM_MAX_CONCURRENCY = int(os.environ.get("MOCK_LLM_MAX_CONCURRENCY", "0"))
+MOCK_LLM_RETRY_AFTER_S = float(os.environ.get("MOCK_LLM_RETRY_AFTER_S", "1"))
+MOCK_LLM_REPLAY_DIR = os.environ.get("MOCK_LLM_REPLAY_DIR", "").strip()
+
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 24
+
+app = FastAPI(title="Mock LLM")
+
+_requests: deque[float] = deque()
+_stats: dict[str, Any] = {
+    "requests": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "rate_limited": 0,
+    "server_errors": 0,
+    "replayed": 0,
+    "synthesized": 0,
+    "streamed": 0,
+}
+
+
+# ---------------------------------------------------------------------------
+# Responses
+# ---------------------------------------------------------------------------
+
+def _synthesize(schema: dict[str, Any], rng: random.Random, field: str = "", index: int = 0) -> Any:
+    """A value matching a (strict, OpenAI-subset) JSON schema."""
+    kind = schema.get("type")
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if kind == "object":
+        return {
+            name: _synthesize(sub, rng, name, index)
+            for name, sub in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        items = schema.get("items", {})
+        if schema.get("minItems") == schema.get("maxItems") == 4 and items.get("type") == "number":
+            # A region: [x0, y0, x1, y1] on a page-sized canvas
+            x0, y0 = rng.uniform(0, 400), rng.uniform(0, 600)
+            return [round(v, 1) for v in (x0, y0, x0 + rng.uniform(50, 200), y0 + rng.uniform(20, 200))]
+        low = schema.get("minItems", 1)
+        count = rng.randint(low, max(low, min(schema.get("maxItems", 5), 5)))
+        return [_synthesize(items, rng, field, i) for i in range(count)]
+    if kind in ("number", "integer"):
+        return rng.randint(0, 100)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "string":
+        # Depends on position only, so e.g. ref and test section names match up
+        return f"Mock {field} {index + 1}"
+    return None
+
+
+def _content_for(body: dict[str, Any], seed: str) -> str:
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    rng = random.Random(seed)
+    if schema:
+        return json.dumps(_synthesize(schema, rng))
+    if response_format.get("type") == "json_object":
+        return "{}"
+    return "Mock response. " * rng.randint(5, 40)
+
+
+def _prompt_tokens(body: dict[str, Any]) -> int:
+    chars = 0
+    images = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                chars += len(part.get("text", ""))
+    return math.ceil(chars / CHARS_PER_TOKEN) + images * 1000
+
+
+def _completion(body: dict[str, Any]) -> dict[str, Any]:
+    key = replay_key(body)
+    if MOCK_LLM_REPLAY_DIR:
+        path = Path(MOCK_LLM_REPLAY_DIR) / f"{key}.json"
+        if path.exists():
+            _stats["replayed"] += 1
+            return json.loads(path.read_text(encoding="utf-8"))
+    _stats["synthesized"] += 1
+    content = _content_for(body, key)
+    prompt_tokens = _prompt_tokens(body)
+    completion_tokens = math.ceil(len(content) / CHARS_PER_TOKEN)
+    return {
+        "id": f"chatcmpl-mock-{key[:16]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "system_fingerprint": "mock",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _latency(completion: dict[str, Any]) -> tuple[float, float]:
+    """(time to first token, generation time) for a response."""
+    ttft = random.lognormvariate(math.log(MOCK_LLM_LATENCY_MEDIAN_S), MOCK_LLM_LATENCY_SIGMA)
+    ttft = min(MOCK_LLM_LATENCY_MAX_S, ttft)
+    generation = 0.0
+    if MOCK_LLM_TOKENS_PER_S > 0:
+        tokens = (completion.get("usage") or {}).get("completion_tokens", 0)
+        generation = tokens / MOCK_LLM_TOKENS_PER_S
+    return ttft, generation
+
+
+# ---------------------------------------------------------------------------
+# Errors
+# ---------------------------------------------------------------------------
+
+def _error(status: int, message: str, kind: str) -> JSONResponse:
+    headers = {}
+    if status == 429:
+        headers = {
+            "retry-after": str(math.ceil(MOCK_LLM_RETRY_AFTER_S)),
+            "retry-after-ms": str(int(MOCK_LLM_RETRY_AFTER_S * 1000)),
+        }
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": kind, "code": str(status)}},
+        headers=headers,
+    )
+
+
+def _injected_error() -> JSONResponse | None:
+    now = time.monotonic()
+    while _requests and _requests[0] <= now - 60:
+        _requests.popleft()
+    if MOCK_LLM_RPM and len(_requests) >= MOCK_LLM_RPM:
+        _stats["rate_limited"] += 1
+        return _error(429, "Rate limit exceeded (requests per minute)", "rate_limit_exceeded")
+    if MOCK_LLM_MAX_CONCURRENCY and _stats["in_flight"] >= MOCK_LLM_MAX_CONCURRENCY:
+        _stats["rate_limited"] += 1
+        return _error(429, "Too many concurrent requests", "rate_limit_exceeded")
+    roll = random.random()
+    if roll < MOCK_LLM_429_RATE:
+        _stats["rate_limited"] += 1
+        return _error(429, "Injected rate limit", "rate_limit_exceeded")
+    if roll < MOCK_LLM_429_RATE + MOCK_LLM_500_RATE:
+        _stats["server_errors"] += 1
+        return _error(500, "Injected server error", "server_error")
+    _requests.append(now)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Routes
+# ---------------------------------------------------------------------------
+
+async def _stream(body: dict[str, Any], completion: dict[str, Any], ttft: float, generation: float):
+    try:
+        await asyncio.sleep(ttft)
+        content = completion["choices"][0]["message"]["content"] or ""
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+        base = {k: completion[k] for k in ("id", "created", "model", "system_fingerprint")}
+        base["object"] = "chat.completion.chunk"
+        for i, piece in enumerate(pieces):
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+            await asyncio.sleep(generation / len(pieces))
+        finish = completion["choices"][0].get("finish_reason") or "stop"
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish}]})}\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({**base, 'choices': [], 'usage': completion.get('usage')})}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        _stats["in_flight"] -= 1
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(request: Request, deployment: str | None = None):
+    body = await request.json()
+    _stats["requests"] += 1
+    error = _injected_error()
+    if error is not None:
+        return error
+
+    completion = _completion(body)
+    ttft, generation = _latency(completion)
+    _stats["in_flight"] += 1
+    _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+    if body.get("stream"):
+        _stats["streamed"] += 1
+        return StreamingResponse(_stream(body, completion, ttft, generation), media_type="text/event-stream")
+    try:
+        await asyncio.sleep(ttft + generation)
+    finally:
+        _stats["in_flight"] -= 1
+    return completion
+
+
+@app.get("/mock/stats")
+async def stats() -> dict[str, Any]:
+    now = time.monotonic()
+    while _requests and _requests[0] <= now - 60:
+        _requests.popleft()
+    return {**_stats, "accepted_last_minute": len(_requests)}
+
@@ -33,12 +33,14 @@ class PdfPair(BaseModel):
     status: PairStatus = PairStatus.pending
     page_count_reference: int
     page_count_test: int
+    identical_pages: list[int] | None = None  # None until the identity pre-pass has run
 
 
 class CheckStatus(str, Enum):
     ok = "ok"
     maybe = "maybe"
     issue = "issue"
+    skipped = "skipped"  # not checked; the test page is identical to the reference
 
 
 class GlobalCheckResult(BaseModel):
@@ -67,6 +69,7 @@ class SectionCheckResult(BaseModel):
 class SectionPageAnalysisResult(BaseModel):
     page_number: int
     results: list[SectionCheckResult]
+    partial: bool = False  # still streaming; replaced by the final result
 
 
 class Section(BaseModel):
@@ -81,6 +84,7 @@ class PageAnalysis(BaseModel):
     page_width: float
     page_height: float
     sections: list[Section]
+    partial: bool = False  # raw regions from a streaming layout response
 
 
 class JobMetadata(BaseModel):
@@ -100,3 +104,16 @@ class JobMetadata(BaseModel):
     section_analysis_status: AnalysisStatus = AnalysisStatus.idle
     section_analysis_progress: int = 0
     section_analysis_total: int = 0
+    batch_status: AnalysisStatus = AnalysisStatus.idle
+    batch_ids: list[str] = []
+    batch_error: str | None = None
+    identical_pages: int = 0
+    # Identical pages: the reference layout is mirrored onto the test page
+    # (analysis_mirrored); analysis_skipped counts those laid out without a
+    # GPT call (stored reference layout). The other stages never call GPT
+    # for identical pages; section_analysis_skipped counts only those with
+    # matched sections, whose checks were skipped.
+    analysis_mirrored: int = 0
+    analysis_skipped: int = 0
+    global_analysis_skipped: int = 0
+    section_analysis_skipped: int = 0
@@ -0,0 +1,138 @@
+"""
+Benchmark for the page-map extraction backends.
+
+    python -m backend.page_map_benchmark [<pdf or directory> ...] [--max-pages N]
+
+Extracts every page (default: every unique PDF under uploads/) with both
+backends, pdfplumber (reference) and pymupdf (PAGE_MAP_BACKEND=pymupdf), and
+prints per-page extraction and merge times, raw element counts per type, and
+merged element counts with the pages whose merged element count differs.
+
+The parity checks with pass/fail tolerances are in
+tests/test_page_map_parity.py.
+"""
+
+import argparse
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+import fitz
+import pdfplumber
+
+from .services.page_map import ELEMENT_TYPES, _build_page_map, _extract_page_elements, _extract_page_elements_fitz
+from .services.pdf_utils import file_hash
+
+UPLOADS_DIR = Path(__file__).resolve().parent / "uploads"
+
+
+def _pdf_files(paths: list[str]) -> list[Path]:
+    """PDFs under the given files/directories, one per distinct content."""
+    found: dict[str, Path] = {}
+    for path in map(Path, paths):
+        candidates = sorted(path.rglob("*.pdf")) if path.is_dir() else [path]
+        for candidate in candidates:
+            found.setdefault(file_hash(str(candidate)), candidate)
+    return list(found.values())
+
+
+def _label(path: Path) -> str:
+    try:
+        return str(path.relative_to(UPLOADS_DIR))
+    except ValueError:
+        return str(path)
+
+
+def _raw_counts(raw: dict) -> Counter:
+    return Counter(ELEMENT_TYPES[code] for code in raw["elements"].types)
+
+
+def _merged_counts(page_map: dict) -> Counter:
+    return Counter(element["type"] for element in page_map["elements"])
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _compare_file(path: Path, max_pages: int | None, totals: dict) -> None:
+    with pdfplumber.open(str(path)) as pdf, fitz.open(str(path)) as doc:
+        page_count = min(len(doc), max_pages or len(doc))
+        for page_num in range(1, page_count + 1):
+            page = pdf.pages[page_num - 1]
+            try:
+                plumber_raw, plumber_ms = _timed(_extract_page_elements, page)
+            finally:
+                page.close()
+            fitz_raw, fitz_ms = _timed(_extract_page_elements_fitz, doc[page_num - 1])
+            plumber_map, plumber_merge_ms = _timed(_build_page_map, plumber_raw, page_num)
+            fitz_map, fitz_merge_ms = _timed(_build_page_map, fitz_raw, page_num)
+
+            totals["pages"] += 1
+            totals["ms"]["pdfplumber"].append(plumber_ms)
+            totals["ms"]["pymupdf"].append(fitz_ms)
+            totals["merge_ms"]["pdfplumber"].append(plumber_merge_ms)
+            totals["merge_ms"]["pymupdf"].append(fitz_merge_ms)
+            totals["raw"]["pdfplumber"].update(_raw_counts(plumber_raw))
+            totals["raw"]["pymupdf"].update(_raw_counts(fitz_raw))
+            plumber_merged, fitz_merged = _merged_counts(plumber_map), _merged_counts(fitz_map)
+            totals["merged"]["pdfplumber"].update(plumber_merged)
+            totals["merged"]["pymupdf"].update(fitz_merged)
+            if sum(plumber_merged.values()) != sum(fitz_merged.values()):
+                totals["merged_diff_pages"].append(
+                    f"{_label(path)} p{page_num}: {sum(plumber_merged.values())} vs {sum(fitz_merged.values())}"
+                )
+
+
+def _ms_summary(values: list[float]) -> str:
+    if not values:
+        return "-"
+    p95 = sorted(values)[max(int(len(values) * 0.95) - 1, 0)]
+    return f"mean {statistics.mean(values):7.1f} ms  p95 {p95:7.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[str(UPLOADS_DIR)])
+    parser.add_argument("--max-pages", type=int, default=None, help="pages per file (default: all)")
+    args = parser.parse_args()
+
+    files = _pdf_files(args.paths)
+    if not files:
+        parser.error("no PDF files found")
+    totals: dict = {
+        "pages": 0, "merged_diff_pages": [],
+        "ms": {"pdfplumber": [], "pymupdf": []}, "merge_ms": {"pdfplumber": [], "pymupdf": []},
+        "raw": {"pdfplumber": Counter(), "pymupdf": Counter()},
+        "merged": {"pdfplumber": Counter(), "pymupdf": Counter()},
+    }
+    for path in files:
+        _compare_file(path, args.max_pages, totals)
+
+    print(f"{len(files)} files, {totals['pages']} pages\n")
+    print("per-page time")
+    for backend in ("pdfplumber", "pymupdf"):
+        print(f"  {backend:>10} extract: {_ms_summary(totals['ms'][backend])}")
+        print(f"  {backend:>10} merge:   {_ms_summary(totals['merge_ms'][backend])}")
+
+    print("\nraw elements        pdfplumber    pymupdf")
+    for kind in ("text", "rect", "line", "curve", "image"):
+        reference, candidate = totals["raw"]["pdfplumber"][kind], totals["raw"]["pymupdf"][kind]
+        print(f"  {kind:<16} {reference:>10} {candidate:>10}")
+
+    print("\nmerged elements     pdfplumber    pymupdf")
+    for kind in ELEMENT_TYPES:
+        reference, candidate = totals["merged"]["pdfplumber"][kind], totals["merged"]["pymupdf"][kind]
+        if reference or candidate:
+            print(f"  {kind:<16} {reference:>10} {candidate:>10}")
+    diff_pages = totals["merged_diff_pages"]
+    print(f"  pages with a different merged element count: {len(diff_pages)}/{totals['pages']}")
+    for line in diff_pages:
+        print(f"    {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,10 @@ from ..services.general_instructions import (
 )
 from ..services import analysis_store, global_analysis_store, job_store, section_analysis_store
 from ..services.analysis_pipeline import run_analysis
+from ..services.batch_pipeline import BATCH_MODES, run_batch_analysis
 from ..services.global_analysis import validate_global_template_file
 from ..services.global_analysis_pipeline import run_global_analysis
+from ..services.llm_batch import BACKENDS
 from ..services.section_analysis_pipeline import run_section_analysis
 from ..services.section_instructions import (
     validate_section_instructions_template,
@@ -26,14 +28,49 @@ router = APIRouter(prefix="/api")
 
 
 @router.post("/jobs/{job_id}/compare", status_code=202)
-async def start_comparison(job_id: str, mode: str = Query(default="paired")) -> dict:
+async def start_comparison(
+    job_id: str,
+    mode: str = Query(default="paired"),
+    bypass_cache: bool = Query(default=False),
+) -> dict:
     job = job_store.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     if job.analysis_status == "running":
         raise HTTPException(status_code=409, detail="Analysis already running")
+    if job.batch_status == "running":
+        raise HTTPException(status_code=409, detail="Batch analysis running")
+
+    asyncio.create_task(run_analysis(job_id, mode=mode, bypass_cache=bypass_cache))
+    return {"status": "started", "job_id": job_id}
+
+
+@router.post("/jobs/{job_id}/batch-analyze", status_code=202)
+async def start_batch_analysis(
+    job_id: str,
+    mode: str = Query(default="paired"),
+    backend: str | None = Query(default=None),
+    bypass_cache: bool = Query(default=False),
+) -> dict:
+    """Run section detection, global and section analysis through the batch API."""
+    job = job_store.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if "running" in (
+        job.analysis_status, job.global_analysis_status, job.section_analysis_status, job.batch_status,
+    ):
+        raise HTTPException(status_code=409, detail="Analysis already running")
+    if mode not in BATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Batch mode must be one of {', '.join(BATCH_MODES)}")
+    if backend is not None and backend not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown batch backend: {backend}")
+    try:
+        validate_global_template_file()
+        validate_section_instructions_template()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    asyncio.create_task(run_analysis(job_id, mode=mode))
+    asyncio.create_task(run_batch_analysis(job_id, mode=mode, backend=backend, bypass_cache=bypass_cache))
     return {"status": "started", "job_id": job_id}
 
 
@@ -56,18 +93,20 @@ async def get_sections(
 
 
 @router.post("/jobs/{job_id}/global-analyze", status_code=202)
-async def start_global_analysis(job_id: str) -> dict:
+async def start_global_analysis(job_id: str, bypass_cache: bool = Query(default=False)) -> dict:
     job = job_store.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     if job.global_analysis_status == "running":
         raise HTTPException(status_code=409, detail="Global analysis already running")
+    if job.batch_status == "running":
+        raise HTTPException(status_code=409, detail="Batch analysis running")
     try:
         validate_global_template_file()
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    asyncio.create_task(run_global_analysis(job_id))
+    asyncio.create_task(run_global_analysis(job_id, bypass_cache=bypass_cache))
     return {"status": "started", "job_id": job_id}
 
 
@@ -90,7 +129,7 @@ async def get_global_analysis(
 
 
 @router.post("/jobs/{job_id}/section-analyze", status_code=202)
-async def start_section_analysis(job_id: str) -> dict:
+async def start_section_analysis(job_id: str, bypass_cache: bool = Query(default=False)) -> dict:
     job = job_store.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -98,12 +137,14 @@ async def start_section_analysis(job_id: str) -> dict:
         raise HTTPException(status_code=409, detail="Section detection must complete first")
     if job.section_analysis_status == "running":
         raise HTTPException(status_code=409, detail="Section analysis already running")
+    if job.batch_status == "running":
+        raise HTTPException(status_code=409, detail="Batch analysis running")
     try:
         validate_section_instructions_template()
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    asyncio.create_task(run_section_analysis(job_id))
+    asyncio.create_task(run_section_analysis(job_id, bypass_cache=bypass_cache))
     return {"status": "started", "job_id": job_id}
 
 
@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 from uuid import uuid4
 
@@ -5,7 +6,7 @@ from fastapi import APIRouter, File, Form, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 
 from ..models import JobMetadata
-from ..services import job_store
+from ..services import job_store, llm_telemetry, reference_artifacts
 
 router = APIRouter(prefix="/api")
 
@@ -41,7 +42,7 @@ async def create_job(
         dest.write_bytes(content)
         test_filenames.append(filename)
 
-    job = job_store.create_job(
+    job = await job_store.create_job(
         job_id=job_id,
         report_type=report_type,
         reference_dir=str(reference_dir),
@@ -49,6 +50,8 @@ async def create_job(
         reference_filenames=reference_filenames,
         test_filenames=test_filenames,
     )
+    # Page maps and renders of new reference files are ready before analysis starts
+    asyncio.create_task(reference_artifacts.warm_up(job, str(reference_dir)))
 
     return job
 
@@ -66,6 +69,13 @@ async def get_job(job_id: str) -> JobMetadata:
     return job
 
 
+@router.get("/jobs/{job_id}/telemetry")
+async def get_job_telemetry(job_id: str) -> dict:
+    if job_store.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return llm_telemetry.job_telemetry(job_id)
+
+
 @router.get("/jobs/{job_id}/files/{category}/{filename}")
 async def get_file(job_id: str, category: str, filename: str) -> FileResponse:
     if category not in ("reference", "test"):
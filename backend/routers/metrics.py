@@ -0,0 +1,58 @@
+from fastapi import APIRouter
+
+from ..services.image_policy import payload_metrics
+from ..services.layout_templates import template_metrics
+from ..services.llm_cache import cache_metrics
+from ..services.llm_retry import retry_metrics
+from ..services.llm_scheduler import scheduler_metrics
+from ..services.llm_stream import stream_metrics
+from ..services.loop_monitor import loop_metrics
+from ..services.page_map_encoding import encoding_metrics
+from ..services.reference_artifacts import artifact_metrics
+
+router = APIRouter(prefix="/api")
+
+
+@router.get("/metrics/payloads")
+async def get_payload_metrics() -> dict:
+    return payload_metrics()
+
+
+@router.get("/metrics/event-loop")
+async def get_event_loop_metrics() -> dict:
+    return loop_metrics()
+
+
+@router.get("/metrics/page-map-encoding")
+async def get_page_map_encoding_metrics() -> dict:
+    return encoding_metrics()
+
+
+@router.get("/metrics/llm-scheduler")
+async def get_llm_scheduler_metrics() -> dict:
+    return scheduler_metrics()
+
+
+@router.get("/metrics/llm-cache")
+async def get_llm_cache_metrics() -> dict:
+    return cache_metrics()
+
+
+@router.get("/metrics/llm-retries")
+async def get_llm_retry_metrics() -> dict:
+    return retry_metrics()
+
+
+@router.get("/metrics/llm-streaming")
+async def get_llm_streaming_metrics() -> dict:
+    return stream_metrics()
+
+
+@router.get("/metrics/layout-templates")
+async def get_layout_template_metrics() -> dict:
+    return template_metrics()
+
+
+@router.get("/metrics/reference-artifacts")
+async def get_reference_artifact_metrics() -> dict:
+    return artifact_metrics()
@@ -1,14 +1,19 @@
 import asyncio
 import logging
+from collections.abc import Awaitable
 from pathlib import Path
 
-from ..models import AnalysisStatus
-from . import analysis_store, job_store
-from .paired_sections import analyze_page_pair
+from ..models import AnalysisStatus, JobMetadata, PageAnalysis
+from . import analysis_store, job_store, llm_cache, llm_telemetry, page_identity
+from .cpu_pool import run_cpu_background
+from .llm_scheduler import PIPELINE_CONCURRENCY
+from .page_map import prefetch_page_maps
+from .paired_sections import analyze_identical_page, analyze_page_pair
 
 logger = logging.getLogger(__name__)
 
-MAX_CONCURRENCY = 4
+MAX_CONCURRENCY = PIPELINE_CONCURRENCY
+PREFETCH_CHUNK_PAGES = 4
 PROGRESS_PERSIST_INTERVAL = 10
 UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
 
@@ -17,10 +22,50 @@ def _resolve_path(job_id: str, category: str, filename: str) -> str:
     return str(UPLOADS_DIR / job_id / category / filename)
 
 
-async def run_analysis(job_id: str, mode: str = "paired") -> None:
+async def _prefetch(job_id: str, pdf_path: str, pages: list[int]) -> None:
+    try:
+        await run_cpu_background(prefetch_page_maps, pdf_path, pages)
+    except Exception as e:
+        # The page's own analysis extracts the map again and reports the error
+        logger.warning("page map prefetch failed job=%s %s p%d-%d: %s", job_id, pdf_path, pages[0], pages[-1], e)
+
+
+def _start_prefetch(
+    job: JobMetadata, checks: dict[str, dict[int, Awaitable[bool]]],
+) -> dict[tuple[str, int], asyncio.Task]:
+    """Extract page maps in chunks of PREFETCH_CHUNK_PAGES through the process pool.
+
+    Chunks are queued in page order, alternating between documents, so the
+    first pages of every pair are ready first. Pages with a pending identity
+    check are skipped: the check extracts their page maps itself.
+    Returns one task per (path, chunk index).
+    """
+    chunks: list[tuple[int, str, list[int]]] = []
+    for pair in job.pairs:
+        pending = checks.get(pair.pair_id, {})
+        for category, page_count in (("reference", pair.page_count_reference), ("test", pair.page_count_test)):
+            path = _resolve_path(job.job_id, category, pair.filename)
+            for start in range(1, page_count + 1, PREFETCH_CHUNK_PAGES):
+                pages = [
+                    pg for pg in range(start, min(start + PREFETCH_CHUNK_PAGES, page_count + 1))
+                    if pg not in pending
+                ]
+                if pages:
+                    chunks.append(((start - 1) // PREFETCH_CHUNK_PAGES, path, pages))
+    chunks.sort(key=lambda chunk: chunk[0])
+    return {
+        (path, index): asyncio.create_task(_prefetch(job.job_id, path, pages))
+        for index, path, pages in chunks
+    }
+
+
+async def run_analysis(job_id: str, mode: str = "paired", bypass_cache: bool = False) -> None:
     job = job_store.get_job(job_id)
     if not job:
         return
+    # Task-local: only this run's LLM calls skip the response cache
+    llm_cache.set_bypass(bypass_cache)
+    llm_telemetry.set_job(job_id)
 
     # Build work items: one per page per pair (paired call covers both ref+test)
     work_items: list[tuple[str, str, str, int]] = []
@@ -35,22 +80,48 @@ async def run_analysis(job_id: str, mode: str = "paired") -> None:
     job.analysis_total = len(work_items)
     job.analysis_progress = 0
     job.analysis_error = None
+    job.analysis_skipped = job.analysis_mirrored = 0
     job_store.persist_job(job)
 
+    # Identity checks and page-map extraction run in the process pool in page
+    # order; each page waits only for its own check and extraction chunk.
+    checks = await page_identity.start_checks(job)
+    checked = page_identity.checked_pages(job)
+    prefetch = _start_prefetch(job, checks)
+
     semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
     completed = 0
 
     async def bounded(pair_id: str, ref_path: str, test_path: str, pg: int):
         nonlocal completed
+        check = checks.get(pair_id, {}).get(pg)
+        is_identical = await check if check is not None else pg in checked.get(pair_id, ())
+        chunk = (pg - 1) // PREFETCH_CHUNK_PAGES
+        for path in (ref_path, test_path):
+            task = prefetch.get((path, chunk))
+            if task is not None:
+                await task
         async with semaphore:
+            def publish_partial(category: str, analysis: PageAnalysis) -> None:
+                analysis_store.store(job_id, pair_id, category, pg, analysis)
+
             try:
-                ref_analysis, test_analysis = await analyze_page_pair(
-                    ref_path, test_path, pg, mode=mode,
-                )
+                if is_identical and mode != "elements":
+                    ref_analysis, test_analysis, called = await analyze_identical_page(
+                        ref_path, pg, mode=mode, on_partial=publish_partial,
+                    )
+                    job.analysis_mirrored += 1
+                    job.analysis_skipped += not called
+                else:
+                    ref_analysis, test_analysis = await analyze_page_pair(
+                        ref_path, test_path, pg, mode=mode, on_partial=publish_partial,
+                    )
                 analysis_store.store(job_id, pair_id, "reference", pg, ref_analysis)
                 analysis_store.store(job_id, pair_id, "test", pg, test_analysis)
             except Exception as e:
                 logger.error("analysis error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
+                # Half-streamed regions must not pass for the page's layout
+                analysis_store.discard_partial(job_id, pair_id, pg)
             finally:
                 completed += 1
                 job.analysis_progress = completed
@@ -65,6 +136,7 @@ async def run_analysis(job_id: str, mode: str = "paired") -> None:
             bounded(pid, ref, test, pg)
             for pid, ref, test, pg in work_items
         ))
+        await page_identity.finish_checks(job, checks)
         job.analysis_status = AnalysisStatus.done
         job_store.persist_job(job)
     except Exception as e:
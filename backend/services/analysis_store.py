@@ -14,3 +14,20 @@ def get(
     job_id: str, pair_id: str, category: str, page_number: int,
 ) -> PageAnalysis | None:
     return _results.get((job_id, pair_id, category, page_number))
+
+
+def get_final(
+    job_id: str, pair_id: str, category: str, page_number: int,
+) -> PageAnalysis | None:
+    """The stored analysis unless it is still a streamed partial."""
+    analysis = _results.get((job_id, pair_id, category, page_number))
+    return None if analysis is None or analysis.partial else analysis
+
+
+def discard_partial(job_id: str, pair_id: str, page_number: int) -> None:
+    """Drop streamed partials left behind by a layout call that failed."""
+    for category in ("reference", "test"):
+        key = (job_id, pair_id, category, page_number)
+        analysis = _results.get(key)
+        if analysis is not None and analysis.partial:
+            del _results[key]
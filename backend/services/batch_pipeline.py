@@ -0,0 +1,409 @@
+"""
+Offline batch mode for large (e.g. nightly) jobs.
+
+Instead of driving every LLM call through the interactive pipelines, the job
+is run in two batch phases:
+
+  1. layout + global: one layout request per page pair (two in single mode)
+     and one global request per page pair;
+  2. section checks: built from the phase-1 layouts.
+
+Pages identical on both sides (page_identity) get a single reference layout
+request, or none when the reference layout is stored (reference_artifacts),
+and skipped global and section checks.
+
+Each phase writes its requests to JSONL files, submits them through an
+llm_batch backend, waits for completion and ingests the results into the
+same stores the interactive pipelines use. Responses already in the LLM
+cache are used directly and batch responses are added to it.
+"""
+
+import asyncio
+import logging
+import shutil
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from ..models import AnalysisStatus, JobMetadata, SectionPageAnalysisResult
+from . import (
+    analysis_store,
+    global_analysis_store,
+    job_store,
+    llm_cache,
+    llm_telemetry,
+    page_identity,
+    reference_artifacts,
+    section_analysis_store,
+)
+from .cpu_pool import run_cpu
+from .global_analysis import _global_from_response, _global_request, identical_page_global
+from .llm_batch import BATCH_DIR, BatchBackend, BatchResult, BatchWriter, get_backend, run_batch
+from .llm_scheduler import PIPELINE_CONCURRENCY
+from .page_map import extract_page_map
+from .paired_sections import (
+    SINGLE_SYSTEM_PROMPT,
+    _get_client,
+    _layout_from_response_paired,
+    _layout_from_response_single,
+    _layout_request_paired,
+    _layout_request_single,
+    _layout_to_analysis,
+    _raw_analysis,
+    _render_page_image,
+    _template_context,
+)
+from .section_analysis import _crop_section, _section_from_response, _section_request
+from .section_analysis_pipeline import _error_result, _identical_result, _match_sections, _presence_results
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = PIPELINE_CONCURRENCY  # pages prepared (rendered, encoded) at a time
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
+BATCH_MODES = ("paired", "single", "raw")
+
+
+def _resolve_path(job_id: str, category: str, filename: str) -> str:
+    return str(UPLOADS_DIR / job_id / category / filename)
+
+
+class _BatchPhase:
+    """Collect one phase's requests, run them as batches and hand back the results."""
+
+    def __init__(self, job: JobMetadata, backend: BatchBackend, label: str):
+        self.job = job
+        self.backend = backend
+        self.directory = BATCH_DIR / job.job_id / label
+        self.writer = BatchWriter(self.directory, backend.url)
+        self.results: dict[str, BatchResult] = {}
+        self._endpoint = str(_get_client().base_url)
+        self._cache_entries: dict[str, tuple[str, dict[str, Any]]] = {}
+        self._models: dict[str, str] = {}
+
+    def add(self, custom_id: str, kwargs: dict[str, Any]) -> None:
+        if llm_cache.LLM_CACHE_ENABLED:
+            key = llm_cache.fingerprint(self._endpoint, kwargs)
+            cached = llm_cache.lookup(key)
+            if cached is not None:
+                self.results[custom_id] = BatchResult(cached)
+                self._record(custom_id, kwargs, self.results[custom_id], cache_hit=True)
+                return
+            self._cache_entries[custom_id] = (key, {"response_format": kwargs.get("response_format")})
+        self._models[custom_id] = kwargs.get("model", "")
+        self.writer.add(custom_id, kwargs)
+
+    def _record(self, custom_id: str, kwargs: dict[str, Any], result: BatchResult, cache_hit: bool = False) -> None:
+        call = llm_telemetry.new_call(custom_id.split(":", 1)[0], "batch", kwargs)
+        call.cache_hit = cache_hit
+        if result.response is None:
+            call.outcome = "error"
+            call.error = result.error or ""
+        call.add_usage(result.response)
+        llm_telemetry.record(call)
+
+    async def run(self) -> dict[str, BatchResult]:
+        paths = self.writer.close()
+        logger.info(
+            "Batch job=%s %s: %d requests in %d files, %d from cache",
+            self.job.job_id, self.directory.name, self.writer.count, len(paths), len(self.results),
+        )
+
+        def on_submit(batch_id: str) -> None:
+            self.job.batch_ids.append(batch_id)
+            job_store.persist_job(self.job)
+
+        try:
+            if paths:
+                batch_results = await run_batch(self.backend, paths, on_submit)
+                for custom_id, model in self._models.items():
+                    if custom_id in batch_results:
+                        self._record(custom_id, {"model": model}, batch_results[custom_id])
+                self.results.update(batch_results)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            try:
+                self.directory.parent.rmdir()
+            except OSError:
+                pass
+
+        for custom_id, (key, kwargs) in self._cache_entries.items():
+            result = self.results.get(custom_id)
+            if result is not None and result.response is not None:
+                llm_cache.store(key, kwargs, result.response)
+        return self.results
+
+    def response(self, custom_id: str) -> Any:
+        """The response for a request, or raise with the batch error."""
+        result = self.results.get(custom_id)
+        if result is None:
+            raise RuntimeError("no result in batch output")
+        if result.response is None:
+            raise RuntimeError(result.error or "request failed")
+        return result.response
+
+
+async def _for_each(items: list[Any], fn: Callable[..., Awaitable[None]]) -> None:
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def bounded(item: Any) -> None:
+        async with semaphore:
+            await fn(*item)
+
+    await asyncio.gather(*(bounded(item) for item in items))
+
+
+# ---------------------------------------------------------------------------
+# Phase 1: layout + global
+# ---------------------------------------------------------------------------
+
+async def _layout_and_global_phase(
+    job: JobMetadata, backend: BatchBackend, mode: str,
+    work_items: list[tuple[str, str, str, int]], identical: dict[str, set[int]],
+) -> None:
+    job_id = job.job_id
+    phase = _BatchPhase(job, backend, "layout_global")
+    skipped: set[tuple[str, int]] = set()
+    # Identical pages whose reference layout was stored by an earlier job
+    stored_layouts: dict[tuple[str, int], list[dict[str, Any]]] = {}
+    single_context = _template_context(SINGLE_SYSTEM_PROMPT)
+
+    async def prepare(pair_id: str, ref_path: str, test_path: str, pg: int) -> None:
+        if pg in identical.get(pair_id, ()):
+            # Identical pages: lay out the reference only, no global request
+            try:
+                stored = await asyncio.to_thread(reference_artifacts.lookup_layout, ref_path, pg, single_context)
+                if stored is not None:
+                    stored_layouts[(pair_id, pg)] = stored
+                    return
+                ref_map, ref_image = await asyncio.gather(
+                    run_cpu(extract_page_map, ref_path, pg),
+                    run_cpu(_render_page_image, ref_path, pg),
+                )
+            except Exception as e:
+                logger.error("batch prepare error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
+                skipped.add((pair_id, pg))
+                return
+            if ref_map["elements"]:
+                phase.add(f"layout:{pair_id}:{pg}:identical", _layout_request_single(ref_map, ref_image))
+            return
+        try:
+            ref_map, test_map, ref_image, test_image, ref_global, test_global = await asyncio.gather(
+                run_cpu(extract_page_map, ref_path, pg),
+                run_cpu(extract_page_map, test_path, pg),
+                run_cpu(_render_page_image, ref_path, pg),
+                run_cpu(_render_page_image, test_path, pg),
+                run_cpu(_render_page_image, ref_path, pg, "global"),
+                run_cpu(_render_page_image, test_path, pg, "global"),
+            )
+        except Exception as e:
+            logger.error("batch prepare error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
+            skipped.add((pair_id, pg))
+            return
+        phase.add(f"global:{pair_id}:{pg}", _global_request(ref_global, test_global))
+        if not ref_map["elements"] and not test_map["elements"]:
+            return
+        if mode == "single":
+            phase.add(f"layout:{pair_id}:{pg}:reference", _layout_request_single(ref_map, ref_image))
+            phase.add(f"layout:{pair_id}:{pg}:test", _layout_request_single(test_map, test_image))
+        else:
+            phase.add(
+                f"layout:{pair_id}:{pg}",
+                _layout_request_paired(ref_map, ref_image, test_map, test_image),
+            )
+
+    await _for_each(work_items, prepare)
+    await phase.run()
+
+    async def ingest(pair_id: str, ref_path: str, test_path: str, pg: int) -> None:
+        if (pair_id, pg) in skipped:
+            job.analysis_progress += 1
+            job.global_analysis_progress += 1
+            return
+        is_identical = pg in identical.get(pair_id, ())
+        try:
+            ref_map, test_map = await asyncio.gather(
+                run_cpu(extract_page_map, ref_path, pg),
+                run_cpu(extract_page_map, test_path, pg),
+            )
+            if not ref_map["elements"] and not test_map["elements"]:
+                # Empty pages: no layout request was sent
+                ref_layout: list[dict[str, Any]] = []
+                test_layout: list[dict[str, Any]] = []
+            elif (pair_id, pg) in stored_layouts:
+                ref_layout = test_layout = stored_layouts[(pair_id, pg)]
+            elif is_identical:
+                ref_layout = _layout_from_response_single(
+                    phase.response(f"layout:{pair_id}:{pg}:identical"), ref_map,
+                )
+                test_layout = ref_layout
+                await asyncio.to_thread(reference_artifacts.store_layout, ref_path, pg, single_context, ref_layout)
+            elif mode == "single":
+                ref_layout = _layout_from_response_single(
+                    phase.response(f"layout:{pair_id}:{pg}:reference"), ref_map,
+                )
+                test_layout = _layout_from_response_single(
+                    phase.response(f"layout:{pair_id}:{pg}:test"), test_map,
+                )
+            else:
+                ref_layout, test_layout = _layout_from_response_paired(
+                    phase.response(f"layout:{pair_id}:{pg}"), ref_map, test_map,
+                )
+            if mode == "raw" or not (ref_layout or test_layout):
+                ref_analysis = _raw_analysis(pg, ref_map, ref_layout)
+                test_analysis = _raw_analysis(pg, test_map, test_layout)
+            else:
+                ref_analysis, test_analysis = await asyncio.gather(
+                    run_cpu(_layout_to_analysis, pg, ref_map, ref_layout),
+                    run_cpu(_layout_to_analysis, pg, test_map, test_layout),
+                )
+            analysis_store.store(job_id, pair_id, "reference", pg, ref_analysis)
+            analysis_store.store(job_id, pair_id, "test", pg, test_analysis)
+            job.analysis_mirrored += is_identical
+            job.analysis_skipped += (pair_id, pg) in stored_layouts
+        except Exception as e:
+            logger.error("batch layout error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
+        finally:
+            job.analysis_progress += 1
+
+        try:
+            if is_identical:
+                result = identical_page_global(pg)
+                job.global_analysis_skipped += 1
+            else:
+                result = _global_from_response(phase.response(f"global:{pair_id}:{pg}"), pg)
+            global_analysis_store.store(job_id, pair_id, pg, result)
+        except Exception as e:
+            logger.error("batch global error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
+        finally:
+            job.global_analysis_progress += 1
+
+    await _for_each(work_items, ingest)
+
+
+# ---------------------------------------------------------------------------
+# Phase 2: section checks
+# ---------------------------------------------------------------------------
+
+def _page_sections(job_id: str, pair_id: str, pg: int) -> tuple[dict, dict, list, list[str], list[str]]:
+    """Detected sections of both pages, matched as in section_analysis_pipeline."""
+    ref_analysis = analysis_store.get_final(job_id, pair_id, "reference", pg)
+    test_analysis = analysis_store.get_final(job_id, pair_id, "test", pg)
+    ref_sections = {s.name: s for s in (ref_analysis.sections if ref_analysis else [])}
+    test_sections = {s.name: s for s in (test_analysis.sections if test_analysis else [])}
+    matched, ref_only, test_only = _match_sections(list(ref_sections), list(test_sections))
+    return ref_sections, test_sections, matched, ref_only, test_only
+
+
+async def _section_phase(
+    job: JobMetadata, backend: BatchBackend,
+    work_items: list[tuple[str, str, str, int]], identical: dict[str, set[int]],
+) -> None:
+    job_id = job.job_id
+    phase = _BatchPhase(job, backend, "sections")
+    matched_instructions: dict[str, bool] = {}
+    prepare_errors: dict[str, Exception] = {}
+
+    async def prepare(pair_id: str, ref_path: str, test_path: str, pg: int) -> None:
+        if pg in identical.get(pair_id, ()):
+            return
+        ref_sections, test_sections, matched, _, _ = _page_sections(job_id, pair_id, pg)
+        for ref_name, test_name in matched:
+            custom_id = f"section:{pair_id}:{pg}:{ref_name}"
+            try:
+                ref_crop, test_crop = await asyncio.gather(
+                    run_cpu(_crop_section, ref_path, pg, ref_sections[ref_name].bbox),
+                    run_cpu(_crop_section, test_path, pg, test_sections[test_name].bbox),
+                )
+                kwargs, matched_instructions[custom_id] = _section_request(ref_crop, test_crop, ref_name)
+            except Exception as e:
+                prepare_errors[custom_id] = e
+                continue
+            phase.add(custom_id, kwargs)
+
+    await _for_each(work_items, prepare)
+    await phase.run()
+
+    for pair_id, _, _, pg in work_items:
+        _, _, matched, ref_only, test_only = _page_sections(job_id, pair_id, pg)
+        results = []
+        is_identical = pg in identical.get(pair_id, ())
+        for ref_name, _ in matched:
+            custom_id = f"section:{pair_id}:{pg}:{ref_name}"
+            if is_identical:
+                results.append(_identical_result(ref_name))
+                continue
+            try:
+                if custom_id in prepare_errors:
+                    raise prepare_errors[custom_id]
+                results.append(_section_from_response(
+                    phase.response(custom_id), ref_name, matched_instructions[custom_id],
+                ))
+            except Exception as e:
+                logger.error("batch section error %s p%d %s: %s", pair_id, pg, ref_name, e)
+                results.append(_error_result(ref_name, e))
+        results += _presence_results(ref_only, test_only)
+        section_analysis_store.store(
+            job_id, pair_id, pg, SectionPageAnalysisResult(page_number=pg, results=results),
+        )
+        job.section_analysis_progress += 1
+        job.section_analysis_skipped += is_identical and bool(matched)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+async def run_batch_analysis(
+    job_id: str, mode: str = "paired", backend: str | None = None, bypass_cache: bool = False,
+) -> None:
+    """Run section detection, global analysis and section analysis as batch jobs."""
+    job = job_store.get_job(job_id)
+    if not job:
+        return
+    # Task-local: only this run's LLM calls skip the response cache
+    llm_cache.set_bypass(bypass_cache)
+    llm_telemetry.set_job(job_id)
+
+    work_items: list[tuple[str, str, str, int]] = []
+    for pair in job.pairs:
+        ref_path = _resolve_path(job_id, "reference", pair.filename)
+        test_path = _resolve_path(job_id, "test", pair.filename)
+        max_pages = max(pair.page_count_reference, pair.page_count_test)
+        for pg in range(1, max_pages + 1):
+            work_items.append((pair.pair_id, ref_path, test_path, pg))
+
+    job.batch_status = AnalysisStatus.running
+    job.batch_ids = []
+    job.batch_error = None
+    job.analysis_status = AnalysisStatus.running
+    job.analysis_error = None
+    job.global_analysis_status = AnalysisStatus.running
+    job.analysis_total = job.global_analysis_total = job.section_analysis_total = len(work_items)
+    job.analysis_progress = job.global_analysis_progress = job.section_analysis_progress = 0
+    job.analysis_skipped = job.analysis_mirrored = 0
+    job.global_analysis_skipped = job.section_analysis_skipped = 0
+    job_store.persist_job(job)
+
+    try:
+        batch_backend = get_backend(backend)
+        identical = await page_identity.identical_pages(job)
+        await _layout_and_global_phase(job, batch_backend, mode, work_items, identical)
+        job.analysis_status = AnalysisStatus.done
+        job.global_analysis_status = AnalysisStatus.done
+        job.section_analysis_status = AnalysisStatus.running
+        job_store.persist_job(job)
+
+        await _section_phase(job, batch_backend, work_items, identical)
+        job.section_analysis_status = AnalysisStatus.done
+        job.batch_status = AnalysisStatus.done
+        job_store.persist_job(job)
+    except Exception as e:
+        logger.error("batch pipeline failed job=%s: %s", job_id, e)
+        for field in ("analysis_status", "global_analysis_status", "section_analysis_status"):
+            if getattr(job, field) == AnalysisStatus.running:
+                setattr(job, field, AnalysisStatus.failed)
+        if job.analysis_status == AnalysisStatus.failed:
+            job.analysis_error = str(e)
+        job.batch_status = AnalysisStatus.failed
+        job.batch_error = str(e)
+        job_store.persist_job(job)
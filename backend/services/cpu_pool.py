@@ -0,0 +1,152 @@
+"""
+Process-pool execution for CPU-bound PDF work.
+
+pdfplumber extraction, page-map merging, rasterization and layout
+post-processing are CPU bound, and in threads they are serialized by the
+GIL. run_cpu() sends them to a pool of warm worker processes (CPU_WORKERS,
+default: number of cores, capped at 8) that preload fitz/pdfplumber and keep
+their own document pools. Setting CPU_WORKERS=0 falls back to
+asyncio.to_thread.
+
+run_cpu_background() is for speculative work queued far ahead (page-map
+prefetch, identity checks): it keeps at most CPU_WORKERS - 1 such tasks in the
+pool, so a page being analyzed never waits behind a whole document's worth of
+queued tasks.
+
+When a worker dies, the pool is replaced and each task it failed is retried
+once in a single-worker pool of its own; a task that kills that worker too
+raises BrokenProcessPool.
+
+Functions passed to run_cpu must be module-level and their arguments and
+results picklable.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", str(min(os.cpu_count() or 1, 8))))
+
+T = TypeVar("T")
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+# Background and crash-retry slots per event loop (asyncio primitives are bound to one loop)
+_background_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+_retry_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _warm_worker() -> None:
+    # Import the heavy modules once per worker instead of on the first task
+    from . import page_map, paired_sections, render_cache  # noqa: F401
+
+
+def _noop() -> None:
+    return None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = _new_executor(CPU_WORKERS)
+        return _executor
+
+
+def start() -> None:
+    """Spawn all workers up front so the first job does not pay for start-up."""
+    if CPU_WORKERS <= 0:
+        return
+    executor = _get_executor()
+    for _ in range(CPU_WORKERS):
+        executor.submit(_noop)
+    logger.info("CPU pool started with %d workers", CPU_WORKERS)
+
+
+def shutdown(wait: bool = False) -> None:
+    """Stop the pool; with wait, block until its worker processes have exited and been reaped."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _reset_broken(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_executor(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_worker,
+    )
+
+
+def _loop_semaphore(
+    semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]", size: int,
+) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = semaphores.get(loop)
+    if semaphore is None:
+        semaphore = semaphores[loop] = asyncio.Semaphore(max(size, 1))
+    return semaphore
+
+
+async def _run_isolated(fn: Callable[..., T], *args: Any) -> T:
+    """Run fn(*args) in a fresh single-worker pool of its own."""
+    async with _loop_semaphore(_retry_slots, CPU_WORKERS):
+        executor = _new_executor(1)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """Run fn(*args) in the process pool (or a thread when CPU_WORKERS=0)."""
+    if CPU_WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+
+    name = getattr(fn, "__name__", fn)
+    executor = _get_executor()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge page), failing every task in the pool.
+        # The pool is replaced; each failed task is retried once in a process of
+        # its own, so the one that killed the worker cannot fail the others
+        # again, and never in this (the API) process.
+        logger.error("CPU pool broken while running %s; restarting pool and retrying", name)
+        _reset_broken(executor)
+    try:
+        return await _run_isolated(fn, *args)
+    except BrokenProcessPool:
+        logger.error("%s killed its worker process again; giving up", name)
+        raise
+
+
+async def run_cpu_background(fn: Callable[..., T], *args: Any) -> T:
+    """run_cpu for work queued ahead of need; leaves a worker free for run_cpu calls."""
+    async with _loop_semaphore(_background_slots, CPU_WORKERS - 1):
+        return await run_cpu(fn, *args)
@@ -0,0 +1,145 @@
+"""
+Size-bounded on-disk cache with LRU eviction.
+
+Entries are stored as one file per key under data/cache/<name>/, named by the
+sha256 of the key. Reads refresh the file's mtime so recency survives restarts
+and is shared between processes; once the directory exceeds its byte budget
+the least recently used files are deleted.
+
+Every process (the API and each CPU worker) writes into the same directory, so
+each process evicts from its own index as it writes and, after writing
+1/SCAN_FRACTION of the budget, rescans the directory to pick up the others'
+files and evicts by mtime. Between rescans the directory can exceed the
+budget by at most (processes x budget / SCAN_FRACTION).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CACHE_ROOT = Path(__file__).resolve().parent.parent / "data" / "cache"
+SCAN_FRACTION = 16
+
+
+def _key_digest(key: tuple) -> str:
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, name: str, max_bytes: int, suffix: str = ".bin") -> None:
+        self.directory = CACHE_ROOT / name
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        # Bytes this process wrote since it last rescanned the directory
+        self._written_since_scan = 0
+        self._scan_every = max(max_bytes // SCAN_FRACTION, 1)
+
+    def _path_for(self, key: tuple) -> Path:
+        digest = _key_digest(key)
+        return self.directory / digest[:2] / f"{digest}{self.suffix}"
+
+    def _scan(self) -> "OrderedDict[Path, int]":
+        """Entries on disk, oldest first (by mtime, which every process refreshes)."""
+        if not self.directory.exists():
+            return OrderedDict()
+        found: list[tuple[float, Path, int]] = []
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, path, stat.st_size))
+        found.sort(key=lambda item: item[0])
+        return OrderedDict((path, size) for _, path, size in found)
+
+    def _reindex(self, entries: "OrderedDict[Path, int]") -> None:
+        """Replace the index with a directory scan. Caller holds the lock."""
+        self._entries = entries
+        self._total_bytes = sum(entries.values())
+        self._written_since_scan = 0
+
+    def _ensure_loaded(self) -> None:
+        """Index existing entries oldest-first. Caller holds the lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        self._reindex(self._scan())
+
+    def _sweep(self) -> None:
+        """Rescan the directory (other processes write to it too) and evict."""
+        entries = self._scan()
+        with self._lock:
+            self._reindex(entries)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until within budget. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("cache eviction failed for %s: %s", path, e)
+
+    def get(self, key: tuple) -> bytes | None:
+        path = self._path_for(key)
+        with self._lock:
+            self._ensure_loaded()
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(path, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            else:
+                # Written by another worker process since we indexed the directory
+                self._entries[path] = len(data)
+                self._total_bytes += len(data)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            temp_path.write_bytes(data)
+            temp_path.replace(path)
+        except OSError as e:
+            logger.warning("cache write failed for %s: %s", path, e)
+            temp_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._ensure_loaded()
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._entries[path] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+            self._written_since_scan += len(data)
+            sweep = self._written_since_scan >= self._scan_every
+        if sweep:
+            self._sweep()
@@ -0,0 +1,142 @@
+"""
+Pooled open-document handles for PyMuPDF and pdfplumber.
+
+Opening a PDF parses its xref and page tree, which is a large fixed cost on
+big reports. The pools keep recently used documents open (bounded, LRU) so a
+job processing N pages of one file parses it once. Each handle has its own
+lock: a document is used by one thread at a time, while different documents
+can be used concurrently. A handle evicted while in use is closed by its last
+user, so a thread may hold any number of pooled documents at once.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import fitz
+import pdfplumber
+
+logger = logging.getLogger(__name__)
+
+DOC_POOL_MAX_OPEN = int(os.environ.get("DOC_POOL_MAX_OPEN", "16"))
+
+
+class _Handle:
+    def __init__(self, doc: Any) -> None:
+        self.doc = doc
+        # Reentrant: a thread may open the same document again while using it
+        self.lock = threading.RLock()
+        # Threads using or waiting for the handle, and whether it has left the
+        # pool; both guarded by the pool lock
+        self.users = 0
+        self.evicted = False
+
+
+class DocumentPool:
+    def __init__(
+        self,
+        opener: Callable[[str], Any],
+        closer: Callable[[Any], None],
+        max_open: int,
+    ) -> None:
+        self._opener = opener
+        self._closer = closer
+        self._max_open = max(1, max_open)
+        self._lock = threading.Lock()
+        self._handles: OrderedDict[tuple[str, int, int], _Handle] = OrderedDict()
+
+    @staticmethod
+    def _key(pdf_path: str) -> tuple[str, int, int]:
+        stat = os.stat(pdf_path)
+        return (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+
+    def _close(self, handle: _Handle) -> None:
+        # Only called once the handle has left the pool and has no users
+        try:
+            self._closer(handle.doc)
+        except Exception as e:
+            logger.warning("failed to close pooled document: %s", e)
+
+    def _evict(self, handle: _Handle) -> bool:
+        """Take a handle out of use (pool lock held); True when it can be closed now.
+
+        A handle still in use is closed by its last user instead, so evicting
+        never waits on a document lock (which the evicting thread may hold).
+        """
+        handle.evicted = True
+        return handle.users == 0
+
+    def _acquire_handle(self, pdf_path: str) -> _Handle:
+        key = self._key(pdf_path)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._handles.move_to_end(key)
+                handle.users += 1
+                return handle
+
+        opened = _Handle(self._opener(pdf_path))
+        to_close: list[_Handle] = []
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                handle = opened
+                self._handles[key] = handle
+                while len(self._handles) > self._max_open:
+                    _, old = self._handles.popitem(last=False)
+                    if self._evict(old):
+                        to_close.append(old)
+            else:
+                # Another thread opened the same file first
+                to_close.append(opened)
+            handle.users += 1
+        for old in to_close:
+            self._close(old)
+        return handle
+
+    def _release_handle(self, handle: _Handle) -> None:
+        with self._lock:
+            handle.users -= 1
+            close = handle.evicted and handle.users == 0
+        if close:
+            self._close(handle)
+
+    @contextmanager
+    def open(self, pdf_path: str) -> Iterator[Any]:
+        """Yield an open document for exclusive use by the calling thread."""
+        handle = self._acquire_handle(pdf_path)
+        try:
+            with handle.lock:
+                yield handle.doc
+        finally:
+            self._release_handle(handle)
+
+    def close_all(self) -> None:
+        with self._lock:
+            handles = [handle for handle in self._handles.values() if self._evict(handle)]
+            self._handles.clear()
+        for handle in handles:
+            self._close(handle)
+
+
+_fitz_pool = DocumentPool(fitz.open, lambda doc: doc.close(), DOC_POOL_MAX_OPEN)
+_plumber_pool = DocumentPool(pdfplumber.open, lambda pdf: pdf.close(), DOC_POOL_MAX_OPEN)
+
+
+def open_fitz(pdf_path: str):
+    """Context manager yielding a pooled fitz.Document."""
+    return _fitz_pool.open(pdf_path)
+
+
+def open_pdfplumber(pdf_path: str):
+    """Context manager yielding a pooled pdfplumber.PDF."""
+    return _plumber_pool.open(pdf_path)
+
+
+def close_all() -> None:
+    _fitz_pool.close_all()
+    _plumber_pool.close_all()
@@ -7,14 +7,16 @@ ok/maybe/issue statuses.
 """
 
 import base64
-import json
 import logging
 import re
 from pathlib import Path
 from typing import Any
 
-from ..models import GlobalCheckResult, GlobalPageAnalysis
-from .paired_sections import _get_client, _render_page_image
+from ..models import CheckStatus, GlobalCheckResult, GlobalPageAnalysis
+from .cpu_pool import run_cpu
+from .image_policy import image_content
+from .page_identity import IDENTICAL_EXPLANATION
+from .paired_sections import _create_completion, _render_page_image, _response_json
 
 logger = logging.getLogger(__name__)
 
@@ -159,35 +161,23 @@ Never return ok if your explanation indicates missing content, mismatches, or fa
 Write concise factual explanations (1-2 sentences) and explicitly state whether criteria are satisfied."""
 
 
-async def analyze_page_global(
-    ref_path: str, test_path: str, page_num: int,
-) -> GlobalPageAnalysis:
-    """Run global checks on a single page pair."""
-    import asyncio
-
+def _global_request(ref_image: bytes, test_image: bytes) -> dict[str, Any]:
     check_names, checklist_text = _load_template()
 
-    ref_image, test_image = await asyncio.gather(
-        asyncio.to_thread(_render_page_image, ref_path, page_num),
-        asyncio.to_thread(_render_page_image, test_path, page_num),
-    )
-
-    client = _get_client()
-
     b64_ref = base64.b64encode(ref_image).decode("ascii")
     b64_test = base64.b64encode(test_image).decode("ascii")
 
     user_content: list[dict[str, Any]] = [
         {"type": "text", "text": "=== REFERENCE PAGE ==="},
-        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64_ref}"}},
+        image_content("global", b64_ref),
         {"type": "text", "text": "=== TEST PAGE ==="},
-        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64_test}"}},
+        image_content("global", b64_test),
         {"type": "text", "text": f"=== CHECKLIST ===\n{checklist_text}"},
     ]
 
     schema = _build_schema(check_names)
 
-    kwargs: dict[str, Any] = dict(
+    return dict(
         model=MODEL_NAME,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -200,21 +190,9 @@ async def analyze_page_global(
         response_format={"type": "json_schema", "json_schema": schema},
     )
 
-    try:
-        resp = await client.chat.completions.create(**kwargs)
-    except TypeError:
-        kwargs.pop("response_format", None)
-        kwargs.pop("seed", None)
-        resp = await client.chat.completions.create(**kwargs)
 
-    raw = (resp.choices[0].message.content or "{}").strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
-        if raw.endswith("```"):
-            raw = raw[:-3]
-        raw = raw.strip()
-
-    parsed = json.loads(raw)
+def _global_from_response(resp: Any, page_num: int) -> GlobalPageAnalysis:
+    parsed = _response_json(resp)
 
     checks = []
     for check in parsed.get("checks", []):
@@ -230,3 +208,31 @@ async def analyze_page_global(
         )
 
     return GlobalPageAnalysis(page_number=page_num, checks=checks)
+
+
+def identical_page_global(page_num: int) -> GlobalPageAnalysis:
+    """Every check skipped, without a GPT call, for a page identical on both sides."""
+    check_names, _ = _load_template()
+    return GlobalPageAnalysis(
+        page_number=page_num,
+        checks=[
+            GlobalCheckResult(check_name=name, status=CheckStatus.skipped, explanation=IDENTICAL_EXPLANATION)
+            for name in check_names
+        ],
+    )
+
+
+async def analyze_page_global(
+    ref_path: str, test_path: str, page_num: int,
+) -> GlobalPageAnalysis:
+    """Run global checks on a single page pair."""
+    import asyncio
+
+    ref_image, test_image = await asyncio.gather(
+        run_cpu(_render_page_image, ref_path, page_num, "global"),
+        run_cpu(_render_page_image, test_path, page_num, "global"),
+    )
+
+    kwargs = _global_request(ref_image, test_image)
+    resp = await _create_completion("global", kwargs, cache=True)
+    return _global_from_response(resp, page_num)
@@ -3,12 +3,13 @@ import logging
 from pathlib import Path
 
 from ..models import AnalysisStatus
-from . import global_analysis_store, job_store
-from .global_analysis import analyze_page_global
+from . import global_analysis_store, job_store, llm_cache, llm_telemetry, page_identity
+from .global_analysis import analyze_page_global, identical_page_global
+from .llm_scheduler import PIPELINE_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
-MAX_CONCURRENCY = 4
+MAX_CONCURRENCY = PIPELINE_CONCURRENCY
 PROGRESS_PERSIST_INTERVAL = 10
 UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
 
@@ -17,10 +18,13 @@ def _resolve_path(job_id: str, category: str, filename: str) -> str:
     return str(UPLOADS_DIR / job_id / category / filename)
 
 
-async def run_global_analysis(job_id: str) -> None:
+async def run_global_analysis(job_id: str, bypass_cache: bool = False) -> None:
     job = job_store.get_job(job_id)
     if not job:
         return
+    # Task-local: only this run's LLM calls skip the response cache
+    llm_cache.set_bypass(bypass_cache)
+    llm_telemetry.set_job(job_id)
 
     work_items: list[tuple[str, str, str, int]] = []
     for pair in job.pairs:
@@ -33,7 +37,9 @@ async def run_global_analysis(job_id: str) -> None:
     job.global_analysis_status = AnalysisStatus.running
     job.global_analysis_total = len(work_items)
     job.global_analysis_progress = 0
+    job.global_analysis_skipped = 0
     job_store.persist_job(job)
+    identical = await page_identity.identical_pages(job)
 
     semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
     completed = 0
@@ -42,7 +48,11 @@ async def run_global_analysis(job_id: str) -> None:
         nonlocal completed
         async with semaphore:
             try:
-                result = await analyze_page_global(ref_path, test_path, pg)
+                if pg in identical.get(pair_id, ()):
+                    result = identical_page_global(pg)
+                    job.global_analysis_skipped += 1
+                else:
+                    result = await analyze_page_global(ref_path, test_path, pg)
                 global_analysis_store.store(job_id, pair_id, pg, result)
             except Exception as e:
                 logger.error("global analysis error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
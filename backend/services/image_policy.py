@@ -0,0 +1,145 @@
+"""
+Per-stage rendering and encoding policy for images sent to the LLM.
+
+Each stage (layout, global, section, chat) has its own resolution, optional
+max-pixel budget, image format and quality, so layout detection can use a
+cheaper image than fine-grained section checks. Policies default to the
+historical 300-DPI PNG and are overridden per stage with an env var, e.g.
+
+    IMAGE_POLICY_LAYOUT="dpi=150 format=jpeg quality=80 max_pixels=4000000"
+
+Bytes sent per call are counted per stage for the metrics endpoint.
+"""
+
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RENDER_DPI = 300
+STAGES = ("layout", "global", "section", "chat")
+ALLOWED_FORMATS = {"png", "jpeg", "webp"}
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class ImagePolicy:
+    dpi: int = DEFAULT_RENDER_DPI
+    max_pixels: int | None = None
+    format: str = "png"
+    quality: int = 85
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.format]
+
+    def dpi_for(self, width_pt: float, height_pt: float) -> int:
+        """Return the DPI to render a width x height (points) area within the pixel budget."""
+        if not self.max_pixels or width_pt <= 0 or height_pt <= 0:
+            return self.dpi
+        budget_dpi = 72 * math.sqrt(self.max_pixels / (width_pt * height_pt))
+        return max(1, min(self.dpi, int(budget_dpi)))
+
+
+def parse_policy(spec: str) -> ImagePolicy:
+    """Parse "dpi=150 format=jpeg quality=80 max_pixels=4000000" (any subset)."""
+    values: dict[str, Any] = {}
+    for token in spec.replace(",", " ").split():
+        key, sep, value = token.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid image policy token: {token!r}")
+        key = key.strip().lower()
+        value = value.strip().lower()
+        if key in ("dpi", "quality", "max_pixels"):
+            values[key] = int(value)
+        elif key == "format":
+            value = "jpeg" if value == "jpg" else value
+            if value not in ALLOWED_FORMATS:
+                raise ValueError(f"Unsupported image format: {value!r}")
+            values[key] = value
+        else:
+            raise ValueError(f"Unknown image policy key: {key!r}")
+    return ImagePolicy(**values)
+
+
+def _load_policies() -> dict[str, ImagePolicy]:
+    policies: dict[str, ImagePolicy] = {}
+    for stage in STAGES:
+        spec = os.environ.get(f"IMAGE_POLICY_{stage.upper()}", "")
+        try:
+            policies[stage] = parse_policy(spec)
+        except ValueError as e:
+            logger.error("Ignoring IMAGE_POLICY_%s: %s", stage.upper(), e)
+            policies[stage] = ImagePolicy()
+    return policies
+
+
+_policies = _load_policies()
+
+
+def get_policy(stage: str) -> ImagePolicy:
+    return _policies[stage]
+
+
+def image_content(stage: str, b64_image: str) -> dict[str, Any]:
+    """Build an image_url content part for a base64 image rendered with the stage policy."""
+    mime_type = get_policy(stage).mime_type
+    return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{b64_image}"}}
+
+
+# ---------------------------------------------------------------------------
+# Payload metrics
+# ---------------------------------------------------------------------------
+
+_metrics_lock = threading.Lock()
+_payload_metrics: dict[str, dict[str, int]] = {}
+
+
+def record_payload(stage: str, messages: list[dict[str, Any]]) -> dict[str, int]:
+    """Count the bytes of a request's messages for a stage. Returns the call's counts."""
+    image_bytes = 0
+    text_bytes = 0
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            text_bytes += len(content.encode("utf-8"))
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                image_bytes += len(part["image_url"]["url"])
+                images += 1
+            elif part.get("type") == "text":
+                text_bytes += len(part["text"].encode("utf-8"))
+
+    total = image_bytes + text_bytes
+    with _metrics_lock:
+        stats = _payload_metrics.setdefault(
+            stage, {"calls": 0, "images": 0, "image_bytes": 0, "text_bytes": 0, "max_call_bytes": 0},
+        )
+        stats["calls"] += 1
+        stats["images"] += images
+        stats["image_bytes"] += image_bytes
+        stats["text_bytes"] += text_bytes
+        stats["max_call_bytes"] = max(stats["max_call_bytes"], total)
+    logger.debug("%s payload: %d bytes (%d images, %d image bytes)", stage, total, images, image_bytes)
+    return {"images": images, "image_bytes": image_bytes, "text_bytes": text_bytes}
+
+
+def payload_metrics() -> dict[str, dict[str, Any]]:
+    with _metrics_lock:
+        snapshot = {stage: dict(stats) for stage, stats in _payload_metrics.items()}
+    for stats in snapshot.values():
+        stats["avg_call_bytes"] = round((stats["image_bytes"] + stats["text_bytes"]) / stats["calls"])
+    for stage, policy in _policies.items():
+        snapshot.setdefault(stage, {})["policy"] = {
+            "dpi": policy.dpi,
+            "max_pixels": policy.max_pixels,
+            "format": policy.format,
+            "quality": policy.quality,
+        }
+    return snapshot
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import json
 import logging
@@ -6,7 +7,7 @@ from pathlib import Path
 from uuid import uuid4
 
 from ..models import AnalysisStatus, JobMetadata, PdfPair
-from .pdf_utils import get_page_count
+from .reference_artifacts import page_count
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +46,10 @@ def _reconcile_running_jobs() -> None:
         if job.section_analysis_status == AnalysisStatus.running:
             job.section_analysis_status = AnalysisStatus.failed
             changed = True
+        if job.batch_status == AnalysisStatus.running:
+            job.batch_status = AnalysisStatus.failed
+            job.batch_error = RUN_INTERRUPTED_ERROR
+            changed = True
     if changed:
         _persist_all()
 
@@ -70,7 +75,7 @@ def persist_job(job: JobMetadata) -> None:
     _persist_all()
 
 
-def create_job(
+async def create_job(
     job_id: str,
     report_type: str,
     reference_dir: str,
@@ -85,6 +90,14 @@ def create_job(
     unmatched_reference = sorted(reference_set - matched)
     unmatched_test = sorted(test_set - matched)
 
+    # Page counts hash every file: off the event loop, all files at once
+    paths = [
+        os.path.join(directory, filename)
+        for filename in sorted(matched)
+        for directory in (reference_dir, test_dir)
+    ]
+    counts = dict(zip(paths, await asyncio.gather(*(asyncio.to_thread(page_count, p) for p in paths))))
+
     pairs: list[PdfPair] = []
     for filename in sorted(matched):
         pair_id = uuid4().hex[:12]
@@ -96,8 +109,8 @@ def create_job(
                 filename=filename,
                 reference_path=f"/api/jobs/{job_id}/files/reference/{filename}",
                 test_path=f"/api/jobs/{job_id}/files/test/{filename}",
-                page_count_reference=get_page_count(ref_disk_path),
-                page_count_test=get_page_count(test_disk_path),
+                page_count_reference=counts[ref_disk_path],
+                page_count_test=counts[test_disk_path],
             )
         )
 
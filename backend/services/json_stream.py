@@ -0,0 +1,115 @@
+"""
+Incremental parser for streamed JSON responses.
+
+Structured LLM responses are one object whose interesting members are arrays
+({"checks": [...]}, {"ref_sections": [...], "test_sections": [...]}).
+JsonArrayStream is fed the text as it arrives and returns every element of
+the watched top-level arrays as soon as that element is complete, so results
+can be published long before the closing brace. Anything before the first
+"{" (e.g. a ```json fence) is ignored.
+
+Consumed text is dropped after each feed, so the buffer holds at most the
+element being read and every feed costs time proportional to its chunk.
+"""
+
+import json
+from typing import Any
+
+
+class JsonArrayStream:
+    def __init__(self, keys: tuple[str, ...] | list[str]):
+        self.keys = set(keys)
+        self.items: dict[str, list[Any]] = {key: [] for key in keys}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._key: str | None = None
+        self._array_key: str | None = None
+        self._item_start: int | None = None
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        """Consume more text; return the (key, element) pairs completed by it."""
+        self._text += chunk
+        completed: list[tuple[str, Any]] = []
+        text = self._text
+        i = self._pos
+        while i < len(text) and not self.done:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = json.loads(text[self._string_start:i + 1])
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+                self._start_item(i)
+            elif ch in "{[":
+                if self._depth == 0 and ch != "{":
+                    i += 1
+                    continue
+                self._start_item(i)
+                self._depth += 1
+                if self._depth == 2 and ch == "[" and self._key in self.keys:
+                    self._array_key = self._key
+            elif ch in "}]":
+                if self._depth == 0:
+                    i += 1
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                elif self._depth == 1:
+                    self._finish_item(i, completed)
+                    self._array_key = None
+                elif self._depth == 2 and self._item_start is not None and text[self._item_start] in "{[":
+                    self._finish_item(i + 1, completed)
+            elif ch == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif ch == "," and self._depth == 2:
+                self._finish_item(i, completed)
+            elif not ch.isspace():
+                self._start_item(i)
+            i += 1
+        self._pos = i
+        self._trim()
+        return completed
+
+    def _trim(self) -> None:
+        """Drop the text before anything still needed and rebase the offsets."""
+        keep = self._pos
+        if self._item_start is not None:
+            keep = min(keep, self._item_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if keep == 0:
+            return
+        self._text = self._text[keep:]
+        self._pos -= keep
+        self._string_start -= keep
+        if self._item_start is not None:
+            self._item_start -= keep
+
+    def _start_item(self, i: int) -> None:
+        if self._depth == 2 and self._array_key is not None and self._item_start is None:
+            self._item_start = i
+
+    def _finish_item(self, end: int, completed: list[tuple[str, Any]]) -> None:
+        if self._array_key is None or self._item_start is None:
+            return
+        raw = self._text[self._item_start:end].strip()
+        self._item_start = None
+        if not raw:
+            return
+        item = json.loads(raw)
+        self.items[self._array_key].append(item)
+        completed.append((self._array_key, item))
@@ -0,0 +1,204 @@
+"""
+Opt-in layout template cache keyed by a structural fingerprint of the page map.
+
+Reports come from a handful of templates, so the layout call keeps returning
+the same section structure for pages whose data changed but whose layout did
+not. With LAYOUT_TEMPLATES=1 every accepted GPT layout is stored with the
+structural tokens of the page map(s) it was made for: one token per element,
+made of its type, its bbox quantized to LAYOUT_TEMPLATE_GRID_PT and its text
+with numbers, dates and month names removed. paired_sections re-applies a
+reused layout to the new page map locally (_apply_layout_to_page), so element
+assignment and final regions always come from the current page.
+
+Reuse must never hide a section that exists on only one page, since that is
+what the comparison looks for:
+
+  - paired layouts (ref + test in one call) are reused only when both sides
+    match the stored pair exactly;
+  - single-page layouts are also reused on a near match: the same number of
+    elements of each type and at least LAYOUT_TEMPLATE_MIN_SIMILARITY
+    (multiset Jaccard) of the tokens, so moved or reworded elements still
+    match but an added or removed block does not.
+
+Templates are grouped per layout kind (paired/single), prompt and model
+version and page size, at most LAYOUT_TEMPLATE_BUCKET_SIZE per group (least
+recently used dropped). Lookups and stores read and rewrite a whole group, so
+callers run them off the event loop. A job started with bypass_cache skips
+lookups but still stores its fresh layouts.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any
+
+from . import llm_cache
+from .disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_TEMPLATES_ENABLED = os.environ.get("LAYOUT_TEMPLATES", "0").strip().lower() in ("1", "true", "yes", "on")
+LAYOUT_TEMPLATE_GRID_PT = float(os.environ.get("LAYOUT_TEMPLATE_GRID_PT", "8"))
+LAYOUT_TEMPLATE_MIN_SIMILARITY = float(os.environ.get("LAYOUT_TEMPLATE_MIN_SIMILARITY", "0.9"))
+LAYOUT_TEMPLATE_BUCKET_SIZE = int(os.environ.get("LAYOUT_TEMPLATE_BUCKET_SIZE", "128"))
+LAYOUT_TEMPLATE_CACHE_MAX_BYTES = int(os.environ.get("LAYOUT_TEMPLATE_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Bump when the token format changes
+_TEMPLATE_VERSION = 2
+TEXT_CHARS = 40
+
+_cache = DiskCache("layout_templates", LAYOUT_TEMPLATE_CACHE_MAX_BYTES, suffix=".json")
+
+# Full dates (31.12.2024, 2024-12-31) and month/year (12/2024); plain decimals are numbers
+_DATE_RE = re.compile(r"\b(?:\d{1,2}[./-]\d{1,2}[./-]\d{2,4}|\d{4}-\d{2}(?:-\d{2})?|\d{1,2}[./]\d{4})\b")
+_NUMBER_RE = re.compile(r"[+\-−]?\s*\d[\d'’.,]*\s*%?")
+_MONTH_RE = re.compile(
+    r"\b(?:jan(?:uary|uar)?|j[aä]n(?:ner)?|feb(?:ruary|ruar)?|m[aä]r(?:ch|z)?|apr(?:il)?|ma[iy]|"
+    r"june?|juni|july?|juli|aug(?:ust)?|sep(?:t(?:ember)?)?|o[ck]t(?:ober)?|nov(?:ember)?|"
+    r"de[cz](?:ember)?)\b\.?",
+    re.IGNORECASE,
+)
+
+_metrics_lock = threading.Lock()
+_metrics = {"exact_hits": 0, "near_hits": 0, "misses": 0, "bypassed": 0, "stored": 0}
+
+
+def _count(name: str) -> None:
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def _normalize_text(text: str | None) -> str:
+    if not text:
+        return ""
+    text = _DATE_RE.sub(" ", text)
+    text = _MONTH_RE.sub(" ", text)
+    text = _NUMBER_RE.sub(" # ", text)
+    return " ".join(text.lower().split())[:TEXT_CHARS]
+
+
+def structural_tokens(page_map: dict, prefix: str = "") -> list[str]:
+    """One token per element: type, quantized bbox and number-free text."""
+    grid = LAYOUT_TEMPLATE_GRID_PT
+    tokens = []
+    for element in page_map["elements"]:
+        x0, y0, x1, y1 = (int(v // grid) for v in element["bbox"])
+        tokens.append(f"{prefix}{element['type']}|{x0},{y0},{x1},{y1}|{_normalize_text(element.get('content'))}")
+    tokens.sort()
+    return tokens
+
+
+def _similarity(a: Counter, b: Counter) -> float:
+    union = sum((a | b).values())
+    return sum((a & b).values()) / union if union else 1.0
+
+
+def _type_counts(tokens: list[str]) -> Counter:
+    return Counter(token.split("|", 1)[0] for token in tokens)
+
+
+def _bucket_key(kind: str, context: str, page_maps: list[dict]) -> tuple:
+    size = tuple((round(m["width"]), round(m["height"])) for m in page_maps)
+    return ("layout_template", _TEMPLATE_VERSION, kind, context, size)
+
+
+def _tokens(page_maps: list[dict]) -> list[str]:
+    if len(page_maps) == 1:
+        return structural_tokens(page_maps[0])
+    # Paired: prefix by side so ref and test elements never match each other
+    return sorted(token for i, m in enumerate(page_maps) for token in structural_tokens(m, f"{i}:"))
+
+
+def _fingerprint(tokens: list[str]) -> str:
+    return hashlib.sha256("\n".join(tokens).encode("utf-8")).hexdigest()
+
+
+def _load(key: tuple) -> list[dict[str, Any]]:
+    data = _cache.get(key)
+    if data is None:
+        return []
+    try:
+        return json.loads(data)
+    except ValueError:
+        logger.warning("Ignoring unreadable layout template bucket")
+        return []
+
+
+def _save(key: tuple, templates: list[dict[str, Any]]) -> None:
+    _cache.put(key, json.dumps(templates[:LAYOUT_TEMPLATE_BUCKET_SIZE], separators=(",", ":")).encode("utf-8"))
+
+
+def lookup(kind: str, context: str, page_maps: list[dict]) -> list[list[dict[str, Any]]] | None:
+    """Stored layouts (one per page map) for a structurally matching page, or None.
+
+    context identifies the prompt and model the layouts came from. Blocking:
+    run it in a thread.
+    """
+    if not LAYOUT_TEMPLATES_ENABLED:
+        return None
+    if llm_cache.bypassed():
+        _count("bypassed")
+        return None
+    key = _bucket_key(kind, context, page_maps)
+    templates = _load(key)
+    if not templates:
+        _count("misses")
+        return None
+
+    tokens = _tokens(page_maps)
+    fingerprint = _fingerprint(tokens)
+    # Paired layouts: exact matches only; a near match could absorb a section
+    # added on one side into the stored regions
+    near = kind != "paired"
+    types = _type_counts(tokens)
+    counts = Counter(tokens)
+    best, best_score = None, 0.0
+    for index, template in enumerate(templates):
+        if template["fingerprint"] == fingerprint:
+            best, best_score = index, 1.0
+            break
+        if not near or len(template["tokens"]) != len(tokens) or _type_counts(template["tokens"]) != types:
+            continue
+        score = _similarity(counts, Counter(template["tokens"]))
+        if score > best_score:
+            best, best_score = index, score
+    if best is None or best_score < LAYOUT_TEMPLATE_MIN_SIMILARITY:
+        _count("misses")
+        return None
+
+    template = templates.pop(best)
+    templates.insert(0, template)
+    _save(key, templates)
+    _count("exact_hits" if best_score == 1.0 else "near_hits")
+    logger.debug("%s layout template hit (similarity %.3f)", kind, best_score)
+    return copy.deepcopy(template["layouts"])
+
+
+def store(kind: str, context: str, page_maps: list[dict], layouts: list[list[dict[str, Any]]]) -> None:
+    """Remember an accepted layout (one section list per page map). Blocking: run it in a thread."""
+    if not LAYOUT_TEMPLATES_ENABLED or not any(layouts):
+        return
+    key = _bucket_key(kind, context, page_maps)
+    tokens = _tokens(page_maps)
+    fingerprint = _fingerprint(tokens)
+    templates = [t for t in _load(key) if t["fingerprint"] != fingerprint]
+    templates.insert(0, {"fingerprint": fingerprint, "tokens": tokens, "layouts": layouts})
+    _save(key, templates)
+    _count("stored")
+
+
+def template_metrics() -> dict[str, Any]:
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    lookups = snapshot["exact_hits"] + snapshot["near_hits"] + snapshot["misses"]
+    return {
+        "enabled": LAYOUT_TEMPLATES_ENABLED,
+        "min_similarity": LAYOUT_TEMPLATE_MIN_SIMILARITY,
+        **snapshot,
+        "hit_rate": round((snapshot["exact_hits"] + snapshot["near_hits"]) / lookups, 3) if lookups else 0.0,
+    }
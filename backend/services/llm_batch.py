@@ -0,0 +1,279 @@
+"""
+Batch submission of chat completions.
+
+Requests are written as JSONL in the OpenAI batch input format
+({"custom_id", "method", "url", "body"}), split into files that stay under
+LLM_BATCH_MAX_REQUESTS and LLM_BATCH_MAX_FILE_MB, and handed to a
+BatchBackend. run_batch() submits every file, polls each batch every
+LLM_BATCH_POLL_S seconds and returns the results keyed by custom_id.
+
+Backends are registered by name; LLM_BATCH_BACKEND picks the default:
+
+  * openai: the provider's Batch API (files + batches endpoints). On Azure the
+    resource-level /openai base URL is used, so the body's model must be the
+    deployment name.
+  * local:  file-based stand-in that runs each line through the normal client
+    path (scheduler, retries) in-process and writes an output file in the
+    same format. Meant for testing and small runs.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+from openai.types.chat import ChatCompletion
+
+from . import llm_telemetry
+from .paired_sections import _create_completion, _get_client
+
+logger = logging.getLogger(__name__)
+
+BATCH_DIR = Path(__file__).resolve().parent.parent / "data" / "batches"
+
+LLM_BATCH_BACKEND = os.environ.get("LLM_BATCH_BACKEND", "openai").strip().lower()
+LLM_BATCH_POLL_S = float(os.environ.get("LLM_BATCH_POLL_S", "60"))
+LLM_BATCH_MAX_REQUESTS = int(os.environ.get("LLM_BATCH_MAX_REQUESTS", "50000"))
+LLM_BATCH_MAX_FILE_BYTES = int(os.environ.get("LLM_BATCH_MAX_FILE_MB", "190")) * 1024 * 1024
+
+
+@dataclass
+class BatchResult:
+    response: ChatCompletion | None
+    error: str | None = None
+
+
+class BatchWriter:
+    """Write request lines to one or more JSONL files within the batch limits."""
+
+    def __init__(self, directory: Path, url: str):
+        self.directory = directory
+        self.url = url
+        self.paths: list[Path] = []
+        self.count = 0
+        self._file = None
+        self._lines = 0
+        self._bytes = 0
+
+    def add(self, custom_id: str, body: dict[str, Any]) -> None:
+        line = json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": self.url, "body": body},
+            ensure_ascii=False, separators=(",", ":"),
+        ).encode("utf-8") + b"\n"
+        if (
+            self._file is None
+            or self._lines >= LLM_BATCH_MAX_REQUESTS
+            or self._bytes + len(line) > LLM_BATCH_MAX_FILE_BYTES
+        ):
+            self._next_file()
+        self._file.write(line)
+        self._lines += 1
+        self._bytes += len(line)
+        self.count += 1
+
+    def _next_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"requests_{len(self.paths):03d}.jsonl"
+        self.paths.append(path)
+        self._file = path.open("wb")
+        self._lines = self._bytes = 0
+
+    def close(self) -> list[Path]:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return self.paths
+
+
+def parse_output_line(line: str) -> tuple[str, BatchResult]:
+    """Parse one line of a batch output (or error) file."""
+    row = json.loads(line)
+    custom_id = row["custom_id"]
+    if row.get("error"):
+        return custom_id, BatchResult(None, str(row["error"].get("message") or row["error"]))
+    response = row.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") != 200:
+        message = (body.get("error") or {}).get("message", "")
+        return custom_id, BatchResult(None, f"HTTP {response.get('status_code')}: {message}")
+    return custom_id, BatchResult(ChatCompletion.model_validate(body))
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class BatchBackend(ABC):
+    """Interface: submit a request file, report its state, fetch its results."""
+
+    name = ""
+    url = "/v1/chat/completions"
+
+    @abstractmethod
+    async def submit(self, path: Path) -> str:
+        """Submit a request file; return the batch id."""
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> str:
+        """"running", "completed" (results available, possibly partial) or "failed"."""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        """Results of a completed batch keyed by custom_id."""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    name = "openai"
+
+    def __init__(self):
+        client = _get_client()
+        endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
+        if endpoint:
+            # The chat client is scoped to one deployment; files and batches live on the resource
+            client = client.with_options(base_url=f"{endpoint.rstrip('/')}/openai")
+            self.url = "/chat/completions"
+        self.client = client
+
+    async def submit(self, path: Path) -> str:
+        uploaded = await self.client.files.create(file=path, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id, endpoint=self.url, completion_window="24h",
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return "completed"
+        if batch.status in ("expired", "cancelled"):
+            # Requests finished before expiry/cancellation still have results
+            return "completed" if batch.output_file_id or batch.error_file_id else "failed"
+        if batch.status == "failed":
+            return "failed"
+        return "running"
+
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        batch = await self.client.batches.retrieve(batch_id)
+        results: dict[str, BatchResult] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    custom_id, result = parse_output_line(line)
+                    results[custom_id] = result
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    name = "local"
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def _dir(self, batch_id: str) -> Path:
+        return BATCH_DIR / "local" / batch_id
+
+    async def submit(self, path: Path) -> str:
+        batch_id = f"local_{uuid4().hex[:12]}"
+        directory = self._dir(batch_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, directory / "input.jsonl")
+        self._tasks[batch_id] = asyncio.create_task(self._process(directory))
+        return batch_id
+
+    async def _process(self, directory: Path) -> None:
+        # The batch pipeline records each result against its job; don't count the calls twice
+        llm_telemetry.set_job(llm_telemetry.NO_JOB)
+        lines = (directory / "input.jsonl").read_text(encoding="utf-8").splitlines()
+
+        async def run_line(line: str) -> str:
+            request = json.loads(line)
+            custom_id = request["custom_id"]
+            stage = custom_id.split(":", 1)[0]
+            try:
+                resp = await _create_completion(stage, request["body"])
+            except Exception as e:
+                return json.dumps({"custom_id": custom_id, "response": None, "error": {"message": str(e)}})
+            return json.dumps({
+                "custom_id": custom_id,
+                "response": {"status_code": 200, "body": resp.model_dump(mode="json")},
+                "error": None,
+            })
+
+        # The LLM scheduler bounds how many of these are in flight
+        output = await asyncio.gather(*(run_line(line) for line in lines if line.strip()))
+        temp = directory / "output.tmp"
+        temp.write_text("\n".join(output) + "\n", encoding="utf-8")
+        temp.replace(directory / "output.jsonl")
+
+    async def status(self, batch_id: str) -> str:
+        if (self._dir(batch_id) / "output.jsonl").exists():
+            return "completed"
+        task = self._tasks.get(batch_id)
+        if task is None or task.done():
+            return "failed"
+        return "running"
+
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        self._tasks.pop(batch_id, None)
+        directory = self._dir(batch_id)
+        results: dict[str, BatchResult] = {}
+        for line in (directory / "output.jsonl").read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                custom_id, result = parse_output_line(line)
+                results[custom_id] = result
+        shutil.rmtree(directory, ignore_errors=True)
+        return results
+
+
+BACKENDS: dict[str, type[BatchBackend]] = {
+    OpenAIBatchBackend.name: OpenAIBatchBackend,
+    LocalBatchBackend.name: LocalBatchBackend,
+}
+_instances: dict[str, BatchBackend] = {}
+
+
+def register_backend(name: str, backend: type[BatchBackend]) -> None:
+    BACKENDS[name] = backend
+
+
+def get_backend(name: str | None = None) -> BatchBackend:
+    name = (name or LLM_BATCH_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown batch backend: {name!r}")
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+async def run_batch(
+    backend: BatchBackend, paths: list[Path], on_submit: Callable[[str], None] | None = None,
+) -> dict[str, BatchResult]:
+    """Submit every request file, wait for all batches and collect their results."""
+    batch_ids = []
+    for path in paths:
+        batch_id = await backend.submit(path)
+        logger.info("Submitted batch %s (%s) to %s", batch_id, path.name, backend.name)
+        batch_ids.append(batch_id)
+        if on_submit is not None:
+            on_submit(batch_id)
+
+    results: dict[str, BatchResult] = {}
+    for batch_id in batch_ids:
+        while (state := await backend.status(batch_id)) == "running":
+            await asyncio.sleep(LLM_BATCH_POLL_S)
+        if state == "failed":
+            raise RuntimeError(f"Batch {batch_id} failed")
+        results.update(await backend.results(batch_id))
+    return results
@@ -0,0 +1,130 @@
+"""
+Opt-in disk cache for deterministic LLM responses.
+
+Layout, global and section calls run with temperature=0, top_p=1 and a fixed
+seed, so re-running a job sends byte-identical requests. With LLM_CACHE=1 their
+responses are stored under a fingerprint of the endpoint, model, messages
+(images by the SHA-256 of their data URL), response_format and sampling
+parameters, and served from disk on the next identical request.
+
+A job started with bypass_cache skips lookups (fresh answers are still
+stored); the flag lives in a context variable set by the pipeline task.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from typing import Any
+
+from openai.types.chat import ChatCompletion
+
+from .disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "0").strip().lower() in ("1", "true", "yes", "on")
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Bump when the cached payload format changes
+_CACHE_VERSION = 1
+_FINGERPRINT_PARAMS = ("model", "temperature", "top_p", "max_tokens", "seed", "response_format")
+
+_cache = DiskCache("llm_responses", LLM_CACHE_MAX_BYTES, suffix=".json")
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+_metrics_lock = threading.Lock()
+_metrics = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0}
+
+
+def set_bypass(bypass: bool) -> None:
+    """Skip cache lookups for the rest of the current task (e.g. one job run)."""
+    _bypass.set(bypass)
+
+
+def bypassed() -> bool:
+    """Whether the current task asked to skip cached answers (also honoured by layout_templates)."""
+    return _bypass.get()
+
+
+def _hashed_image(part: dict[str, Any]) -> dict[str, Any]:
+    image = dict(part["image_url"])
+    image["url"] = hashlib.sha256(image["url"].encode("utf-8")).hexdigest()
+    return {**part, "image_url": image}
+
+
+def _hashed_images(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """messages with each image data URL replaced by its SHA-256.
+
+    Hashing releases the GIL and is much cheaper than JSON-encoding
+    megabytes of base64, so fingerprinting stays short even off the event loop.
+    """
+    result = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [_hashed_image(part) if part.get("type") == "image_url" else part for part in content]
+            message = {**message, "content": content}
+        result.append(message)
+    return result
+
+
+def fingerprint(endpoint: str, kwargs: dict[str, Any]) -> str:
+    payload = {
+        "endpoint": endpoint,
+        "messages": _hashed_images(kwargs["messages"]),
+        **{name: kwargs.get(name) for name in _FINGERPRINT_PARAMS},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _count(name: str) -> None:
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def lookup(key: str) -> ChatCompletion | None:
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _bypass.get():
+        _count("bypassed")
+        return None
+    data = _cache.get(("llm", _CACHE_VERSION, key))
+    if data is None:
+        _count("misses")
+        return None
+    try:
+        response = ChatCompletion.model_validate_json(data)
+    except ValueError:
+        logger.warning("Ignoring unreadable cached LLM response %s", key)
+        _count("misses")
+        return None
+    _count("hits")
+    return response
+
+
+def store(key: str, kwargs: dict[str, Any], response: ChatCompletion) -> None:
+    """Cache a complete response; truncated or (for JSON formats) unparseable ones are skipped."""
+    if not LLM_CACHE_ENABLED:
+        return
+    choice = response.choices[0] if response.choices else None
+    if choice is None or choice.finish_reason != "stop":
+        return
+    if kwargs.get("response_format"):
+        try:
+            json.loads(choice.message.content or "")
+        except ValueError:
+            return
+    _cache.put(("llm", _CACHE_VERSION, key), response.model_dump_json().encode("utf-8"))
+    _count("stored")
+
+
+def cache_metrics() -> dict[str, Any]:
+    with _metrics_lock:
+        snapshot: dict[str, Any] = dict(_metrics)
+    snapshot["enabled"] = LLM_CACHE_ENABLED
+    return snapshot
@@ -0,0 +1,39 @@
+"""
+Recording of LLM responses for replay by the mock server.
+
+With LLM_RECORD_DIR set, every successful chat completion is written to
+<dir>/<key>.json, where the key fingerprints the request body (messages,
+model, sampling parameters, response_format) but not the endpoint. Pointing
+the mock server's MOCK_LLM_REPLAY_DIR at the same directory replays these
+responses for identical requests, e.g. to load-test against real answers
+recorded once against Azure.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from .llm_cache import fingerprint
+
+logger = logging.getLogger(__name__)
+
+LLM_RECORD_DIR = os.environ.get("LLM_RECORD_DIR", "").strip()
+
+
+def replay_key(kwargs: dict[str, Any]) -> str:
+    return fingerprint("replay", kwargs)
+
+
+def record(kwargs: dict[str, Any], response: Any) -> None:
+    if not LLM_RECORD_DIR:
+        return
+    directory = Path(LLM_RECORD_DIR)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{replay_key(kwargs)}.json"
+        temp = path.with_suffix(".tmp")
+        temp.write_text(response.model_dump_json(), encoding="utf-8")
+        temp.replace(path)
+    except OSError as e:
+        logger.warning("Could not record LLM response: %s", e)
@@ -0,0 +1,226 @@
+"""
+Retries and hedged requests for LLM calls.
+
+Failures are classified (rate_limit, timeout, connection, server) and each
+class has its own retry policy: number of attempts and a capped exponential
+backoff with full jitter. A 429's Retry-After is used as the minimum delay.
+Policies are overridden per class with an env var, e.g.
+
+    LLM_RETRY_SERVER="attempts=4 base=1 max=30"
+
+With LLM_HEDGE=1 an attempt still running after the stage's recent p95
+latency (times LLM_HEDGE_FACTOR, at least LLM_HEDGE_MIN_DELAY_S) gets a
+duplicate; the first response wins and the other request is cancelled.
+Hedges are only sent while nothing is queued in the scheduler, so they use
+spare capacity only.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+import openai
+
+from .llm_scheduler import retry_after_seconds, scheduler
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "0").strip().lower() in ("1", "true", "yes", "on")
+LLM_HEDGE_FACTOR = float(os.environ.get("LLM_HEDGE_FACTOR", "1.0"))
+LLM_HEDGE_MIN_DELAY_S = float(os.environ.get("LLM_HEDGE_MIN_DELAY_S", "5"))
+LLM_HEDGE_MIN_SAMPLES = 20
+_LATENCY_WINDOW = 200
+
+ERROR_CLASSES = ("rate_limit", "timeout", "connection", "server")
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int  # total attempts, including the first
+    base: float    # seconds; delay before retry n is uniform(0, min(max, base * 2**n))
+    max: float
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max, self.base * 2 ** retry))
+
+
+DEFAULT_POLICIES = {
+    "rate_limit": RetryPolicy(attempts=6, base=2.0, max=60.0),
+    "timeout": RetryPolicy(attempts=3, base=1.0, max=10.0),
+    "connection": RetryPolicy(attempts=4, base=0.5, max=8.0),
+    "server": RetryPolicy(attempts=4, base=1.0, max=20.0),
+}
+
+
+def parse_retry_policy(spec: str, default: RetryPolicy) -> RetryPolicy:
+    """Parse "attempts=4 base=1 max=30" (any subset) on top of a default policy."""
+    values: dict[str, Any] = {"attempts": default.attempts, "base": default.base, "max": default.max}
+    for token in spec.replace(",", " ").split():
+        key, sep, value = token.partition("=")
+        key = key.strip().lower()
+        if not sep or key not in values:
+            raise ValueError(f"Invalid retry policy token: {token!r}")
+        values[key] = int(value) if key == "attempts" else float(value)
+    return RetryPolicy(**values)
+
+
+def _load_policies() -> dict[str, RetryPolicy]:
+    policies: dict[str, RetryPolicy] = {}
+    for name in ERROR_CLASSES:
+        spec = os.environ.get(f"LLM_RETRY_{name.upper()}", "")
+        try:
+            policies[name] = parse_retry_policy(spec, DEFAULT_POLICIES[name])
+        except ValueError as e:
+            logger.error("Ignoring LLM_RETRY_%s: %s", name.upper(), e)
+            policies[name] = DEFAULT_POLICIES[name]
+    return policies
+
+
+_policies = _load_policies()
+
+
+def classify(exc: BaseException) -> str | None:
+    """Error class of a retryable failure, or None if it should not be retried."""
+    if isinstance(exc, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(exc, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(exc, openai.APIConnectionError):
+        return "connection"
+    if isinstance(exc, openai.APIStatusError) and (exc.status_code in (408, 409) or exc.status_code >= 500):
+        return "server"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Latency tracking and metrics
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_latencies: dict[str, deque[float]] = {}
+_metrics: dict[str, int] = {"retries": 0, "gave_up": 0, "hedges": 0, "hedge_wins": 0}
+_retries_by_class: dict[str, int] = {name: 0 for name in ERROR_CLASSES}
+
+
+def _record_latency(stage: str, seconds: float) -> None:
+    with _lock:
+        _latencies.setdefault(stage, deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+
+
+def _p95(stage: str) -> float | None:
+    with _lock:
+        samples = sorted(_latencies.get(stage, ()))
+    if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _metrics[name] += 1
+
+
+def retry_metrics() -> dict[str, Any]:
+    with _lock:
+        snapshot: dict[str, Any] = dict(_metrics)
+        snapshot["retries_by_class"] = dict(_retries_by_class)
+    snapshot["hedging"] = LLM_HEDGE
+    snapshot["p95_latency_s"] = {
+        stage: round(p95, 2) for stage in list(_latencies) if (p95 := _p95(stage)) is not None
+    }
+    snapshot["policies"] = {
+        name: {"attempts": p.attempts, "base": p.base, "max": p.max} for name, p in _policies.items()
+    }
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Hedging and retries
+# ---------------------------------------------------------------------------
+
+def _hedge_delay(stage: str) -> float | None:
+    if not LLM_HEDGE:
+        return None
+    p95 = _p95(stage)
+    if p95 is None:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_S, p95 * LLM_HEDGE_FACTOR)
+
+
+async def _timed(stage: str, attempt: Callable[[], Awaitable[T]]) -> T:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await attempt()
+    _record_latency(stage, loop.time() - start)
+    return result
+
+
+async def _hedged(stage: str, attempt: Callable[[], Awaitable[T]]) -> T:
+    """Run attempt(); if it is still running after the hedge delay, race a duplicate."""
+    delay = _hedge_delay(stage)
+    first = asyncio.ensure_future(_timed(stage, attempt))
+    if delay is None:
+        return await first
+
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and not scheduler.waiting:
+            _count("hedges")
+            logger.debug("%s call slower than %.1fs; sending a hedged request", stage, delay)
+            tasks.append(asyncio.ensure_future(_timed(stage, attempt)))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        _count("hedge_wins")
+                    return task.result()
+        # Every request failed: surface the original one's error
+        return first.result()
+    finally:
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+
+async def call_with_retries(
+    stage: str, attempt: Callable[[], Awaitable[T]], on_retry: Callable[[str], None] | None = None,
+) -> T:
+    """Run attempt() with hedging and per-error-class retries; on_retry gets each retry's error class."""
+    retries: dict[str, int] = {}
+    while True:
+        try:
+            return await _hedged(stage, attempt)
+        except Exception as e:
+            error_class = classify(e)
+            if error_class is None:
+                raise
+            policy = _policies[error_class]
+            n = retries.get(error_class, 0)
+            if n + 1 >= policy.attempts:
+                _count("gave_up")
+                logger.error("%s call failed after %d %s retries: %s", stage, n, error_class, e)
+                raise
+            retries[error_class] = n + 1
+            delay = policy.delay(n)
+            if error_class == "rate_limit":
+                delay = max(delay, retry_after_seconds(e) or 0.0)
+            with _lock:
+                _metrics["retries"] += 1
+                _retries_by_class[error_class] += 1
+            logger.warning("%s call failed (%s: %s); retry in %.1fs", stage, error_class, e, delay)
+            if on_retry is not None:
+                on_retry(error_class)
+            await asyncio.sleep(delay)
@@ -0,0 +1,251 @@
+"""
+Process-wide scheduler for LLM requests.
+
+Every chat completion (layout, global, section and chat) goes through run(),
+so concurrent jobs share one budget instead of each pipeline sizing its own
+semaphore. A request waits until
+
+  * fewer than the current concurrency limit are in flight,
+  * the last minute has room under LLM_RPM_LIMIT requests and LLM_TPM_LIMIT
+    tokens (0 = unlimited), and
+  * no Retry-After pause from a 429 is active.
+
+The concurrency limit adapts (AIMD): it grows by one after a limit's worth of
+successful calls and halves on a 429 or, with LLM_LATENCY_TARGET_S set, on a
+call slower than the target. Token use is estimated up front like Azure does
+(prompt estimate + max_tokens) and corrected with the response's usage.
+
+The OpenAI SDK's own retries are disabled so every 429 reaches the scheduler;
+each run() is a single attempt and llm_retry decides whether to try again.
+
+The pipelines bound the pages they prepare at once with PIPELINE_CONCURRENCY
+(default: LLM_MAX_CONCURRENCY) only to cap memory; the scheduler sets the pace.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+LLM_RPM_LIMIT = int(os.environ.get("LLM_RPM_LIMIT", "0"))
+LLM_TPM_LIMIT = int(os.environ.get("LLM_TPM_LIMIT", "0"))
+LLM_MIN_CONCURRENCY = int(os.environ.get("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_INITIAL_CONCURRENCY = int(os.environ.get("LLM_INITIAL_CONCURRENCY", "8"))
+# Pages each pipeline run keeps in flight; by default enough to reach the
+# scheduler's ceiling, so the scheduler, not the pipeline, limits a single job
+PIPELINE_CONCURRENCY = int(os.environ.get("PIPELINE_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+LLM_LATENCY_TARGET_S = float(os.environ.get("LLM_LATENCY_TARGET_S", "0"))  # 0 = ignore latency
+LLM_IMAGE_TOKENS = int(os.environ.get("LLM_IMAGE_TOKENS", "1000"))  # estimate per image part
+
+WINDOW_S = 60.0
+CHARS_PER_TOKEN = 4
+# Minimum time between two multiplicative decreases, so one burst of 429s halves once
+_DECREASE_COOLDOWN_S = 5.0
+# Pause after a 429 without a Retry-After header
+_DEFAULT_PAUSE_S = 1.0
+
+T = TypeVar("T")
+
+
+def estimate_request_tokens(kwargs: dict[str, Any]) -> int:
+    """Rough token cost of a chat request: text chars / 4, a flat cost per image, plus max_tokens."""
+    chars = 0
+    images = 0
+    for message in kwargs.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += 1
+            elif part.get("type") == "text":
+                chars += len(part["text"])
+    return math.ceil(chars / CHARS_PER_TOKEN) + images * LLM_IMAGE_TOKENS + int(kwargs.get("max_tokens") or 0)
+
+
+def retry_after_seconds(exc: openai.APIStatusError) -> float | None:
+    headers = exc.response.headers if exc.response is not None else {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+class LLMScheduler:
+    def __init__(self):
+        self.limit = max(LLM_MIN_CONCURRENCY, min(LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY))
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond: asyncio.Condition | None = None
+        self._requests: deque[float] = deque()
+        self._tokens: deque[list] = deque()  # [start time, tokens]; tokens corrected on completion
+        self._window_tokens = 0
+        self._paused_until = 0.0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self.stats = {
+            "calls": 0, "succeeded": 0, "rate_limited": 0, "failed": 0, "cancelled": 0,
+            "queue_wait_s": 0.0, "max_queue_wait_s": 0.0,
+        }
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _prune(self, now: float) -> None:
+        while self._requests and self._requests[0] <= now - WINDOW_S:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= now - WINDOW_S:
+            self._window_tokens -= self._tokens.popleft()[1]
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        """Seconds until the budgets allow this request (0 = now, inf = wait for a release)."""
+        self._prune(now)
+        waits = [0.0]
+        if now < self._paused_until:
+            waits.append(self._paused_until - now)
+        if LLM_RPM_LIMIT and len(self._requests) >= LLM_RPM_LIMIT:
+            waits.append(self._requests[0] + WINDOW_S - now)
+        # A single request larger than the whole budget is let through on an empty window
+        if LLM_TPM_LIMIT and self._tokens and self._window_tokens + tokens > LLM_TPM_LIMIT:
+            waits.append(self._tokens[0][0] + WINDOW_S - now)
+        wait = max(waits)
+        if wait <= 0 and self.in_flight >= self.limit:
+            return math.inf
+        return wait
+
+    async def _acquire(self, tokens: int) -> list:
+        cond = self._condition()
+        start = time.monotonic()
+        async with cond:
+            self.waiting += 1
+            try:
+                while True:
+                    wait = self._wait_time(time.monotonic(), tokens)
+                    if wait <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(cond.wait(), None if wait == math.inf else wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self.waiting -= 1
+            now = time.monotonic()
+            self.in_flight += 1
+            self._requests.append(now)
+            entry = [now, tokens]
+            self._tokens.append(entry)
+            self._window_tokens += tokens
+        waited = now - start
+        self.stats["queue_wait_s"] += waited
+        self.stats["max_queue_wait_s"] = max(self.stats["max_queue_wait_s"], waited)
+        return entry
+
+    def _decrease(self, now: float, reason: str) -> None:
+        if now - self._last_decrease < _DECREASE_COOLDOWN_S:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        new_limit = max(LLM_MIN_CONCURRENCY, self.limit // 2)
+        if new_limit != self.limit:
+            logger.info("LLM concurrency %d -> %d (%s)", self.limit, new_limit, reason)
+            self.limit = new_limit
+
+    async def _release(
+        self, entry: list, *, used_tokens: int | None = None, latency: float | None = None,
+        rate_limited: bool = False, retry_after: float | None = None,
+    ) -> None:
+        cond = self._condition()
+        async with cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            self._prune(now)
+            if used_tokens is not None and entry[0] > now - WINDOW_S:
+                self._window_tokens += used_tokens - entry[1]
+                entry[1] = used_tokens
+            if rate_limited:
+                self._paused_until = max(self._paused_until, now + (retry_after or _DEFAULT_PAUSE_S))
+                self._decrease(now, "rate limited")
+            elif latency is not None:
+                if LLM_LATENCY_TARGET_S and latency > LLM_LATENCY_TARGET_S:
+                    self._decrease(now, f"latency {latency:.1f}s")
+                else:
+                    self._successes += 1
+                    if self._successes >= self.limit and self.limit < LLM_MAX_CONCURRENCY:
+                        self._successes = 0
+                        self.limit += 1
+            cond.notify_all()
+
+    async def run(self, stage: str, call: Callable[[], Awaitable[T]], tokens: int) -> T:
+        """Run one attempt of call() under the scheduler; retrying is up to the caller."""
+        self.stats["calls"] += 1
+        entry = await self._acquire(tokens)
+        start = time.monotonic()
+        try:
+            result = await call()
+        except openai.RateLimitError as e:
+            retry_after = retry_after_seconds(e)
+            self.stats["rate_limited"] += 1
+            logger.warning("%s call rate limited (retry after %s s)", stage, retry_after)
+            await self._release(entry, used_tokens=0, rate_limited=True, retry_after=retry_after)
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            await self._release(entry)
+            raise
+        except BaseException:
+            # Cancelled, e.g. the losing request of a hedged pair
+            self.stats["cancelled"] += 1
+            await asyncio.shield(self._release(entry))
+            raise
+        usage = getattr(result, "usage", None)
+        await self._release(
+            entry,
+            used_tokens=getattr(usage, "total_tokens", None),
+            latency=time.monotonic() - start,
+        )
+        self.stats["succeeded"] += 1
+        return result
+
+    def metrics(self) -> dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        return {
+            "concurrency_limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests_last_minute": len(self._requests),
+            "tokens_last_minute": self._window_tokens,
+            "rpm_limit": LLM_RPM_LIMIT or None,
+            "tpm_limit": LLM_TPM_LIMIT or None,
+            "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+            **self.stats,
+            "queue_wait_s": round(self.stats["queue_wait_s"], 3),
+            "max_queue_wait_s": round(self.stats["max_queue_wait_s"], 3),
+        }
+
+
+scheduler = LLMScheduler()
+
+
+async def run(stage: str, call: Callable[[], Awaitable[T]], tokens: int) -> T:
+    return await scheduler.run(stage, call, tokens)
+
+
+def scheduler_metrics() -> dict[str, Any]:
+    return scheduler.metrics()
@@ -0,0 +1,158 @@
+"""
+Streamed chat completions with incremental result publishing.
+
+With LLM_STREAMING=1, calls that can use partial results (layout and section
+checks) are sent with stream=True. The text is fed to a JsonArrayStream, and
+on_partial receives a snapshot of all array elements parsed so far whenever a
+new one completes. Snapshots (not deltas) keep publishing idempotent when an
+attempt is retried.
+
+Streaming also surfaces bad responses early:
+
+  * a stream that sends nothing for LLM_STREAM_STALL_S after its first chunk
+    raises APITimeoutError, which llm_retry retries like any timeout;
+  * a stream that ends without a finish_reason raises APIConnectionError;
+  * finish_reason "length" (truncated at max_tokens) is logged and counted.
+
+The chunks are assembled back into a ChatCompletion, so callers, the
+scheduler (usage) and the response cache see the same object as before.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import openai
+from openai.types.chat import ChatCompletion
+
+from .json_stream import JsonArrayStream
+
+logger = logging.getLogger(__name__)
+
+LLM_STREAMING = os.environ.get("LLM_STREAMING", "0").strip().lower() in ("1", "true", "yes", "on")
+LLM_STREAM_STALL_S = float(os.environ.get("LLM_STREAM_STALL_S", "30"))
+
+_metrics_lock = threading.Lock()
+_metrics: dict[str, Any] = {
+    "streams": 0,
+    "completed": 0,
+    "stalled": 0,
+    "ended_early": 0,
+    "truncated": 0,
+    "partials_published": 0,
+    "first_item_s": 0.0,
+    "first_items": 0,
+}
+
+
+def _count(name: str, value: float = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] += value
+
+
+def stream_metrics() -> dict[str, Any]:
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    first_items = snapshot.pop("first_items")
+    first_item_s = snapshot.pop("first_item_s")
+    snapshot["avg_first_item_s"] = round(first_item_s / first_items, 2) if first_items else None
+    snapshot["enabled"] = LLM_STREAMING
+    return snapshot
+
+
+async def stream_completion(
+    stage: str,
+    create: Callable[..., Any],
+    kwargs: dict[str, Any],
+    keys: tuple[str, ...],
+    on_partial: Callable[[dict[str, list[Any]]], None],
+) -> ChatCompletion:
+    """Run create(**kwargs) as a stream, publishing parsed array elements as they arrive."""
+    _count("streams")
+    start = time.monotonic()
+    stream = await create(**kwargs, stream=True, stream_options={"include_usage": True})
+    parser: JsonArrayStream | None = JsonArrayStream(keys)
+    parts: list[str] = []
+    finish_reason: str | None = None
+    usage = None
+    first: Any = None
+    published_first = False
+    timeout: float | None = None  # the first chunk is bounded by the HTTP read timeout
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                _count("stalled")
+                logger.warning(
+                    "%s stream stalled for %.1fs after %d chars", stage, timeout, sum(map(len, parts)),
+                )
+                raise openai.APITimeoutError(request=stream.response.request) from None
+            timeout = LLM_STREAM_STALL_S or None
+            if first is None:
+                first = chunk
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+            text = choice.delta.content if choice.delta else None
+            if not text:
+                continue
+            parts.append(text)
+            if parser is None:
+                continue
+            try:
+                completed = parser.feed(text)
+            except ValueError as e:
+                # Keep streaming; the caller still parses the full text as before
+                logger.warning("%s stream is not incrementally parseable: %s", stage, e)
+                parser = None
+                continue
+            if completed:
+                if not published_first:
+                    published_first = True
+                    _count("first_items")
+                    _count("first_item_s", time.monotonic() - start)
+                _count("partials_published")
+                try:
+                    on_partial({key: list(items) for key, items in parser.items.items()})
+                except Exception as e:
+                    logger.warning("%s partial result handler failed: %s", stage, e)
+    finally:
+        await stream.close()
+
+    if finish_reason is None:
+        _count("ended_early")
+        raise openai.APIConnectionError(
+            message=f"{stage} stream ended without a finish reason", request=stream.response.request,
+        )
+    if finish_reason == "length":
+        _count("truncated")
+        logger.warning(
+            "%s response truncated at max_tokens=%s (%d array items parsed)",
+            stage, kwargs.get("max_tokens"), sum(len(items) for items in parser.items.values()) if parser else 0,
+        )
+    _count("completed")
+    return ChatCompletion.model_validate({
+        "id": first.id,
+        "created": first.created,
+        "model": first.model,
+        "object": "chat.completion",
+        "system_fingerprint": first.system_fingerprint,
+        "choices": [{
+            "index": 0,
+            "finish_reason": finish_reason,
+            "message": {"role": "assistant", "content": "".join(parts)},
+        }],
+        "usage": usage.model_dump() if usage is not None else None,
+    })
@@ -0,0 +1,130 @@
+"""
+Per-call LLM telemetry, aggregated per job.
+
+_create_completion records one CallRecord per logical call (retries and
+hedges included): stage, wall time, scheduler queue wait, prompt /
+completion / cached tokens, image and text bytes, retries, cache hits and
+the outcome. Each record is logged as one JSON line ("llm_call {...}") and
+added to the totals of the job the call ran for. Pipelines tag their task
+with set_job(); calls outside a job (e.g. scripts) count under "-". Batch
+results are recorded by the batch pipeline with variant "batch" (tokens and
+outcome only: there is no per-request timing).
+
+GET /api/jobs/{job_id}/telemetry serves job_telemetry(). Totals live in
+memory for the last TELEMETRY_MAX_JOBS jobs.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_MAX_JOBS = int(os.environ.get("TELEMETRY_MAX_JOBS", "200"))
+NO_JOB = "-"
+
+_job_id: ContextVar[str] = ContextVar("llm_telemetry_job", default=NO_JOB)
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, dict[str, dict[str, Any]]]" = OrderedDict()
+
+_SUMMED = (
+    "wall_s", "queue_wait_s", "prompt_tokens", "completion_tokens", "cached_tokens",
+    "image_bytes", "text_bytes", "images", "attempts", "retries",
+)
+
+
+@dataclass
+class CallRecord:
+    stage: str
+    variant: str = ""
+    job_id: str = NO_JOB
+    model: str = ""
+    streamed: bool = False
+    cache_hit: bool = False
+    outcome: str = "ok"  # ok | error | cancelled
+    error: str = ""
+    wall_s: float = 0.0
+    queue_wait_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    images: int = 0
+    image_bytes: int = 0
+    text_bytes: int = 0
+    attempts: int = 0
+    retries: int = 0
+
+    def add_usage(self, resp: Any) -> None:
+        usage = getattr(resp, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens = usage.prompt_tokens or 0
+        self.completion_tokens = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+
+def set_job(job_id: str) -> None:
+    """Attribute LLM calls in the rest of the current task to job_id."""
+    _job_id.set(job_id)
+
+
+def new_call(stage: str, variant: str, kwargs: dict[str, Any]) -> CallRecord:
+    return CallRecord(stage=stage, variant=variant, job_id=_job_id.get(), model=str(kwargs.get("model", "")))
+
+
+def record(call: CallRecord) -> None:
+    call.wall_s = round(call.wall_s, 3)
+    call.queue_wait_s = round(call.queue_wait_s, 3)
+    logger.info("llm_call %s", json.dumps(asdict(call), separators=(",", ":")))
+
+    key = f"{call.stage}_{call.variant}" if call.variant else call.stage
+    with _lock:
+        stages = _jobs.get(call.job_id)
+        if stages is None:
+            stages = _jobs[call.job_id] = {}
+            while len(_jobs) > TELEMETRY_MAX_JOBS:
+                _jobs.popitem(last=False)
+        else:
+            _jobs.move_to_end(call.job_id)
+        stats = stages.setdefault(key, {
+            "calls": 0, "errors": 0, "cache_hits": 0, "streamed": 0,
+            **{name: 0 for name in _SUMMED}, "max_wall_s": 0.0,
+        })
+        stats["calls"] += 1
+        stats["errors"] += call.outcome == "error"
+        stats["cache_hits"] += call.cache_hit
+        stats["streamed"] += call.streamed
+        for name in _SUMMED:
+            stats[name] += getattr(call, name)
+        stats["max_wall_s"] = max(stats["max_wall_s"], call.wall_s)
+
+
+def _rounded(stats: dict[str, Any]) -> dict[str, Any]:
+    out = {k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()}
+    live = stats["calls"] - stats["cache_hits"]
+    out["avg_wall_s"] = round(stats["wall_s"] / live, 3) if live else 0.0
+    return out
+
+
+def job_telemetry(job_id: str) -> dict[str, Any]:
+    """Per-stage totals for a job's LLM calls (stage_variant keys) and their sum."""
+    with _lock:
+        stages = {key: dict(stats) for key, stats in _jobs.get(job_id, {}).items()}
+    if not stages:
+        return {"job_id": job_id, "stages": {}, "total": {}}
+    total: dict[str, Any] = {}
+    for stats in stages.values():
+        for name, value in stats.items():
+            total[name] = max(total.get(name, 0), value) if name == "max_wall_s" else total.get(name, 0) + value
+    return {
+        "job_id": job_id,
+        "stages": {key: _rounded(stats) for key, stats in sorted(stages.items())},
+        "total": _rounded(total),
+    }
@@ -0,0 +1,82 @@
+"""
+Event-loop lag monitor.
+
+A background task sleeps for a fixed interval and records how late it wakes
+up. The delay is the time the loop was blocked by synchronous work, i.e. how
+long any request (including polling and file serving) had to wait for a turn.
+Recent samples back the /api/metrics/event-loop endpoint; stalls above
+LOOP_LAG_WARN_MS are logged.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_INTERVAL_MS = float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", "100"))
+LOOP_LAG_WARN_MS = float(os.environ.get("LOOP_LAG_WARN_MS", "250"))
+_SAMPLE_WINDOW = 3000  # ~5 minutes at the default interval
+
+_samples: deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+_stats = {"samples": 0, "max_lag_ms": 0.0, "stalls": 0}
+_task: asyncio.Task | None = None
+
+
+async def _monitor() -> None:
+    interval = LOOP_MONITOR_INTERVAL_MS / 1000
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = max(0.0, (time.perf_counter() - start - interval) * 1000)
+        _samples.append(lag_ms)
+        _stats["samples"] += 1
+        _stats["max_lag_ms"] = max(_stats["max_lag_ms"], lag_ms)
+        if lag_ms >= LOOP_LAG_WARN_MS:
+            _stats["stalls"] += 1
+            logger.warning("Event loop blocked for %.0f ms", lag_ms)
+
+
+def start() -> None:
+    global _task
+    if _task is None and LOOP_MONITOR_INTERVAL_MS > 0:
+        _task = asyncio.get_running_loop().create_task(_monitor())
+
+
+async def stop() -> None:
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def loop_metrics() -> dict[str, Any]:
+    recent = sorted(_samples)
+    metrics: dict[str, Any] = {
+        "interval_ms": LOOP_MONITOR_INTERVAL_MS,
+        "warn_ms": LOOP_LAG_WARN_MS,
+        "running": _task is not None,
+        **_stats,
+        "window": len(recent),
+    }
+    if recent:
+        metrics.update({
+            "mean_lag_ms": round(sum(recent) / len(recent), 2),
+            "p50_lag_ms": round(_percentile(recent, 0.50), 2),
+            "p95_lag_ms": round(_percentile(recent, 0.95), 2),
+            "p99_lag_ms": round(_percentile(recent, 0.99), 2),
+            "window_max_lag_ms": round(recent[-1], 2),
+        })
+    metrics["max_lag_ms"] = round(metrics["max_lag_ms"], 2)
+    return metrics
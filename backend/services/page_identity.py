@@ -0,0 +1,247 @@
+"""
+Identity pre-pass: find reference/test pages that are identical.
+
+Report pairs often share pages verbatim (disclaimers, glossaries, static
+appendices). Each page pair is checked from cheapest to most expensive:
+
+  1. file:     the two PDFs have the same content hash (every page matches);
+  2. content:  same page geometry, content stream, resources (every
+               object and stream the page's /Resources and transparency
+               group reference), and annotations and form fields (values
+               and appearance streams);
+  3. page map: the extracted page maps hold different elements -> not
+               identical (stop here); element ids and text order, which
+               follow drawing order, are ignored;
+  4. pixels:   equal page maps, confirmed by hashing both pages rendered at
+               PAGE_IDENTITY_DPI.
+
+The result is stored per pair (PdfPair.identical_pages) the first time a
+pipeline needs it. The pipelines then mirror the reference layout onto the
+test page and record global and section checks as "skipped" for identical
+pages instead of asking GPT: identity says nothing about checks of the page
+itself (rendering, legibility, language), so they are not reported as
+passed. Layout analysis starts each page as soon as its own check is done
+(start_checks/finish_checks); the other pipelines check the whole job first.
+PAGE_IDENTITY=0 turns the pre-pass off.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections.abc import Awaitable
+from pathlib import Path
+
+import fitz
+
+from ..models import JobMetadata
+from . import job_store
+from .cpu_pool import run_cpu_background
+from .doc_pool import open_fitz
+from .page_map import extract_page_map
+from .pdf_utils import file_hash
+
+logger = logging.getLogger(__name__)
+
+PAGE_IDENTITY_ENABLED = os.environ.get("PAGE_IDENTITY", "1").strip().lower() not in ("0", "false", "no", "off")
+PAGE_IDENTITY_DPI = int(os.environ.get("PAGE_IDENTITY_DPI", "100"))
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
+
+# Annotation keys that change what is drawn (NM and P are per-file identifiers)
+_ANNOT_KEYS = ("Subtype", "Rect", "Contents", "V", "AS", "F", "FT", "DA", "Q", "C", "IC", "BS")
+_REF_RE = re.compile(r"\b(\d+) \d+ R\b")
+# Back references to the page tree, not followed
+_UP_REF_RE = re.compile(r"/(?:Parent|P)\s*\d+ \d+ R\b")
+# Page entries hashed with everything they reference
+_PAGE_KEYS = ("Resources", "Group")
+_MAX_TREE_DEPTH = 32
+
+IDENTICAL_EXPLANATION = "Skipped: the test page is identical to the reference page and was not checked."
+
+
+def _resolve_path(job_id: str, category: str, filename: str) -> str:
+    return str(UPLOADS_DIR / job_id / category / filename)
+
+
+def _content_digest(pdf_path: str, page_num: int) -> str:
+    digest = hashlib.sha256()
+    with open_fitz(pdf_path) as doc:
+        page = doc[page_num - 1]
+        digest.update(repr((tuple(page.rect), page.rotation)).encode())
+        digest.update(page.read_contents())
+        for key in _PAGE_KEYS:
+            _object_digest(doc, _page_key(doc, page.xref, key, inherit=key == "Resources"), digest)
+        for xref, annot_type, _ in page.annot_xrefs():
+            _annotation_digest(doc, xref, annot_type, digest)
+    return digest.hexdigest()
+
+
+def _page_key(doc: fitz.Document, xref: int, key: str, inherit: bool) -> str:
+    """A page dictionary entry as PDF source; with inherit, looked up the page tree if absent."""
+    for _ in range(_MAX_TREE_DEPTH):
+        kind, value = doc.xref_get_key(xref, key)
+        if kind != "null":
+            return f"/{key} {value}"
+        if not inherit:
+            break
+        kind, parent = doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            break
+        xref = int(parent.split()[0])
+    return f"/{key} null"
+
+
+def _object_digest(doc: fitz.Document, source: str, digest) -> None:
+    """Hash PDF object source and every object it references, streams included.
+
+    Object numbers differ between files, so references are replaced by their
+    order of discovery. Covers everything a page's resources can change:
+    fonts, images (with SMask, Decode, colour space), form XObjects and
+    their own resources, ExtGState, Shading, Pattern and ColorSpace.
+    """
+    order: dict[int, int] = {}
+    pending: list[int] = []
+
+    def normalize(text: str) -> str:
+        def ref(match: re.Match) -> str:
+            xref = int(match.group(1))
+            if xref not in order:
+                order[xref] = len(order)
+                pending.append(xref)
+            return f"@{order[xref]}"
+        return _REF_RE.sub(ref, _UP_REF_RE.sub("", text))
+
+    digest.update(normalize(source).encode())
+    while pending:
+        xref = pending.pop(0)
+        digest.update(f"@{order[xref]}:".encode())
+        digest.update(normalize(doc.xref_object(xref, compressed=True)).encode())
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b"")
+
+
+def _annotation_digest(doc: fitz.Document, xref: int, annot_type: int, digest) -> None:
+    """Hash an annotation or form widget: its visible values and appearance streams.
+
+    Annotations are drawn on top of the content stream (and rendered for
+    GPT), so a changed note or field value must break content identity.
+    """
+    digest.update(repr(annot_type).encode())
+    for key in _ANNOT_KEYS:
+        digest.update(repr((key, doc.xref_get_key(xref, key))).encode())
+    # Normal appearance: one stream, or one per state (checkboxes, radio buttons)
+    _, appearance = doc.xref_get_key(xref, "AP/N")
+    for ref in _REF_RE.findall(appearance):
+        digest.update(doc.xref_stream_raw(int(ref)) or b"")
+
+
+def _pixel_digest(pdf_path: str, page_num: int) -> str:
+    scale = PAGE_IDENTITY_DPI / 72
+    with open_fitz(pdf_path) as doc:
+        pix = doc[page_num - 1].get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+    return hashlib.sha256(pix.samples).hexdigest()
+
+
+def _page_map_signature(page_map: dict) -> tuple:
+    return (
+        page_map["width"],
+        page_map["height"],
+        sorted(
+            (e["type"], tuple(e["bbox"]), tuple(sorted((e.get("content") or "").split())))
+            for e in page_map["elements"]
+        ),
+    )
+
+
+def page_identity(ref_path: str, test_path: str, page_num: int) -> str | None:
+    """How page page_num of both PDFs was found identical ("file", "content", "pixels"), or None."""
+    if file_hash(ref_path) == file_hash(test_path):
+        return "file"
+    if _content_digest(ref_path, page_num) == _content_digest(test_path, page_num):
+        return "content"
+    ref_signature = _page_map_signature(extract_page_map(ref_path, page_num))
+    if ref_signature != _page_map_signature(extract_page_map(test_path, page_num)):
+        return None
+    if _pixel_digest(ref_path, page_num) == _pixel_digest(test_path, page_num):
+        return "pixels"
+    return None
+
+
+async def _check_page(ref_path: str, test_path: str, page_num: int) -> bool:
+    try:
+        return await run_cpu_background(page_identity, ref_path, test_path, page_num) is not None
+    except Exception as e:
+        logger.warning("identity check failed %s p%d: %s", test_path, page_num, e)
+        return False
+
+
+def _resolved(value: bool) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(value)
+    return future
+
+
+def _same_file(ref_path: str, test_path: str) -> bool:
+    return file_hash(ref_path) == file_hash(test_path)
+
+
+def checked_pages(job: JobMetadata) -> dict[str, set[int]]:
+    """Identical page numbers per pair_id from earlier checks; empty when the pre-pass is off."""
+    if not PAGE_IDENTITY_ENABLED:
+        return {}
+    return {pair.pair_id: set(pair.identical_pages or []) for pair in job.pairs}
+
+
+async def start_checks(job: JobMetadata) -> dict[str, dict[int, Awaitable[bool]]]:
+    """Start checking every page of the pairs not yet checked, in page order.
+
+    Returns one awaitable per page (True when identical) per pair_id, so a
+    pipeline can start on a page as soon as its own check is done. Pass the
+    result to finish_checks() to record it on the job.
+    """
+    if not PAGE_IDENTITY_ENABLED:
+        return {}
+    pairs = [pair for pair in job.pairs if pair.identical_pages is None]
+    paths = [
+        (_resolve_path(job.job_id, "reference", pair.filename), _resolve_path(job.job_id, "test", pair.filename))
+        for pair in pairs
+    ]
+    # Hashing a cold file reads all of it: keep it off the event loop
+    same_files = await asyncio.gather(
+        *(asyncio.to_thread(_same_file, ref_path, test_path) for ref_path, test_path in paths),
+        return_exceptions=True,
+    )
+    checks: dict[str, dict[int, Awaitable[bool]]] = {}
+    for pair, (ref_path, test_path), same_file in zip(pairs, paths, same_files):
+        if isinstance(same_file, Exception):
+            logger.warning("identity check failed job=%s pair=%s: %s", job.job_id, pair.pair_id, same_file)
+            checks[pair.pair_id] = {}
+            continue
+        # Pages present in only one file are never identical
+        pages = range(1, min(pair.page_count_reference, pair.page_count_test) + 1)
+        checks[pair.pair_id] = {
+            pg: _resolved(True) if same_file else asyncio.create_task(_check_page(ref_path, test_path, pg))
+            for pg in pages
+        }
+    return checks
+
+
+async def finish_checks(job: JobMetadata, checks: dict[str, dict[int, Awaitable[bool]]]) -> dict[str, set[int]]:
+    """Record the outcome of start_checks(); identical page numbers per pair_id."""
+    if checks:
+        for pair in job.pairs:
+            pages = checks.get(pair.pair_id)
+            if pages is None:
+                continue
+            outcomes = await asyncio.gather(*pages.values())
+            pair.identical_pages = [pg for pg, same in zip(pages, outcomes) if same]
+        job.identical_pages = sum(len(pair.identical_pages or []) for pair in job.pairs)
+        job_store.persist_job(job)
+        logger.info("job=%s: %d identical page pairs", job.job_id, job.identical_pages)
+    return checked_pages(job)
+
+
+async def identical_pages(job: JobMetadata) -> dict[str, set[int]]:
+    """Identical page numbers per pair_id, checking pairs not yet checked."""
+    return await finish_checks(job, await start_checks(job))
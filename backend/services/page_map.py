@@ -1,13 +1,139 @@
 """
 PDF page map extraction using v5 pipeline:
 raw elements → recursive rect merge → proximity merge.
+
+Raw elements come from pdfplumber or, with PAGE_MAP_BACKEND=pymupdf, from
+PyMuPDF's words and drawings in the same schema. Page maps are cached on disk
+by (file content hash, page, EXTRACTOR_VERSION), so layout detection, section
+chat and reruns share one extraction.
+
+Internally elements are kept as a structure of arrays (PageElements: an
+(n, 4) bbox matrix, type codes and interned contents) and are only turned
+into dicts when the page map is built.
 """
 
-import pdfplumber
+import heapq
+import json
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+import numpy as np
+
+from .disk_cache import DiskCache
+from .doc_pool import open_fitz, open_pdfplumber
+from .pdf_utils import file_hash
 
 
 MERGE_TOLERANCE = 1  # pts for rect touching
 PROXIMITY_GAP = 6    # pts for nearby element merging
+GRID_CELL_SIZE = 32  # pts per spatial-index cell
+
+# Raw element extraction backend: "pdfplumber" (reference) or "pymupdf" (~8x faster).
+# Known differences (tests/test_page_map_parity.py): word, curve and image
+# counts match, and PyMuPDF word boxes start ~1.4 pt higher (at the font
+# ascender). PyMuPDF returns one path per fill+stroke operation where pdfminer
+# emits a rect for each, so rect counts are ~8% lower (lines ~3%), and on pages
+# with framed boxes or table rules the rect merge groups differently: those
+# pages can end up with fewer, larger merged blocks than with pdfplumber.
+PAGE_MAP_BACKEND = os.environ.get("PAGE_MAP_BACKEND", "pdfplumber").strip().lower()
+if PAGE_MAP_BACKEND not in ("pdfplumber", "pymupdf"):
+    raise ValueError(f"Unknown PAGE_MAP_BACKEND: {PAGE_MAP_BACKEND!r}")
+
+# Bump whenever extraction or merging changes its output, to invalidate cached maps
+EXTRACTOR_VERSION = f"v5-{PAGE_MAP_BACKEND}-1"
+PAGE_MAP_CACHE_MAX_BYTES = int(os.environ.get("PAGE_MAP_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+_cache = DiskCache("page_maps", PAGE_MAP_CACHE_MAX_BYTES, suffix=".json")
+
+ELEMENT_TYPES = (
+    "text", "rect", "line", "curve", "image",
+    "merged", "text_block", "drawing_block", "mixed_block",
+)
+_TYPE_CODES = {name: code for code, name in enumerate(ELEMENT_TYPES)}
+TEXT, RECT, LINE, CURVE, IMAGE, MERGED, TEXT_BLOCK, DRAWING_BLOCK, MIXED_BLOCK = range(len(ELEMENT_TYPES))
+
+
+class PageElements:
+    """Page elements as parallel arrays instead of one dict per element.
+
+    bboxes is an (n, 4) float64 matrix, types holds codes into ELEMENT_TYPES,
+    contents the (interned) text or None, and child_counts the number of raw
+    elements in a rect-merge group (0 for anything else).
+    """
+
+    __slots__ = ("bboxes", "types", "contents", "child_counts")
+
+    def __init__(self, bboxes, types, contents: list[str | None], child_counts=None):
+        self.bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.types = np.asarray(types, dtype=np.uint8)
+        self.contents = contents
+        if child_counts is None:
+            child_counts = np.zeros(len(contents), dtype=np.int32)
+        self.child_counts = np.asarray(child_counts, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def take(self, rows: Iterable[int]) -> "PageElements":
+        rows = np.asarray(list(rows), dtype=np.intp)
+        return PageElements(
+            self.bboxes[rows], self.types[rows],
+            [self.contents[r] for r in rows.tolist()], self.child_counts[rows],
+        )
+
+    def to_dicts(self) -> list[dict]:
+        """Convert to the page-map element schema, with bboxes rounded to 0.1 pt."""
+        result = []
+        for i, (bbox, code, content, child_count) in enumerate(zip(
+            self.bboxes.tolist(), self.types.tolist(), self.contents, self.child_counts.tolist(),
+        )):
+            el = {
+                "type": ELEMENT_TYPES[code],
+                "bbox": [round(v, 1) for v in bbox],
+                "content": content,
+            }
+            if child_count:
+                el["child_count"] = child_count
+            el["id"] = f"E{i+1}"
+            result.append(el)
+        return result
+
+
+class _ElementsBuilder:
+    """Accumulates raw elements row by row and freezes them into PageElements."""
+
+    def __init__(self):
+        self.bboxes: list[tuple[float, float, float, float]] = []
+        self.types: list[int] = []
+        self.contents: list[str | None] = []
+
+    def add(self, kind: str, bbox, content: str | None = None) -> None:
+        self.bboxes.append(tuple(bbox))
+        self.types.append(_TYPE_CODES[kind])
+        self.contents.append(sys.intern(content) if content else content)
+
+    def build(self) -> PageElements:
+        return PageElements(self.bboxes, self.types, self.contents)
+
+
+class PageMapArrays:
+    """Element ids and bbox matrix of a built page map, for layout post-processing."""
+
+    def __init__(self, page_map: dict):
+        elements = page_map["elements"]
+        self.ids = [e["id"] for e in elements]
+        self.bboxes = np.array([e["bbox"] for e in elements], dtype=np.float64).reshape(-1, 4)
+        self.rows = {eid: row for row, eid in enumerate(self.ids)}
+
+    def union(self, element_ids: Iterable[str]) -> list[float] | None:
+        """Union bbox of the given (known) element ids, or None if there are none."""
+        rows = [self.rows[eid] for eid in element_ids if eid in self.rows]
+        if not rows:
+            return None
+        boxes = self.bboxes[rows]
+        return [*boxes[:, :2].min(axis=0).tolist(), *boxes[:, 2:].max(axis=0).tolist()]
 
 
 def extract_page_map(pdf_path: str, page_num: int) -> dict:
@@ -15,16 +141,55 @@ def extract_page_map(pdf_path: str, page_num: int) -> dict:
     Extract a structured page map from a single PDF page.
     page_num is 1-based.
     Pipeline: raw → rect merge → proximity merge → assign IDs.
+    Served from the page-map cache when this file content was seen before.
     """
-    raw = _extract_raw(pdf_path, page_num)
-    elements = _recursive_rect_merge(raw["elements"], raw["width"], raw["height"])
-    elements = _merge_nearby(elements)
+    key = _cache_key(pdf_path, page_num)
+    cached = _cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
 
-    # Assign IDs and round bboxes
-    for i, el in enumerate(elements):
-        el["id"] = f"E{i+1}"
-        el["bbox"] = [round(v, 1) for v in el["bbox"]]
+    result = _build_page_map(_extract_raw(pdf_path, page_num), page_num)
+    _cache.put(key, json.dumps(result).encode("utf-8"))
+    return result
+
+
+def extract_page_maps(pdf_path: str, page_numbers: list[int] | None = None) -> list[dict]:
+    """Extract page maps for many pages (default: all) of one document in a single pass.
+
+    Cached pages are read from the cache; the rest are extracted while holding
+    one pooled document open.
+    """
+    with _open_for_extraction(pdf_path) as (page_count, extract_page):
+        if page_numbers is None:
+            page_numbers = list(range(1, page_count + 1))
+        results: list[dict] = []
+        for page_num in page_numbers:
+            key = _cache_key(pdf_path, page_num)
+            cached = _cache.get(key)
+            if cached is not None:
+                results.append(json.loads(cached))
+                continue
+            result = _build_page_map(extract_page(page_num), page_num)
+            _cache.put(key, json.dumps(result).encode("utf-8"))
+            results.append(result)
+    return results
+
+
+def prefetch_page_maps(pdf_path: str, page_numbers: list[int] | None = None) -> int:
+    """Warm the page-map cache for some pages (default: all) of a document. Returns the page count."""
+    return len(extract_page_maps(pdf_path, page_numbers))
 
+
+def _cache_key(pdf_path: str, page_num: int) -> tuple:
+    return ("page_map", file_hash(pdf_path), page_num, EXTRACTOR_VERSION)
+
+
+def _build_page_map(raw: dict, page_num: int) -> dict:
+    merged = _recursive_rect_merge(raw["elements"], raw["width"], raw["height"])
+    merged = _merge_nearby(merged)
+
+    # Assign IDs and round bboxes
+    elements = merged.to_dicts()
     elements.sort(key=lambda e: (e["bbox"][1], e["bbox"][0]))
 
     result = {
@@ -43,7 +208,7 @@ def extract_page_map(pdf_path: str, page_num: int) -> dict:
     return result
 
 
-def _detect_header_separator(raw_elements: list, page_width: float, page_height: float) -> float | None:
+def _detect_header_separator(raw_elements: PageElements, page_width: float, page_height: float) -> float | None:
     """Detect a long horizontal line in the top 15% of the page that likely separates the header.
 
     Returns the y-coordinate of the separator line, or None if not found.
@@ -52,88 +217,161 @@ def _detect_header_separator(raw_elements: list, page_width: float, page_height:
     min_width_fraction = 0.5  # line must span at least 50% of page width
     max_thickness = 3.0  # must be thin (essentially a line)
 
-    candidates = []
-    for el in raw_elements:
-        if el["type"] not in ("line", "rect"):
-            continue
-        x0, y0, x1, y1 = el["bbox"]
-        width = x1 - x0
-        height = y1 - y0
+    b = raw_elements.bboxes
+    width = b[:, 2] - b[:, 0]
+    height = b[:, 3] - b[:, 1]
+    mid_y = (b[:, 1] + b[:, 3]) / 2
 
+    candidates = (
+        np.isin(raw_elements.types, (LINE, RECT))
         # Must be horizontal (wide and thin)
-        if height > max_thickness:
-            continue
-        if width < page_width * min_width_fraction:
-            continue
+        & ~(height > max_thickness)
+        & ~(width < page_width * min_width_fraction)
         # Must be in top zone
-        mid_y = (y0 + y1) / 2
-        if mid_y > top_zone:
-            continue
-
-        candidates.append(mid_y)
-
-    if not candidates:
+        & ~(mid_y > top_zone)
+    )
+    if not candidates.any():
         return None
 
     # Return the lowest (furthest down) candidate — the one most likely to be
     # the separator between header and content
-    return max(candidates)
+    return float(mid_y[candidates].max())
+
+
+@contextmanager
+def _open_for_extraction(pdf_path: str) -> Iterator[tuple[int, Callable[[int], dict]]]:
+    """Yield (page_count, extract(page_num) -> raw) on one pooled document of the configured backend."""
+    if PAGE_MAP_BACKEND == "pymupdf":
+        with open_fitz(pdf_path) as doc:
+            yield len(doc), lambda page_num: _extract_page_elements_fitz(doc[page_num - 1])
+        return
+
+    with open_pdfplumber(pdf_path) as pdf:
+        def extract(page_num: int) -> dict:
+            page = pdf.pages[page_num - 1]
+            try:
+                return _extract_page_elements(page)
+            finally:
+                # Drop pdfplumber's per-page object cache; the document stays open
+                page.close()
+
+        yield len(pdf.pages), extract
 
 
 def _extract_raw(pdf_path: str, page_num: int) -> dict:
-    """Extract raw pdfplumber elements with NO merging."""
-    with pdfplumber.open(pdf_path) as pdf:
-        page = pdf.pages[page_num - 1]
-        elements = []
-
-        words = page.extract_words(
-            x_tolerance=2, y_tolerance=2,
-            keep_blank_chars=False, use_text_flow=False,
-        )
-        for w in words:
-            elements.append({
-                "type": "text",
-                "bbox": [w["x0"], w["top"], w["x1"], w["bottom"]],
-                "content": w["text"],
-            })
-
-        for r in page.rects:
-            elements.append({
-                "type": "rect",
-                "bbox": [r["x0"], r["top"], r["x1"], r["bottom"]],
-                "content": None,
-            })
-
-        for ln in page.lines:
-            elements.append({
-                "type": "line",
-                "bbox": [ln["x0"], ln["top"], ln["x1"], ln["bottom"]],
-                "content": None,
-            })
-
-        for c in page.curves:
-            pts = c["pts"]
-            elements.append({
-                "type": "curve",
-                "bbox": [
-                    min(pt[0] for pt in pts), min(pt[1] for pt in pts),
-                    max(pt[0] for pt in pts), max(pt[1] for pt in pts),
-                ],
-                "content": None,
-            })
-
-        for img in page.images:
-            elements.append({
-                "type": "image",
-                "bbox": [img["x0"], img["top"], img["x1"], img["bottom"]],
-                "content": None,
-            })
-
-        return {
-            "width": float(page.width),
-            "height": float(page.height),
-            "elements": elements,
-        }
+    """Extract raw elements with NO merging, using the configured backend."""
+    with _open_for_extraction(pdf_path) as (_, extract_page):
+        return extract_page(page_num)
+
+
+def _extract_page_elements(page) -> dict:
+    """Collect text, rect, line, curve and image elements from an open pdfplumber page."""
+    elements = _ElementsBuilder()
+
+    words = page.extract_words(
+        x_tolerance=2, y_tolerance=2,
+        keep_blank_chars=False, use_text_flow=False,
+    )
+    for w in words:
+        elements.add("text", (w["x0"], w["top"], w["x1"], w["bottom"]), w["text"])
+
+    for r in page.rects:
+        elements.add("rect", (r["x0"], r["top"], r["x1"], r["bottom"]))
+
+    for ln in page.lines:
+        elements.add("line", (ln["x0"], ln["top"], ln["x1"], ln["bottom"]))
+
+    for c in page.curves:
+        pts = c["pts"]
+        elements.add("curve", (
+            min(pt[0] for pt in pts), min(pt[1] for pt in pts),
+            max(pt[0] for pt in pts), max(pt[1] for pt in pts),
+        ))
+
+    for img in page.images:
+        elements.add("image", (img["x0"], img["top"], img["x1"], img["bottom"]))
+
+    return {
+        "width": float(page.width),
+        "height": float(page.height),
+        "elements": elements.build(),
+    }
+
+
+def _split_subpaths(items: list) -> list[list]:
+    """Split a PyMuPDF drawing's items into connected subpaths (like pdfminer does on 'm')."""
+    subpaths: list[list] = []
+    last_point = None
+    for item in items:
+        start = item[1] if item[0] in ("l", "c") else None
+        if start is None or last_point is None or start != last_point or not subpaths:
+            subpaths.append([])
+        subpaths[-1].append(item)
+        last_point = item[-1] if item[0] in ("l", "c") else None
+    return subpaths
+
+
+def _is_axis_aligned_box(points: list) -> bool:
+    xs = {round(p.x, 2) for p in points}
+    ys = {round(p.y, 2) for p in points}
+    return len(xs) <= 2 and len(ys) <= 2
+
+
+def _extract_page_elements_fitz(page) -> dict:
+    """Collect the same raw element schema as _extract_page_elements from a fitz page.
+
+    Words come from get_text("words"); vector paths from get_drawings() are
+    split into subpaths and classified like pdfminer: "re"/axis-aligned quads
+    and closed 4-segment boxes → rect, single segments → line, the rest → curve.
+    """
+    elements = _ElementsBuilder()
+
+    for x0, y0, x1, y1, text, *_ in page.get_text("words"):
+        elements.add("text", (x0, y0, x1, y1), text)
+
+    rects, lines, curves = [], [], []
+    for drawing in page.get_drawings():
+        for subpath in _split_subpaths(drawing["items"]):
+            kinds = [item[0] for item in subpath]
+            if kinds == ["re"]:
+                r = subpath[0][1]
+                rects.append([r.x0, r.y0, r.x1, r.y1])
+                continue
+            if kinds == ["qu"]:
+                quad = subpath[0][1]
+                r = quad.rect
+                target = rects if _is_axis_aligned_box([quad.ul, quad.ur, quad.ll, quad.lr]) else curves
+                target.append([r.x0, r.y0, r.x1, r.y1])
+                continue
+            points = [pt for item in subpath for pt in item[1:] if hasattr(pt, "x")]
+            if not points:
+                continue
+            bbox = [
+                min(pt.x for pt in points), min(pt.y for pt in points),
+                max(pt.x for pt in points), max(pt.y for pt in points),
+            ]
+            if kinds == ["l"]:
+                lines.append(bbox)
+            elif (
+                set(kinds) == {"l"} and len(kinds) in (3, 4)
+                and _is_axis_aligned_box(points)
+            ):
+                rects.append(bbox)
+            else:
+                curves.append(bbox)
+
+    for kind, boxes in (("rect", rects), ("line", lines), ("curve", curves)):
+        for bbox in boxes:
+            elements.add(kind, bbox)
+
+    for img in page.get_image_info():
+        elements.add("image", img["bbox"])
+
+    return {
+        "width": float(page.rect.width),
+        "height": float(page.rect.height),
+        "elements": elements.build(),
+    }
 
 
 def _contains(outer, inner, tol=MERGE_TOLERANCE):
@@ -148,125 +386,247 @@ def _touches(a, b, tol=MERGE_TOLERANCE):
             a[1] <= b[3] + tol and b[1] <= a[3] + tol)
 
 
-def _bbox_area(b):
-    return max(0, b[2] - b[0]) * max(0, b[3] - b[1])
+class _GridIndex:
+    """Uniform grid spatial index over item bboxes.
 
+    query() returns every item whose registered cells overlap the (padded)
+    query box — a superset of the true hits, which callers filter with the
+    exact predicates. Coordinates are clamped to the page (plus a margin) so
+    off-page geometry cannot blow up the number of cells; clamping keeps
+    overlapping intervals overlapping, so no candidate is lost.
+    """
 
-def _group_bbox(group):
-    x0 = min(e["bbox"][0] for e in group)
-    y0 = min(e["bbox"][1] for e in group)
-    x1 = max(e["bbox"][2] for e in group)
-    y1 = max(e["bbox"][3] for e in group)
-    return [x0, y0, x1, y1]
-
+    def __init__(self, page_width: float, page_height: float, cell: float = GRID_CELL_SIZE):
+        self.cell = cell
+        self.max_cx = int(max(page_width, 0) // cell) + 1
+        self.max_cy = int(max(page_height, 0) // cell) + 1
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        self.ranges: dict[int, tuple[int, int, int, int]] = {}
+
+    def _clamp(self, v: int, hi: int) -> int:
+        return -1 if v < -1 else (hi if v > hi else v)
+
+    def cell_range(self, bbox, pad: float) -> tuple[int, int, int, int]:
+        x0, y0, x1, y1 = bbox
+        if x1 < x0:
+            x0, x1 = x1, x0
+        if y1 < y0:
+            y0, y1 = y1, y0
+        c = self.cell
+        return (
+            self._clamp(int((x0 - pad) // c), self.max_cx),
+            self._clamp(int((x1 + pad) // c), self.max_cx),
+            self._clamp(int((y0 - pad) // c), self.max_cy),
+            self._clamp(int((y1 + pad) // c), self.max_cy),
+        )
 
-def _recursive_rect_merge(elements, page_width, page_height, max_page_fraction=0.5):
-    """Recursively merge elements inside rects, then merge touching rects."""
+    def insert(self, item: int, bbox) -> None:
+        """Register item's bbox; re-inserting after the bbox grows widens its cells."""
+        cx0, cx1, cy0, cy1 = self.cell_range(bbox, 0)
+        old = self.ranges.get(item)
+        if old is None:
+            self.ranges[item] = (cx0, cx1, cy0, cy1)
+            cells = self.cells
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket is None:
+                        cells[(cx, cy)] = [item]
+                    else:
+                        bucket.append(item)
+            return
+        if old[0] <= cx0 and cx1 <= old[1] and old[2] <= cy0 and cy1 <= old[3]:
+            return
+        cx0, cx1 = min(cx0, old[0]), max(cx1, old[1])
+        cy0, cy1 = min(cy0, old[2]), max(cy1, old[3])
+        self.ranges[item] = (cx0, cx1, cy0, cy1)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                if old[0] <= cx <= old[1] and old[2] <= cy <= old[3]:
+                    continue
+                self.cells.setdefault((cx, cy), []).append(item)
+
+    def items_in(self, cell_range, skip=None) -> list[int]:
+        """Items registered in a cell range, optionally excluding cells of skip range."""
+        cx0, cx1, cy0, cy1 = cell_range
+        found: list[int] = []
+        for cx in range(cx0, cx1 + 1):
+            if skip is not None and skip[0] <= cx <= skip[1]:
+                # Only the rows above and below the skipped block
+                rows = [*range(cy0, min(cy1, skip[2] - 1) + 1), *range(max(cy0, skip[3] + 1), cy1 + 1)]
+            else:
+                rows = range(cy0, cy1 + 1)
+            for cy in rows:
+                items = self.cells.get((cx, cy))
+                if items:
+                    found.extend(items)
+        return found
+
+    def query(self, bbox, pad: float) -> set[int]:
+        return set(self.items_in(self.cell_range(bbox, pad)))
+
+
+def _recursive_rect_merge(elements: PageElements, page_width, page_height, max_page_fraction=0.5) -> PageElements:
+    """Recursively merge elements inside rects, then merge touching rects.
+
+    Each pass (1) absorbs free elements into the first group containing them,
+    (2) merges groups contained in one another and (3) merges touching groups,
+    until nothing changes. Group bboxes are cached and candidates come from a
+    grid index; scan order and the point at which each bbox is read match the
+    original all-pairs loops, so the output is identical.
+    """
     page_area = page_width * page_height
-    filtered = []
-    for e in elements:
-        if e["type"] == "rect" and _bbox_area(e["bbox"]) / page_area > max_page_fraction:
-            continue
-        filtered.append(e)
-    elements = filtered
-
-    rects = [e for e in elements if e["type"] == "rect"]
-    others = [e for e in elements if e["type"] != "rect"]
-
-    if not rects:
-        return elements
-
-    rects.sort(key=lambda e: _bbox_area(e["bbox"]), reverse=True)
-    rect_groups = [[r] for r in rects]
-    free = list(others)
+    b = elements.bboxes
+    is_rect = elements.types == RECT
+    areas = np.maximum(0, b[:, 2] - b[:, 0]) * np.maximum(0, b[:, 3] - b[:, 1])
+    keep = ~(is_rect & (areas / page_area > max_page_fraction))
+
+    rect_rows = np.flatnonzero(keep & is_rect)
+    other_rows = np.flatnonzero(keep & ~is_rect)
+
+    if not len(rect_rows):
+        return elements.take(np.flatnonzero(keep))
+
+    # Largest first; a stable sort on -area keeps equal areas in input order like sort(reverse=True)
+    rect_rows = rect_rows[np.argsort(-areas[rect_rows], kind="stable")]
+    row_bboxes = b.tolist()
+    # Group ids are positions in rect_rows; survivors keep their relative order.
+    groups = [[r] for r in rect_rows.tolist()]
+    bboxes = [row_bboxes[r] for r in rect_rows.tolist()]
+    alive = [True] * len(groups)
+    index = _GridIndex(page_width, page_height)
+    for gid, bbox in enumerate(bboxes):
+        index.insert(gid, bbox)
+    free = other_rows.tolist()
+
+    def grow(gid: int, bbox) -> None:
+        g = bboxes[gid]
+        g[0] = min(g[0], bbox[0])
+        g[1] = min(g[1], bbox[1])
+        g[2] = max(g[2], bbox[2])
+        g[3] = max(g[3], bbox[3])
+        index.insert(gid, g)
+
+    def absorb(dst: int, src: int) -> None:
+        groups[dst].extend(groups[src])
+        alive[src] = False
+        grow(dst, bboxes[src])
+
+    def candidates(bbox, after: int = -1) -> list[int]:
+        return sorted(
+            gid for gid in index.query(bbox, MERGE_TOLERANCE)
+            if gid > after and alive[gid]
+        )
 
     changed = True
     while changed:
         changed = False
 
         still_free = []
-        for el in free:
-            absorbed = False
-            for group in rect_groups:
-                union = _group_bbox(group)
-                if _contains(union, el["bbox"]):
-                    group.append(el)
-                    absorbed = True
-                    changed = True
-                    break
-            if not absorbed:
-                still_free.append(el)
+        for row in free:
+            bbox = row_bboxes[row]
+            target = next(
+                (gid for gid in candidates(bbox) if _contains(bboxes[gid], bbox)),
+                None,
+            )
+            if target is None:
+                still_free.append(row)
+                continue
+            groups[target].append(row)
+            grow(target, bbox)
+            changed = True
         free = still_free
 
-        merged_flags = [False] * len(rect_groups)
-        for i in range(len(rect_groups)):
-            if merged_flags[i]:
+        for i in range(len(groups)):
+            if not alive[i]:
                 continue
-            union_i = _group_bbox(rect_groups[i])
-            for j in range(i + 1, len(rect_groups)):
-                if merged_flags[j]:
-                    continue
-                union_j = _group_bbox(rect_groups[j])
+            union_i = list(bboxes[i])
+            for j in candidates(union_i, after=i):
+                union_j = bboxes[j]
                 if _contains(union_i, union_j):
-                    rect_groups[i].extend(rect_groups[j])
-                    merged_flags[j] = True
+                    absorb(i, j)
                     changed = True
                 elif _contains(union_j, union_i):
-                    rect_groups[j].extend(rect_groups[i])
-                    merged_flags[i] = True
+                    absorb(j, i)
                     changed = True
                     break
-        rect_groups = [g for i, g in enumerate(rect_groups) if not merged_flags[i]]
 
-        merged_flags = [False] * len(rect_groups)
-        for i in range(len(rect_groups)):
-            if merged_flags[i]:
+        for i in range(len(groups)):
+            if not alive[i]:
                 continue
-            union_i = _group_bbox(rect_groups[i])
-            for j in range(i + 1, len(rect_groups)):
-                if merged_flags[j]:
-                    continue
-                union_j = _group_bbox(rect_groups[j])
-                if _touches(union_i, union_j):
-                    rect_groups[i].extend(rect_groups[j])
-                    merged_flags[j] = True
+            union_i = list(bboxes[i])
+            for j in candidates(union_i, after=i):
+                if _touches(union_i, bboxes[j]):
+                    absorb(i, j)
                     changed = True
-        rect_groups = [g for i, g in enumerate(rect_groups) if not merged_flags[i]]
-
-    result = []
-    for group in rect_groups:
-        bbox = _group_bbox(group)
-        texts = [e["content"] for e in group if e.get("content")]
-        result.append({
-            "type": "merged",
-            "bbox": bbox,
-            "content": " | ".join(texts) if texts else None,
-            "child_count": len(group),
-        })
-    result.extend(free)
-    return result
 
-
-def _merge_nearby(elements, gap=PROXIMITY_GAP):
-    """Merge ALL elements (including rect-merged groups) within gap pts of each other."""
+    contents = elements.contents
+    out_bboxes, out_contents, out_counts = [], [], []
+    for gid, group in enumerate(groups):
+        if not alive[gid]:
+            continue
+        texts = [contents[r] for r in group if contents[r]]
+        out_bboxes.append(bboxes[gid])
+        out_contents.append(" | ".join(texts) if texts else None)
+        out_counts.append(len(group))
+    merged = PageElements(out_bboxes, [MERGED] * len(out_contents), out_contents, out_counts)
+    if not free:
+        return merged
+    rest = elements.take(free)
+    return PageElements(
+        np.vstack([merged.bboxes, rest.bboxes]),
+        np.concatenate([merged.types, rest.types]),
+        merged.contents + rest.contents,
+        np.concatenate([merged.child_counts, rest.child_counts]),
+    )
+
+
+_TEXTUAL_TYPES = (1 << TEXT) | (1 << MERGED)
+
+
+def _merge_nearby(elements: PageElements, gap=PROXIMITY_GAP) -> PageElements:
+    """Merge ALL elements (including rect-merged groups) within gap pts of each other.
+
+    Each pass lets cluster i absorb, in index order, every later cluster within
+    gap of its growing bbox, until a pass merges nothing. Later clusters do not
+    change during a pass, so one grid index per pass serves all of them: the
+    candidates of cluster i are popped from a heap in index order, and cells
+    newly reached as bbox i grows only contribute clusters not yet scanned.
+    Merge order — and therefore content order — matches the all-pairs scan.
+    Cluster types are tracked as a bitmask of type codes.
+    """
     if len(elements) <= 1:
         return elements
 
     clusters = [
-        [[*e["bbox"]], {e["type"]}, [e.get("content", "") or ""], 1]
-        for e in elements
+        [bbox, 1 << code, [content or ""], 1]
+        for bbox, code, content in zip(elements.bboxes.tolist(), elements.types.tolist(), elements.contents)
     ]
+    extent_w = float(elements.bboxes[:, [0, 2]].max())
+    extent_h = float(elements.bboxes[:, [1, 3]].max())
 
     changed = True
     while changed:
         changed = False
+        index = _GridIndex(extent_w, extent_h)
+        for ci, cluster in enumerate(clusters):
+            index.insert(ci, cluster[0])
+
         merged_flags = [False] * len(clusters)
         new_clusters = []
         for i in range(len(clusters)):
             if merged_flags[i]:
                 continue
             bbox_i, types_i, texts_i, count_i = clusters[i]
-            for j in range(i + 1, len(clusters)):
+            covered = index.cell_range(bbox_i, gap)
+            heap = [j for j in index.items_in(covered) if j > i]
+            heapq.heapify(heap)
+            scanned = i
+            while heap:
+                j = heapq.heappop(heap)
+                if j <= scanned:
+                    continue
+                scanned = j
                 if merged_flags[j]:
                     continue
                 bbox_j, types_j, texts_j, count_j = clusters[j]
@@ -276,29 +636,32 @@ def _merge_nearby(elements, gap=PROXIMITY_GAP):
                     bbox_i[1] = min(bbox_i[1], bbox_j[1])
                     bbox_i[2] = max(bbox_i[2], bbox_j[2])
                     bbox_i[3] = max(bbox_i[3], bbox_j[3])
-                    types_i.update(types_j)
+                    types_i |= types_j
                     texts_i.extend(texts_j)
                     count_i += count_j
-                    clusters[i][3] = count_i
                     merged_flags[j] = True
                     changed = True
+                    grown = index.cell_range(bbox_i, gap)
+                    if grown != covered:
+                        for k in index.items_in(grown, skip=covered):
+                            if k > scanned:
+                                heapq.heappush(heap, k)
+                        covered = grown
             new_clusters.append([bbox_i, types_i, texts_i, count_i])
         clusters = new_clusters
 
-    result = []
+    out_bboxes, out_types, out_contents = [], [], []
     for bbox, types, texts, count in clusters:
         text_content = [t for t in texts if t]
-        has_text = "text" in types or "merged" in types
-        only_text = types <= {"text", "merged"}
+        has_text = bool(types & _TEXTUAL_TYPES)
+        only_text = not (types & ~_TEXTUAL_TYPES)
         if only_text and has_text:
-            btype = "text_block"
+            btype = TEXT_BLOCK
         elif not has_text:
-            btype = "drawing_block"
+            btype = DRAWING_BLOCK
         else:
-            btype = "mixed_block"
-        result.append({
-            "type": btype,
-            "bbox": bbox,
-            "content": " ".join(text_content) if text_content else None,
-        })
-    return result
+            btype = MIXED_BLOCK
+        out_bboxes.append(bbox)
+        out_types.append(btype)
+        out_contents.append(" ".join(text_content) if text_content else None)
+    return PageElements(out_bboxes, out_types, out_contents)
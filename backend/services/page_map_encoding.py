@@ -0,0 +1,199 @@
+"""
+Page-map serialization for layout prompts.
+
+PAGE_MAP_ENCODING=full (default) sends every element as {"id", "bbox",
+"content"}, exactly as before. PAGE_MAP_ENCODING=compact sends one row per
+element under a "fields" header, with integer coordinates, contents cut to
+PAGE_MAP_MAX_CONTENT_CHARS and tiny drawing-only blocks left out. With a
+PAGE_MAP_TOKEN_BUDGET, compact pages that are still too large get shorter
+contents and then lose all drawing-only blocks until they fit.
+
+Tokens are estimated as characters / 4; sent and full-encoding estimates are
+counted for the metrics endpoint (the full size is computed from element
+lengths, not by serializing the page a second time). PAGE_MAP_DESCRIPTION
+describes the configured encoding for the layout system prompts.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PAGE_MAP_ENCODING = os.environ.get("PAGE_MAP_ENCODING", "full").strip().lower()
+if PAGE_MAP_ENCODING not in ("full", "compact"):
+    raise ValueError(f"Unknown PAGE_MAP_ENCODING: {PAGE_MAP_ENCODING!r}")
+
+PAGE_MAP_TOKEN_BUDGET = int(os.environ.get("PAGE_MAP_TOKEN_BUDGET", "0"))  # 0 = no budget
+PAGE_MAP_MAX_CONTENT_CHARS = int(os.environ.get("PAGE_MAP_MAX_CONTENT_CHARS", "160"))
+PAGE_MAP_MICRO_ELEMENT_PT = float(os.environ.get("PAGE_MAP_MICRO_ELEMENT_PT", "4"))
+
+CHARS_PER_TOKEN = 4
+COMPACT_FIELDS = ["id", "x0", "y0", "x1", "y1", "content"]
+
+# How the layout system prompts describe the page map
+if PAGE_MAP_ENCODING == "full":
+    PAGE_MAP_DESCRIPTION = "elements already merged into blocks with id, bbox, content"
+else:
+    PAGE_MAP_DESCRIPTION = (
+        'elements already merged into blocks, one row per block with the values named in "fields" '
+        "(id, x0, y0, x1, y1, content; integer coordinates, long contents cut short); "
+        "tiny drawing-only blocks are left out"
+    )
+    if PAGE_MAP_TOKEN_BUDGET:
+        PAGE_MAP_DESCRIPTION += ", and on crowded pages all drawing-only blocks may be left out"
+
+# Fallback steps when a compact page exceeds the budget: (max content chars, drop all drawing blocks)
+_BUDGET_STEPS = ((80, False), (40, False), (40, True), (16, True), (0, True))
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _encode_full(page_map: dict) -> str:
+    """The original encoding: one {"id", "bbox", "content"} object per element."""
+    compact: dict[str, Any] = {
+        "width": page_map["width"],
+        "height": page_map["height"],
+        "elements": [],
+    }
+    if page_map.get("header_separator_y") is not None:
+        compact["header_separator_y"] = page_map["header_separator_y"]
+    for el in page_map["elements"]:
+        entry: dict[str, Any] = {
+            "id": el["id"],
+            "bbox": el["bbox"],
+        }
+        if el.get("content"):
+            entry["content"] = el["content"]
+        compact["elements"].append(entry)
+    return json.dumps(compact, ensure_ascii=False)
+
+
+def _full_chars(page_map: dict) -> int:
+    """Length of _encode_full(page_map), computed without serializing it."""
+    chars = len('{"width": , "height": , "elements": []}')
+    chars += len(repr(float(page_map["width"]))) + len(repr(float(page_map["height"])))
+    if page_map.get("header_separator_y") is not None:
+        chars += len(', "header_separator_y": ') + len(repr(float(page_map["header_separator_y"])))
+    elements = page_map["elements"]
+    # {"id": "<id>", "bbox": [a, b, c, d]} joined by ", "
+    chars += max(len(elements) - 1, 0) * 2
+    for el in elements:
+        chars += 28 + len(el["id"]) + sum(len(repr(v)) for v in el["bbox"])
+        if el.get("content"):
+            # Escapes (quotes, backslashes, control characters) are not counted
+            chars += 15 + len(el["content"])
+    return chars
+
+
+def _encode_compact(page_map: dict, max_content_chars: int, drop_drawings: bool) -> tuple[str, int, int]:
+    """Row-per-element encoding. Returns (text, dropped elements, truncated contents)."""
+    header: dict[str, Any] = {
+        "width": round(page_map["width"]),
+        "height": round(page_map["height"]),
+    }
+    if page_map.get("header_separator_y") is not None:
+        header["header_separator_y"] = round(page_map["header_separator_y"])
+
+    rows = []
+    dropped = truncated = 0
+    micro = PAGE_MAP_MICRO_ELEMENT_PT
+    for el in page_map["elements"]:
+        x0, y0, x1, y1 = el["bbox"]
+        if el["type"] == "drawing_block" and (
+            drop_drawings or (x1 - x0 <= micro and y1 - y0 <= micro)
+        ):
+            dropped += 1
+            continue
+        row: list[Any] = [el["id"], round(x0), round(y0), round(x1), round(y1)]
+        content = el.get("content")
+        if content and max_content_chars > 0:
+            if len(content) > max_content_chars:
+                content = content[:max_content_chars - 1] + "…"
+                truncated += 1
+            row.append(content)
+        elif content:
+            truncated += 1
+        rows.append(row)
+
+    text = json.dumps(
+        {**header, "fields": COMPACT_FIELDS, "elements": rows},
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return text, dropped, truncated
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "pages": 0,
+    "full_tokens": 0,
+    "sent_tokens": 0,
+    "dropped_elements": 0,
+    "truncated_contents": 0,
+    "over_budget_pages": 0,
+}
+
+
+def _record(full_tokens: int, sent_tokens: int, dropped: int, truncated: int, over_budget: bool) -> None:
+    with _metrics_lock:
+        _metrics["pages"] += 1
+        _metrics["full_tokens"] += full_tokens
+        _metrics["sent_tokens"] += sent_tokens
+        _metrics["dropped_elements"] += dropped
+        _metrics["truncated_contents"] += truncated
+        _metrics["over_budget_pages"] += int(over_budget)
+
+
+def encoding_metrics() -> dict[str, Any]:
+    with _metrics_lock:
+        snapshot: dict[str, Any] = dict(_metrics)
+    saved = snapshot["full_tokens"] - snapshot["sent_tokens"]
+    snapshot["saved_tokens"] = saved
+    snapshot["saved_pct"] = round(100 * saved / snapshot["full_tokens"], 1) if snapshot["full_tokens"] else 0.0
+    snapshot["encoding"] = PAGE_MAP_ENCODING
+    snapshot["token_budget"] = PAGE_MAP_TOKEN_BUDGET or None
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def page_map_to_prompt(page_map: dict) -> str:
+    """Serialize a page map for a layout prompt using the configured encoding."""
+    if PAGE_MAP_ENCODING == "full":
+        full = _encode_full(page_map)
+        full_tokens = estimate_tokens(full)
+        _record(full_tokens, full_tokens, 0, 0, bool(PAGE_MAP_TOKEN_BUDGET) and full_tokens > PAGE_MAP_TOKEN_BUDGET)
+        return full
+    full_tokens = math.ceil(_full_chars(page_map) / CHARS_PER_TOKEN)
+
+    text, dropped, truncated = _encode_compact(page_map, PAGE_MAP_MAX_CONTENT_CHARS, drop_drawings=False)
+    tokens = estimate_tokens(text)
+    if PAGE_MAP_TOKEN_BUDGET:
+        for max_chars, drop_drawings in _BUDGET_STEPS:
+            if tokens <= PAGE_MAP_TOKEN_BUDGET:
+                break
+            max_chars = min(max_chars, PAGE_MAP_MAX_CONTENT_CHARS)
+            if max_chars == PAGE_MAP_MAX_CONTENT_CHARS and not drop_drawings:
+                continue
+            text, dropped, truncated = _encode_compact(page_map, max_chars, drop_drawings)
+            tokens = estimate_tokens(text)
+
+    over_budget = bool(PAGE_MAP_TOKEN_BUDGET) and tokens > PAGE_MAP_TOKEN_BUDGET
+    if over_budget:
+        logger.warning(
+            "Page %s map is ~%d tokens after compaction (budget %d)",
+            page_map.get("page_number"), tokens, PAGE_MAP_TOKEN_BUDGET,
+        )
+    _record(full_tokens, tokens, dropped, truncated, over_budget)
+    return text
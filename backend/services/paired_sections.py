@@ -5,19 +5,31 @@ Exact copy of experiment_gpt_v5.py logic, converted to async for FastAPI.
 Pipeline: resolve_overlaps → assign_elements → recompute regions → drop empty → sort.
 """
 
+import asyncio
 import base64
+import hashlib
+import importlib.util
 import json
 import logging
 import os
 import ssl
+import time
+from collections.abc import Callable
 from typing import Any
 
-import fitz
 import httpx
+import numpy as np
 from openai import AsyncOpenAI
 
 from ..models import PageAnalysis, Section
-from .page_map import extract_page_map
+from . import layout_templates, llm_cache, llm_replay, llm_scheduler, llm_stream, llm_telemetry, reference_artifacts
+from .cpu_pool import run_cpu
+from .image_policy import get_policy, image_content, record_payload
+from .llm_retry import call_with_retries
+from .llm_scheduler import estimate_request_tokens
+from .page_map import PageMapArrays, extract_page_map
+from .page_map_encoding import PAGE_MAP_DESCRIPTION, page_map_to_prompt
+from .render_cache import render_page
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +37,6 @@ logger = logging.getLogger(__name__)
 # Config
 # ---------------------------------------------------------------------------
 
-RENDER_DPI = 300
-SCALE = RENDER_DPI / 72
-
 MODEL_NAME = "gpt-4.1"  # overridden by AZURE_OPENAI_DEPLOYMENT after dotenv load
 TEMPERATURE = 0
 TOP_P = 1
@@ -36,6 +45,18 @@ MAX_TOKENS = 16384
 
 ALLOWED_CONTENT_TYPES = {"table", "chart", "text_block", "metadata", "mixed"}
 
+# HTTP connection pool for the LLM client. Connections are sized for the
+# scheduler's maximum concurrency plus one hedge per call, and kept alive so
+# TLS (and mTLS) handshakes are paid once per connection, not per request.
+LLM_HTTP_MAX_CONNECTIONS = int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", str(2 * llm_scheduler.LLM_MAX_CONCURRENCY)))
+LLM_HTTP_KEEPALIVE_S = float(os.environ.get("LLM_HTTP_KEEPALIVE_S", "120"))
+LLM_HTTP2 = os.environ.get("LLM_HTTP2", "0").strip().lower() in ("1", "true", "yes", "on")
+LLM_CONNECT_TIMEOUT_S = float(os.environ.get("LLM_CONNECT_TIMEOUT_S", "10"))
+# Write covers multi-MB image uploads; read is the wait for the (non-streamed) completion
+LLM_WRITE_TIMEOUT_S = float(os.environ.get("LLM_WRITE_TIMEOUT_S", "60"))
+LLM_READ_TIMEOUT_S = float(os.environ.get("LLM_READ_TIMEOUT_S", "180"))
+LLM_POOL_TIMEOUT_S = float(os.environ.get("LLM_POOL_TIMEOUT_S", "30"))
+
 _client: AsyncOpenAI | None = None
 
 
@@ -45,6 +66,28 @@ class StripAuthTransport(httpx.AsyncHTTPTransport):
         return await super().handle_async_request(request)
 
 
+def _http_client(transport_cls: type[httpx.AsyncHTTPTransport], **transport_kwargs: Any) -> httpx.AsyncClient:
+    """Shared HTTP client with explicit pool limits, per-phase timeouts and optional HTTP/2."""
+    http2 = LLM_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("LLM_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_S,
+    )
+    timeout = httpx.Timeout(
+        connect=LLM_CONNECT_TIMEOUT_S,
+        read=LLM_READ_TIMEOUT_S,
+        write=LLM_WRITE_TIMEOUT_S,
+        pool=LLM_POOL_TIMEOUT_S,
+    )
+    # Limits and HTTP/2 are transport settings once a custom transport is passed
+    transport = transport_cls(limits=limits, http2=http2, **transport_kwargs)
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+
 def _get_client() -> AsyncOpenAI:
     global _client, MODEL_NAME
     if _client is None:
@@ -52,7 +95,15 @@ def _get_client() -> AsyncOpenAI:
         env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
         load_dotenv(env_path)
 
-        if os.environ.get("AZURE_OPENAI_ENDPOINT"):
+        if os.environ.get("LLM_BASE_URL"):
+            # Any OpenAI-compatible server, e.g. the mock server for load tests
+            _client = AsyncOpenAI(
+                base_url=os.environ["LLM_BASE_URL"],
+                api_key=os.environ.get("OPENAI_KEY") or "unused",
+                http_client=_http_client(httpx.AsyncHTTPTransport),
+                max_retries=0,
+            )
+        elif os.environ.get("AZURE_OPENAI_ENDPOINT"):
             endpoint = os.environ["AZURE_OPENAI_ENDPOINT"].rstrip("/")
             deployment = os.environ.get("AZURE_OPENAI_DEPLOYMENT")
             if not deployment:
@@ -76,24 +127,118 @@ def _get_client() -> AsyncOpenAI:
                 password=key_password,
             )
 
-            transport = StripAuthTransport(verify=ssl_context)
-            http_client = httpx.AsyncClient(
-                transport=transport,
-                timeout=30.0,
-            )
-
             _client = AsyncOpenAI(
                 base_url=f"{endpoint}/openai/deployments/{deployment}",
-                http_client=http_client,
+                http_client=_http_client(StripAuthTransport, verify=ssl_context),
                 api_key="nothing",
                 default_query={"api-version": api_version},
+                max_retries=0,  # retries are done by llm_retry
             )
         else:
             # Direct OpenAI
-            _client = AsyncOpenAI(api_key=os.environ["OPENAI_KEY"])
+            _client = AsyncOpenAI(
+                api_key=os.environ["OPENAI_KEY"],
+                http_client=_http_client(httpx.AsyncHTTPTransport),
+                max_retries=0,
+            )
     return _client
 
 
+async def close_client() -> None:
+    """Close the LLM client's connection pool (app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _cache_lookup(endpoint: str, kwargs: dict[str, Any]) -> tuple[str, Any]:
+    """Fingerprint of a request and its cached response (or None)."""
+    key = llm_cache.fingerprint(endpoint, kwargs)
+    return key, llm_cache.lookup(key)
+
+
+async def _create_completion(
+    stage: str,
+    kwargs: dict[str, Any],
+    cache: bool = False,
+    stream_keys: tuple[str, ...] = (),
+    on_partial: Callable[[dict[str, list[Any]]], None] | None = None,
+    variant: str = "",
+) -> Any:
+    """Send a chat completion for a stage through the process-wide LLM scheduler.
+
+    Transient failures are retried (and slow calls optionally hedged) by llm_retry.
+    If the client rejects response_format/seed (TypeError), retry without them.
+    With cache=True (deterministic calls only) the response cache is consulted first.
+    With LLM_STREAMING and on_partial, the response is streamed and on_partial gets
+    the elements of the stream_keys arrays parsed so far (see llm_stream).
+    Every call is recorded by llm_telemetry under stage (and variant, e.g. "paired").
+    """
+    client = _get_client()
+    telemetry = llm_telemetry.new_call(stage, variant, kwargs)
+    start = time.monotonic()
+    cache_key = None
+    if cache and llm_cache.LLM_CACHE_ENABLED:
+        # Serializing the request (page images included), hashing it and the
+        # disk read all run in a worker thread
+        cache_key, cached = await asyncio.to_thread(_cache_lookup, str(client.base_url), kwargs)
+        if cached is not None:
+            logger.debug("%s response served from cache", stage)
+            telemetry.cache_hit = True
+            telemetry.add_usage(cached)
+            telemetry.wall_s = time.monotonic() - start
+            llm_telemetry.record(telemetry)
+            return cached
+
+    payload = record_payload(stage, kwargs["messages"])
+    telemetry.images = payload["images"]
+    telemetry.image_bytes = payload["image_bytes"]
+    telemetry.text_bytes = payload["text_bytes"]
+    tokens = estimate_request_tokens(kwargs)
+    telemetry.streamed = on_partial is not None and llm_stream.LLM_STREAMING
+
+    def call():
+        if telemetry.streamed:
+            return llm_stream.stream_completion(stage, client.chat.completions.create, kwargs, stream_keys, on_partial)
+        return client.chat.completions.create(**kwargs)
+
+    def attempt():
+        telemetry.attempts += 1
+        queued = time.monotonic()
+
+        def admitted():
+            telemetry.queue_wait_s += time.monotonic() - queued
+            return call()
+
+        return llm_scheduler.run(stage, admitted, tokens)
+
+    def on_retry(error_class: str) -> None:
+        telemetry.retries += 1
+
+    try:
+        try:
+            resp = await call_with_retries(stage, attempt, on_retry)
+        except TypeError:
+            kwargs.pop("response_format", None)
+            kwargs.pop("seed", None)
+            resp = await call_with_retries(stage, attempt, on_retry)
+    except BaseException as e:
+        telemetry.outcome = "error" if isinstance(e, Exception) else "cancelled"
+        telemetry.error = type(e).__name__
+        telemetry.wall_s = time.monotonic() - start
+        llm_telemetry.record(telemetry)
+        raise
+    telemetry.wall_s = time.monotonic() - start
+    telemetry.add_usage(resp)
+    llm_telemetry.record(telemetry)
+    if cache_key is not None:
+        await asyncio.to_thread(llm_cache.store, cache_key, kwargs, resp)
+    if llm_replay.LLM_RECORD_DIR:
+        await asyncio.to_thread(llm_replay.record, kwargs, resp)
+    return resp
+
+
 # ---------------------------------------------------------------------------
 # GPT prompt — identical to experiment_gpt_v5.py
 # ---------------------------------------------------------------------------
@@ -105,10 +250,10 @@ You receive layout blocks for BOTH pages (reference and test). They share the sa
 Return TWO separate sets of section regions using CONSISTENT names across both pages so matching sections can be paired.
 
 INPUT:
-1) Reference page image (PNG)
-2) Reference page map (JSON) — elements already merged into blocks with id, bbox, content
-3) Test page image (PNG)
-4) Test page map (JSON) — elements already merged into blocks with id, bbox, content
+1) Reference page image
+2) Reference page map (JSON) — """ + PAGE_MAP_DESCRIPTION + """
+3) Test page image
+4) Test page map (JSON) — """ + PAGE_MAP_DESCRIPTION + """
 
 OUTPUT — ONLY valid JSON matching the schema:
 {"ref_sections":[{"name":"...","content_type":"...","region":[x0,y0,x1,y1]}],
@@ -249,8 +394,8 @@ SINGLE_SYSTEM_PROMPT = """You segment a financial report page into non-overlappi
 You receive ONE page with its image and layout map.
 
 INPUT:
-1) Page image (PNG)
-2) Page map (JSON) — elements already merged into blocks with id, bbox, content
+1) Page image
+2) Page map (JSON) — """ + PAGE_MAP_DESCRIPTION + """
 
 OUTPUT — ONLY valid JSON matching the schema:
 {"sections":[{"name":"...","content_type":"...","region":[x0,y0,x1,y1]}]}
@@ -285,31 +430,27 @@ def _rect_intersection_area(a: list[float], b: list[float]) -> float:
     return (ix1 - ix0) * (iy1 - iy0)
 
 
-def _bbox_union(bboxes: list[list[float]]) -> list[float]:
-    return [
-        min(b[0] for b in bboxes),
-        min(b[1] for b in bboxes),
-        max(b[2] for b in bboxes),
-        max(b[3] for b in bboxes),
-    ]
-
-
-def _contains_point(region: list[float], x: float, y: float) -> bool:
-    return (region[0] <= x <= region[2]) and (region[1] <= y <= region[3])
-
-
-def _centroid(bbox: list[float]) -> tuple[float, float]:
-    return ((bbox[0] + bbox[2]) / 2.0, (bbox[1] + bbox[3]) / 2.0)
-
-
 # ---------------------------------------------------------------------------
-# Overlap resolver — identical to v5
+# Overlap resolver — same result as v5, without the all-pairs restarts
 # ---------------------------------------------------------------------------
 
-def _resolve_overlaps(sections: list[dict[str, Any]]) -> list[dict[str, Any]]:
-    # If two sections overlap, merge them into a single section
-    # (union their regions, combine names, pick dominant content_type).
-    out = [dict(s) for s in sections]
+def _merge_section_into(dst: dict[str, Any], src: dict[str, Any]) -> None:
+    """Merge src into dst: union regions, combine names, pick dominant content_type."""
+    a, b = dst["region"], src["region"]
+    dst["region"] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+    dst["name"] = dst["name"] + " + " + src["name"]
+    # Prefer non-metadata content_type
+    if dst["content_type"] == "metadata":
+        dst["content_type"] = src["content_type"]
+    elif src["content_type"] != "metadata" and dst["content_type"] != src["content_type"]:
+        dst["content_type"] = "mixed"
+    # Combine element_ids if present (critical for second resolve pass)
+    if "element_ids" in dst and "element_ids" in src:
+        dst["element_ids"] = dst["element_ids"] + src["element_ids"]
+
+
+def _merge_overlapping_in_order(out: list[dict[str, Any]]) -> None:
+    """The v5 merge loop: merge every later overlapping section into i until stable."""
     changed = True
     while changed:
         changed = False
@@ -318,72 +459,123 @@ def _resolve_overlaps(sections: list[dict[str, Any]]) -> list[dict[str, Any]]:
             j = i + 1
             while j < len(out):
                 if _rect_intersection_area(out[i]["region"], out[j]["region"]) > 0:
-                    # Merge j into i
-                    out[i]["region"] = _bbox_union([out[i]["region"], out[j]["region"]])
-                    out[i]["name"] = out[i]["name"] + " + " + out[j]["name"]
-                    # Prefer non-metadata content_type
-                    if out[i]["content_type"] == "metadata":
-                        out[i]["content_type"] = out[j]["content_type"]
-                    elif out[j]["content_type"] != "metadata" and out[i]["content_type"] != out[j]["content_type"]:
-                        out[i]["content_type"] = "mixed"
-                    # Combine element_ids if present (critical for second resolve pass)
-                    if "element_ids" in out[i] and "element_ids" in out[j]:
-                        out[i]["element_ids"] = out[i]["element_ids"] + out[j]["element_ids"]
+                    _merge_section_into(out[i], out[j])
                     out.pop(j)
-                    changed = True  # restart — merged region may now overlap others
+                    changed = True  # merged region may now overlap others
                 else:
                     j += 1
             i += 1
+
+
+def _overlap_groups(regions: list[list[float]]) -> list[list[int]]:
+    """Partition region indices into the groups that end up merged together.
+
+    Connected components of positive-area overlap are found with an x-sorted
+    sweep and union-find; the components' union boxes can overlap further
+    regions, so the sweep repeats on them until no two boxes overlap. Groups
+    are returned in order of their first index.
+    """
+    parent = list(range(len(regions)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Empty or inverted regions have no positive-area overlap with anything
+    boxes = {
+        i: r for i, r in enumerate(regions)
+        if r[2] > r[0] and r[3] > r[1]
+    }
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        active: list[int] = []
+        for g in sorted(boxes, key=lambda g: boxes[g][0]):
+            box = boxes[g]
+            # Boxes ending at or before this x0 cannot overlap it or anything after it
+            active = [a for a in active if boxes[a][2] > box[0]]
+            for a in active:
+                if _rect_intersection_area(boxes[a], box) > 0:
+                    ra, rg = find(a), find(g)
+                    if ra != rg:
+                        parent[max(ra, rg)] = min(ra, rg)
+                        merged = True
+            active.append(g)
+        if merged:
+            unions: dict[int, list[float]] = {}
+            for g, box in boxes.items():
+                root = find(g)
+                u = unions.get(root)
+                unions[root] = list(box) if u is None else [
+                    min(u[0], box[0]), min(u[1], box[1]), max(u[2], box[2]), max(u[3], box[3]),
+                ]
+            boxes = unions
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(regions)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def _resolve_overlaps(sections: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # If two sections overlap, merge them into a single section
+    # (union their regions, combine names, pick dominant content_type).
+    # Sections of different groups never interact in the v5 loop, so replaying
+    # it per group gives the same names, content_types and element_id order.
+    out: list[dict[str, Any]] = []
+    for group in _overlap_groups([s["region"] for s in sections]):
+        merged = [dict(sections[k]) for k in group]
+        if len(merged) > 1:
+            _merge_overlapping_in_order(merged)
+        out.extend(merged)
     return out
 
 
 # ---------------------------------------------------------------------------
-# Element assignment — identical to v5
+# Element assignment — same result as v5, vectorized with NumPy
 # ---------------------------------------------------------------------------
 
 def _assign_elements_to_sections(
-    page_map: dict, sections: list[dict[str, Any]],
+    page_map: dict, sections: list[dict[str, Any]], arrays: PageMapArrays | None = None,
 ) -> list[dict[str, Any]]:
-    elements = page_map["elements"]
+    if arrays is None:
+        arrays = PageMapArrays(page_map)
     if not sections:
         return [{"name": "Page", "content_type": "mixed",
-                 "element_ids": [e["id"] for e in elements],
+                 "element_ids": list(arrays.ids),
                  "region": [0, 0, page_map["width"], page_map["height"]]}]
 
     sec_out = [{**s, "element_ids": []} for s in sections]
 
-    for el in elements:
-        eid = el["id"]
-        bx0, by0, bx1, by1 = map(float, el["bbox"])
-        cx, cy = _centroid([bx0, by0, bx1, by1])
-
-        containing = [si for si, s in enumerate(sec_out) if _contains_point(s["region"], cx, cy)]
-
-        if containing:
-            if len(containing) == 1:
-                chosen = containing[0]
-            else:
-                best_si, best_key = None, None
-                for si in containing:
-                    inter = _rect_intersection_area(sec_out[si]["region"], [bx0, by0, bx1, by1])
-                    key = (-inter, si)
-                    if best_key is None or key < best_key:
-                        best_key = key
-                        best_si = si
-                chosen = int(best_si)
-        else:
-            best_si, best_key = None, None
-            for si, s in enumerate(sec_out):
-                rx0, ry0, rx1, ry1 = s["region"]
-                dy = 0.0 if (ry0 <= cy <= ry1) else min(abs(cy - ry0), abs(cy - ry1))
-                dx = 0.0 if (rx0 <= cx <= rx1) else min(abs(cx - rx0), abs(cx - rx1))
-                key = (dy * dy + dx * dx, si)
-                if best_key is None or key < best_key:
-                    best_key = key
-                    best_si = si
-            chosen = int(best_si)
-
-        sec_out[chosen]["element_ids"].append(eid)
+    # Elements x sections matrices; argmax/argmin return the first extremum,
+    # which is the lowest section index like the (key, si) tie-break in v5.
+    b = arrays.bboxes
+    bx0, by0, bx1, by1 = (b[:, k:k + 1] for k in range(4))
+    cx, cy = (bx0 + bx1) / 2.0, (by0 + by1) / 2.0
+    regions = np.array([s["region"] for s in sec_out], dtype=np.float64)
+    rx0, ry0, rx1, ry1 = regions[:, 0], regions[:, 1], regions[:, 2], regions[:, 3]
+
+    in_x = (rx0 <= cx) & (cx <= rx1)
+    in_y = (ry0 <= cy) & (cy <= ry1)
+    containing = in_x & in_y
+    has_containing = containing.any(axis=1)
+
+    # Centroid inside one or more regions: largest intersection with the element bbox
+    ix0, iy0 = np.maximum(rx0, bx0), np.maximum(ry0, by0)
+    ix1, iy1 = np.minimum(rx1, bx1), np.minimum(ry1, by1)
+    inter = np.where((ix1 <= ix0) | (iy1 <= iy0), 0.0, (ix1 - ix0) * (iy1 - iy0))
+    by_overlap = np.where(containing, inter, -np.inf).argmax(axis=1)
+
+    # Otherwise: nearest region by squared centroid distance
+    dy = np.where(in_y, 0.0, np.minimum(np.abs(cy - ry0), np.abs(cy - ry1)))
+    dx = np.where(in_x, 0.0, np.minimum(np.abs(cx - rx0), np.abs(cx - rx1)))
+    by_distance = (dy * dy + dx * dx).argmin(axis=1)
+
+    chosen = np.where(has_containing, by_overlap, by_distance)
+    for eid, si in zip(arrays.ids, chosen.tolist()):
+        sec_out[si]["element_ids"].append(eid)
 
     # Dedup
     seen = set()
@@ -402,13 +594,8 @@ def _assign_elements_to_sections(
 # Rendering
 # ---------------------------------------------------------------------------
 
-def _render_page_image(pdf_path: str, page_num: int) -> bytes:
-    doc = fitz.open(pdf_path)
-    page = doc[page_num - 1]
-    pix = page.get_pixmap(matrix=fitz.Matrix(SCALE, SCALE))
-    png = pix.tobytes("png")
-    doc.close()
-    return png
+def _render_page_image(pdf_path: str, page_num: int, stage: str = "layout") -> bytes:
+    return render_page(pdf_path, page_num, get_policy(stage))
 
 
 # ---------------------------------------------------------------------------
@@ -435,45 +622,34 @@ def _normalize_sections(raw_sections: list, w: float, h: float) -> list[dict[str
     return norm
 
 
-def _page_map_to_json(page_map: dict) -> str:
-    """Convert page map to compact JSON for GPT, stripping internal fields."""
-    compact: dict[str, Any] = {
-        "width": page_map["width"],
-        "height": page_map["height"],
-        "elements": [],
-    }
-    if page_map.get("header_separator_y") is not None:
-        compact["header_separator_y"] = page_map["header_separator_y"]
-    for el in page_map["elements"]:
-        entry: dict[str, Any] = {
-            "id": el["id"],
-            "bbox": el["bbox"],
-        }
-        if el.get("content"):
-            entry["content"] = el["content"]
-        compact["elements"].append(entry)
-    return json.dumps(compact, ensure_ascii=False)
+def _response_json(resp: Any) -> dict[str, Any]:
+    """Parse a completion's JSON content, tolerating a ```json fence."""
+    raw = (resp.choices[0].message.content or "{}").strip()
+    if raw.startswith("```"):
+        raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
+        if raw.endswith("```"):
+            raw = raw[:-3]
+        raw = raw.strip()
+    return json.loads(raw)
 
 
-async def _call_gpt_layout_paired(
+def _layout_request_paired(
     ref_page_map: dict, ref_image: bytes,
     test_page_map: dict, test_image: bytes,
-) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
-    client = _get_client()
-
+) -> dict[str, Any]:
     user_content: list[dict[str, Any]] = []
 
     user_content.append({"type": "text", "text": "=== REFERENCE PAGE ==="})
     b64_ref = base64.b64encode(ref_image).decode("ascii")
-    user_content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64_ref}"}})
-    user_content.append({"type": "text", "text": _page_map_to_json(ref_page_map)})
+    user_content.append(image_content("layout", b64_ref))
+    user_content.append({"type": "text", "text": page_map_to_prompt(ref_page_map)})
 
     user_content.append({"type": "text", "text": "=== TEST PAGE ==="})
     b64_test = base64.b64encode(test_image).decode("ascii")
-    user_content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64_test}"}})
-    user_content.append({"type": "text", "text": _page_map_to_json(test_page_map)})
+    user_content.append(image_content("layout", b64_test))
+    user_content.append({"type": "text", "text": page_map_to_prompt(test_page_map)})
 
-    kwargs: dict[str, Any] = dict(
+    return dict(
         model=MODEL_NAME,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -486,21 +662,11 @@ async def _call_gpt_layout_paired(
         response_format={"type": "json_schema", "json_schema": SECTION_LAYOUT_SCHEMA},
     )
 
-    try:
-        resp = await client.chat.completions.create(**kwargs)
-    except TypeError:
-        kwargs.pop("response_format", None)
-        kwargs.pop("seed", None)
-        resp = await client.chat.completions.create(**kwargs)
-
-    raw = (resp.choices[0].message.content or "{}").strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
-        if raw.endswith("```"):
-            raw = raw[:-3]
-        raw = raw.strip()
 
-    parsed = json.loads(raw)
+def _layout_from_response_paired(
+    resp: Any, ref_page_map: dict, test_page_map: dict,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    parsed = _response_json(resp)
     w, h = float(ref_page_map["width"]), float(ref_page_map["height"])
     ref_sections = _normalize_sections(parsed.get("ref_sections", []), w, h)
     test_w, test_h = float(test_page_map["width"]), float(test_page_map["height"])
@@ -508,18 +674,36 @@ async def _call_gpt_layout_paired(
     return ref_sections, test_sections
 
 
-async def _call_gpt_layout_single(
-    page_map: dict, page_image: bytes,
-) -> list[dict[str, Any]]:
-    """Single-page GPT call — analyzes one page independently."""
-    client = _get_client()
+async def _call_gpt_layout_paired(
+    ref_page_map: dict, ref_image: bytes,
+    test_page_map: dict, test_image: bytes,
+    on_partial: Callable[[list[dict[str, Any]], list[dict[str, Any]]], None] | None = None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    kwargs = _layout_request_paired(ref_page_map, ref_image, test_page_map, test_image)
+    w, h = float(ref_page_map["width"]), float(ref_page_map["height"])
+    test_w, test_h = float(test_page_map["width"]), float(test_page_map["height"])
 
+    def partial_handler(items: dict[str, list[Any]]) -> None:
+        on_partial(
+            _normalize_sections(items["ref_sections"], w, h),
+            _normalize_sections(items["test_sections"], test_w, test_h),
+        )
+
+    resp = await _create_completion(
+        "layout", kwargs, cache=True,
+        stream_keys=("ref_sections", "test_sections"), on_partial=partial_handler if on_partial else None,
+        variant="paired",
+    )
+    return _layout_from_response_paired(resp, ref_page_map, test_page_map)
+
+
+def _layout_request_single(page_map: dict, page_image: bytes) -> dict[str, Any]:
     user_content: list[dict[str, Any]] = []
     b64 = base64.b64encode(page_image).decode("ascii")
-    user_content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}})
-    user_content.append({"type": "text", "text": _page_map_to_json(page_map)})
+    user_content.append(image_content("layout", b64))
+    user_content.append({"type": "text", "text": page_map_to_prompt(page_map)})
 
-    kwargs: dict[str, Any] = dict(
+    return dict(
         model=MODEL_NAME,
         messages=[
             {"role": "system", "content": SINGLE_SYSTEM_PROMPT},
@@ -532,33 +716,42 @@ async def _call_gpt_layout_single(
         response_format={"type": "json_schema", "json_schema": SINGLE_LAYOUT_SCHEMA},
     )
 
-    try:
-        resp = await client.chat.completions.create(**kwargs)
-    except TypeError:
-        kwargs.pop("response_format", None)
-        kwargs.pop("seed", None)
-        resp = await client.chat.completions.create(**kwargs)
-
-    raw = (resp.choices[0].message.content or "{}").strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
-        if raw.endswith("```"):
-            raw = raw[:-3]
-        raw = raw.strip()
 
-    parsed = json.loads(raw)
+def _layout_from_response_single(resp: Any, page_map: dict) -> list[dict[str, Any]]:
+    parsed = _response_json(resp)
     w, h = float(page_map["width"]), float(page_map["height"])
     return _normalize_sections(parsed.get("sections", []), w, h)
 
 
+async def _call_gpt_layout_single(
+    page_map: dict, page_image: bytes,
+    on_partial: Callable[[list[dict[str, Any]]], None] | None = None,
+) -> list[dict[str, Any]]:
+    """Single-page GPT call — analyzes one page independently."""
+    kwargs = _layout_request_single(page_map, page_image)
+    w, h = float(page_map["width"]), float(page_map["height"])
+
+    def partial_handler(items: dict[str, list[Any]]) -> None:
+        on_partial(_normalize_sections(items["sections"], w, h))
+
+    resp = await _create_completion(
+        "layout", kwargs, cache=True,
+        stream_keys=("sections",), on_partial=partial_handler if on_partial else None,
+        variant="single",
+    )
+    return _layout_from_response_single(resp, page_map)
+
+
 # ---------------------------------------------------------------------------
 # Apply layout to single page — identical to v5 pipeline
 # ---------------------------------------------------------------------------
 
 def _apply_layout_to_page(
-    page_map: dict, layout: list[dict[str, Any]],
+    page_map: dict, layout: list[dict[str, Any]], arrays: PageMapArrays | None = None,
 ) -> list[dict[str, Any]]:
     """Apply a layout: resolve overlaps, assign elements, recompute regions, drop empty."""
+    if arrays is None:
+        arrays = PageMapArrays(page_map)
     layout_copy = [dict(s) for s in layout]
 
     # Clip header sections at detected separator line
@@ -575,15 +768,14 @@ def _apply_layout_to_page(
     layout_copy = _resolve_overlaps(layout_copy)
 
     # Assign elements to sections by centroid
-    sections = _assign_elements_to_sections(page_map, layout_copy)
+    sections = _assign_elements_to_sections(page_map, layout_copy, arrays)
 
     # Recompute regions from assigned elements
-    elements_by_id = {e["id"]: e for e in page_map["elements"]}
     for s in sections:
         if s["element_ids"]:
-            bboxes = [list(map(float, elements_by_id[eid]["bbox"])) for eid in s["element_ids"] if eid in elements_by_id]
-            if bboxes:
-                s["region"] = _bbox_union(bboxes)
+            region = arrays.union(s["element_ids"])
+            if region is not None:
+                s["region"] = region
 
     # Resolve overlaps created by region recomputation
     sections = _resolve_overlaps(sections)
@@ -601,16 +793,186 @@ def _apply_layout_to_page(
 # Bbox computation
 # ---------------------------------------------------------------------------
 
-def _compute_bbox(section: dict, elements_by_id: dict) -> list[float]:
-    x0s, y0s, x1s, y1s = [], [], [], []
-    for eid in section.get("element_ids", []):
-        el = elements_by_id.get(eid)
-        if el:
-            b = el["bbox"]
-            x0s.append(b[0]); y0s.append(b[1]); x1s.append(b[2]); y1s.append(b[3])
-    if not x0s:
+def _compute_bbox(section: dict, arrays: PageMapArrays) -> list[float]:
+    bbox = arrays.union(section.get("element_ids", []))
+    if bbox is None:
         return [0, 0, 0, 0]
-    return [min(x0s), min(y0s), max(x1s), max(y1s)]
+    return bbox
+
+
+# ---------------------------------------------------------------------------
+# Page map + layout → PageAnalysis (CPU only; run through run_cpu)
+# ---------------------------------------------------------------------------
+
+def _layout_to_analysis(page_num: int, page_map: dict, layout: list[dict[str, Any]]) -> PageAnalysis:
+    arrays = PageMapArrays(page_map)
+    sections = _apply_layout_to_page(page_map, layout, arrays)
+    return PageAnalysis(
+        page_number=page_num,
+        page_width=page_map["width"],
+        page_height=page_map["height"],
+        sections=[
+            Section(
+                name=s["name"],
+                content_type=s["content_type"],
+                element_ids=s["element_ids"],
+                bbox=_compute_bbox(s, arrays),
+            )
+            for s in sections
+        ],
+    )
+
+
+def _elements_to_analysis(page_num: int, page_map: dict) -> PageAnalysis:
+    sections = []
+    for el in page_map["elements"]:
+        sections.append(Section(
+            name=f'{el["id"]}: {(el.get("content") or el["type"])[:60]}',
+            content_type=el["type"],
+            element_ids=[el["id"]],
+            bbox=el["bbox"],
+        ))
+    return PageAnalysis(
+        page_number=page_num,
+        page_width=page_map["width"],
+        page_height=page_map["height"],
+        sections=sections,
+    )
+
+
+def _raw_analysis(
+    page_num: int, page_map: dict, layout: list[dict[str, Any]], partial: bool = False,
+) -> PageAnalysis:
+    """GPT regions as sections, without element assignment (raw mode and streamed partials)."""
+    return PageAnalysis(
+        page_number=page_num,
+        page_width=page_map["width"],
+        page_height=page_map["height"],
+        sections=[
+            Section(
+                name=s["name"],
+                content_type=s["content_type"],
+                element_ids=[],
+                bbox=s["region"],
+            )
+            for s in layout
+        ],
+        partial=partial,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Layouts: reused from a matching template, else from GPT
+# ---------------------------------------------------------------------------
+
+def _template_context(prompt: str) -> str:
+    _get_client()  # resolves MODEL_NAME
+    return f"{MODEL_NAME}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}"
+
+
+async def _layout_paired(
+    ref_path: str, test_path: str, page_num: int, ref_map: dict, test_map: dict,
+    on_partial: Callable[[list[dict[str, Any]], list[dict[str, Any]]], None] | None = None,
+    use_templates: bool = True,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    context = _template_context(SYSTEM_PROMPT)
+    if use_templates:
+        cached = await asyncio.to_thread(layout_templates.lookup, "paired", context, [ref_map, test_map])
+        if cached is not None:
+            return cached[0], cached[1]
+    ref_image, test_image = await asyncio.gather(
+        run_cpu(_render_page_image, ref_path, page_num),
+        run_cpu(_render_page_image, test_path, page_num),
+    )
+    ref_layout, test_layout = await _call_gpt_layout_paired(ref_map, ref_image, test_map, test_image, on_partial)
+    if use_templates:
+        await asyncio.to_thread(
+            layout_templates.store, "paired", context, [ref_map, test_map], [ref_layout, test_layout],
+        )
+    return ref_layout, test_layout
+
+
+async def _stored_layout_single(
+    pdf_path: str, page_num: int, page_map: dict, context: str, use_templates: bool,
+) -> list[dict[str, Any]] | None:
+    """Layout of this page reused without a GPT call, or None."""
+    # The same file page (e.g. a reference shared by many jobs) was laid out before
+    stored = await asyncio.to_thread(reference_artifacts.lookup_layout, pdf_path, page_num, context)
+    if stored is not None:
+        return stored
+    if use_templates:
+        cached = await asyncio.to_thread(layout_templates.lookup, "single", context, [page_map])
+        if cached is not None:
+            return cached[0]
+    return None
+
+
+async def _gpt_layout_single(
+    pdf_path: str, page_num: int, page_map: dict, context: str,
+    on_partial: Callable[[list[dict[str, Any]]], None] | None = None,
+    use_templates: bool = True,
+) -> list[dict[str, Any]]:
+    """Layout of this page from GPT, stored for later reuse."""
+    page_image = await run_cpu(_render_page_image, pdf_path, page_num)
+    layout = await _call_gpt_layout_single(page_map, page_image, on_partial)
+    if use_templates:
+        await asyncio.to_thread(layout_templates.store, "single", context, [page_map], [layout])
+    await asyncio.to_thread(reference_artifacts.store_layout, pdf_path, page_num, context, layout)
+    return layout
+
+
+async def _layout_single(
+    pdf_path: str, page_num: int, page_map: dict,
+    on_partial: Callable[[list[dict[str, Any]]], None] | None = None,
+    use_templates: bool = True,
+) -> list[dict[str, Any]]:
+    context = _template_context(SINGLE_SYSTEM_PROMPT)
+    stored = await _stored_layout_single(pdf_path, page_num, page_map, context, use_templates)
+    if stored is not None:
+        return stored
+    return await _gpt_layout_single(pdf_path, page_num, page_map, context, on_partial, use_templates)
+
+
+async def analyze_identical_page(
+    ref_path: str, page_num: int, mode: str = "paired",
+    on_partial: Callable[[str, PageAnalysis], None] | None = None,
+) -> tuple[PageAnalysis, PageAnalysis, bool]:
+    """Ref and test pages are identical (see page_identity): lay out the
+    reference alone and mirror it onto the test page.
+
+    The reference layout comes from a stored layout or template when there
+    is one, else from one single-page GPT call. Returns the two analyses and
+    whether GPT was called.
+    """
+    page_map = await run_cpu(extract_page_map, ref_path, page_num)
+    if not page_map["elements"]:
+        analysis = PageAnalysis(
+            page_number=page_num, page_width=page_map["width"], page_height=page_map["height"], sections=[],
+        )
+        return analysis, analysis.model_copy(deep=True), False
+
+    def publish(layout: list[dict[str, Any]]) -> None:
+        partial = _raw_analysis(page_num, page_map, layout, partial=True)
+        on_partial("reference", partial)
+        on_partial("test", partial)
+
+    context = _template_context(SINGLE_SYSTEM_PROMPT)
+    use_templates = mode != "raw"
+    layout = await _stored_layout_single(ref_path, page_num, page_map, context, use_templates)
+    called = layout is None
+    if called:
+        layout = await _gpt_layout_single(
+            ref_path, page_num, page_map, context, publish if on_partial else None, use_templates,
+        )
+    if mode == "raw":
+        analysis = _raw_analysis(page_num, page_map, layout)
+    else:
+        analysis = await run_cpu(_layout_to_analysis, page_num, page_map, layout)
+    logger.info(
+        "Page %d (identical%s): %d sections mirrored to test",
+        page_num, "" if called else ", stored layout", len(analysis.sections),
+    )
+    return analysis, analysis.model_copy(deep=True), called
 
 
 # ---------------------------------------------------------------------------
@@ -619,40 +981,32 @@ def _compute_bbox(section: dict, elements_by_id: dict) -> list[float]:
 
 async def analyze_page_pair(
     ref_path: str, test_path: str, page_num: int, mode: str = "paired",
+    on_partial: Callable[[str, PageAnalysis], None] | None = None,
 ) -> tuple[PageAnalysis, PageAnalysis]:
     """Analyze a single page from both ref and test PDFs.
 
     mode="paired": one GPT call with both pages (consistent naming).
     mode="single": two independent GPT calls (one per page).
+    on_partial(category, analysis) receives raw GPT regions while a streamed
+    layout response is still arriving (LLM_STREAMING only).
+    Identical pages go through analyze_identical_page instead.
+    With LAYOUT_TEMPLATES=1 (not in raw mode), a layout stored for a
+    structurally matching page (layout_templates) is reused instead of
+    calling GPT.
     """
-    import asyncio
-
-    # Extract page maps and render images in parallel
-    ref_map, test_map, ref_image, test_image = await asyncio.gather(
-        asyncio.to_thread(extract_page_map, ref_path, page_num),
-        asyncio.to_thread(extract_page_map, test_path, page_num),
-        asyncio.to_thread(_render_page_image, ref_path, page_num),
-        asyncio.to_thread(_render_page_image, test_path, page_num),
+    # Page images are only rendered when GPT is actually called
+    ref_map, test_map = await asyncio.gather(
+        run_cpu(extract_page_map, ref_path, page_num),
+        run_cpu(extract_page_map, test_path, page_num),
     )
 
     if mode == "elements":
         # Elements mode: show raw pdfplumber merged elements as sections (GPT input)
-        def map_to_sections(page_map: dict) -> PageAnalysis:
-            sections = []
-            for el in page_map["elements"]:
-                sections.append(Section(
-                    name=f'{el["id"]}: {(el.get("content") or el["type"])[:60]}',
-                    content_type=el["type"],
-                    element_ids=[el["id"]],
-                    bbox=el["bbox"],
-                ))
-            return PageAnalysis(
-                page_number=page_num,
-                page_width=page_map["width"],
-                page_height=page_map["height"],
-                sections=sections,
-            )
-        return map_to_sections(ref_map), map_to_sections(test_map)
+        ref_analysis, test_analysis = await asyncio.gather(
+            run_cpu(_elements_to_analysis, page_num, ref_map),
+            run_cpu(_elements_to_analysis, page_num, test_map),
+        )
+        return ref_analysis, test_analysis
 
     # Handle empty pages
     if not ref_map["elements"] and not test_map["elements"]:
@@ -661,78 +1015,43 @@ async def analyze_page_pair(
             PageAnalysis(page_number=page_num, page_width=test_map["width"], page_height=test_map["height"], sections=[]),
         )
 
+    def publish_ref(layout: list[dict[str, Any]]) -> None:
+        on_partial("reference", _raw_analysis(page_num, ref_map, layout, partial=True))
+
+    def publish_test(layout: list[dict[str, Any]]) -> None:
+        on_partial("test", _raw_analysis(page_num, test_map, layout, partial=True))
+
+    def publish_pair(ref_layout: list[dict[str, Any]], test_layout: list[dict[str, Any]]) -> None:
+        publish_ref(ref_layout)
+        publish_test(test_layout)
+
+    streaming = on_partial is not None
+    use_templates = mode != "raw"
     if mode == "single":
         # Two independent GPT calls
         ref_layout, test_layout = await asyncio.gather(
-            _call_gpt_layout_single(ref_map, ref_image),
-            _call_gpt_layout_single(test_map, test_image),
+            _layout_single(ref_path, page_num, ref_map, publish_ref if streaming else None, use_templates),
+            _layout_single(test_path, page_num, test_map, publish_test if streaming else None, use_templates),
         )
     else:
         # One paired GPT call
-        ref_layout, test_layout = await _call_gpt_layout_paired(
-            ref_map, ref_image, test_map, test_image,
+        ref_layout, test_layout = await _layout_paired(
+            ref_path, test_path, page_num, ref_map, test_map, publish_pair if streaming else None, use_templates,
         )
 
     if mode == "raw":
         # Raw mode: use GPT bounding boxes directly, no post-processing
-        def to_raw_sections(layout: list[dict], page_map: dict) -> list[Section]:
-            result = []
-            for s in layout:
-                result.append(Section(
-                    name=s["name"],
-                    content_type=s["content_type"],
-                    element_ids=[],
-                    bbox=s["region"],
-                ))
-            return result
-
-        ref_analysis = PageAnalysis(
-            page_number=page_num,
-            page_width=ref_map["width"],
-            page_height=ref_map["height"],
-            sections=to_raw_sections(ref_layout, ref_map),
-        )
-        test_analysis = PageAnalysis(
-            page_number=page_num,
-            page_width=test_map["width"],
-            page_height=test_map["height"],
-            sections=to_raw_sections(test_layout, test_map),
-        )
+        ref_analysis = _raw_analysis(page_num, ref_map, ref_layout)
+        test_analysis = _raw_analysis(page_num, test_map, test_layout)
 
         logger.info("Page %d (raw): ref=%d sections, test=%d sections",
                      page_num, len(ref_layout), len(test_layout))
         return ref_analysis, test_analysis
 
-    # Apply layout to each page
-    ref_sections_raw = _apply_layout_to_page(ref_map, ref_layout)
-    test_sections_raw = _apply_layout_to_page(test_map, test_layout)
-
-    # Convert to model objects
-    ref_elements_by_id = {e["id"]: e for e in ref_map["elements"]}
-    test_elements_by_id = {e["id"]: e for e in test_map["elements"]}
-
-    def to_sections(raw: list[dict], elements_by_id: dict) -> list[Section]:
-        result = []
-        for s in raw:
-            result.append(Section(
-                name=s["name"],
-                content_type=s["content_type"],
-                element_ids=s["element_ids"],
-                bbox=_compute_bbox(s, elements_by_id),
-            ))
-        return result
-
-    ref_analysis = PageAnalysis(
-        page_number=page_num,
-        page_width=ref_map["width"],
-        page_height=ref_map["height"],
-        sections=to_sections(ref_sections_raw, ref_elements_by_id),
-    )
-    test_analysis = PageAnalysis(
-        page_number=page_num,
-        page_width=test_map["width"],
-        page_height=test_map["height"],
-        sections=to_sections(test_sections_raw, test_elements_by_id),
+    # Apply layout to each page, off the event loop
+    ref_analysis, test_analysis = await asyncio.gather(
+        run_cpu(_layout_to_analysis, page_num, ref_map, ref_layout),
+        run_cpu(_layout_to_analysis, page_num, test_map, test_layout),
     )
 
     logger.info(
@@ -1,8 +1,34 @@
-import fitz  # pymupdf
+import hashlib
+import os
+import threading
+
+from .doc_pool import open_fitz
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+_hash_lock = threading.Lock()
+_file_hashes: dict[tuple[str, int, int], str] = {}
 
 
 def get_page_count(file_path: str) -> int:
-    doc = fitz.open(file_path)
-    count = len(doc)
-    doc.close()
-    return count
+    with open_fitz(file_path) as doc:
+        return len(doc)
+
+
+def file_hash(file_path: str) -> str:
+    """Return the sha256 of a file's content, memoized by path, size and mtime."""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        cached = _file_hashes.get(memo_key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _hash_lock:
+        _file_hashes[memo_key] = value
+    return value
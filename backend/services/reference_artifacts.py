@@ -0,0 +1,184 @@
+"""
+Reference-side artifacts shared across jobs by file content hash.
+
+Many jobs compare new test runs against the same reference PDFs. Page maps
+(page_map) and page renders (render_cache) are already keyed by content
+hash; this module adds the rest of the per-file work:
+
+  - page counts, so creating a job does not reopen a file seen before;
+  - single-mode layouts per (content hash, page, prompt/model), so a page
+    segmented once is never sent to GPT again, whichever job uploaded it;
+  - warm-up: a new job extracts page maps and renders the
+    REFERENCE_WARMUP_STAGES page images of every reference file in the
+    background (run_cpu_background, so interactive analysis is never queued
+    behind it), unless that file was already warmed with the current
+    extractor and image policies.
+
+Everything is stored on disk under data/cache/reference_artifacts.
+REFERENCE_ARTIFACTS=0 turns layout reuse off; REFERENCE_WARMUP=0 turns the
+warm-up off. A job started with bypass_cache skips stored layouts.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from ..models import JobMetadata
+from . import llm_cache
+from .cpu_pool import run_cpu_background
+from .disk_cache import DiskCache
+from .image_policy import STAGES, get_policy
+from .page_map import EXTRACTOR_VERSION, prefetch_page_maps
+from .pdf_utils import file_hash, get_page_count
+from .render_cache import render_page
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_ARTIFACTS_ENABLED = os.environ.get("REFERENCE_ARTIFACTS", "1").strip().lower() not in ("0", "false", "no", "off")
+REFERENCE_WARMUP_ENABLED = os.environ.get("REFERENCE_WARMUP", "1").strip().lower() not in ("0", "false", "no", "off")
+REFERENCE_WARMUP_STAGES = tuple(
+    s.strip() for s in os.environ.get("REFERENCE_WARMUP_STAGES", "layout,global").split(",") if s.strip()
+)
+for _stage in set(REFERENCE_WARMUP_STAGES) - set(STAGES):
+    logger.error("Ignoring unknown REFERENCE_WARMUP_STAGES entry: %r", _stage)
+REFERENCE_WARMUP_STAGES = tuple(s for s in REFERENCE_WARMUP_STAGES if s in STAGES)
+REFERENCE_ARTIFACTS_CACHE_MAX_BYTES = int(os.environ.get("REFERENCE_ARTIFACTS_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+_cache = DiskCache("reference_artifacts", REFERENCE_ARTIFACTS_CACHE_MAX_BYTES, suffix=".json")
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "page_counts_reused": 0, "layouts_reused": 0, "layouts_stored": 0,
+    "files_warmed": 0, "files_already_warm": 0, "pages_warmed": 0, "warmup_errors": 0,
+}
+
+# Files being warmed right now: two jobs uploading the same reference share one warm-up
+_warming: dict[str, asyncio.Task] = {}
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] += n
+
+
+def _get_json(key: tuple) -> Any:
+    data = _cache.get(key)
+    if data is None:
+        return None
+    try:
+        return json.loads(data)
+    except ValueError:
+        logger.warning("Ignoring unreadable reference artifact %s", key[0])
+        return None
+
+
+def _put_json(key: tuple, value: Any) -> None:
+    _cache.put(key, json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+# ---------------------------------------------------------------------------
+# Page counts
+# ---------------------------------------------------------------------------
+
+def page_count(pdf_path: str) -> int:
+    """Page count of a PDF, remembered by content hash."""
+    key = ("page_count", file_hash(pdf_path))
+    cached = _get_json(key)
+    if cached is not None:
+        _count("page_counts_reused")
+        return cached
+    count = get_page_count(pdf_path)
+    _put_json(key, count)
+    return count
+
+
+# ---------------------------------------------------------------------------
+# Single-mode layouts
+# ---------------------------------------------------------------------------
+
+def _layout_key(pdf_path: str, page_num: int, context: str) -> tuple:
+    return ("single_layout", file_hash(pdf_path), page_num, EXTRACTOR_VERSION, context)
+
+
+def lookup_layout(pdf_path: str, page_num: int, context: str) -> list[dict[str, Any]] | None:
+    """Layout stored for this exact file page, or None.
+
+    context identifies the prompt and model the layout came from. Reads the
+    disk cache (and may hash the file): call it off the event loop.
+    """
+    if not REFERENCE_ARTIFACTS_ENABLED or llm_cache.bypassed():
+        return None
+    layout = _get_json(_layout_key(pdf_path, page_num, context))
+    if layout is not None:
+        _count("layouts_reused")
+    return layout
+
+
+def store_layout(pdf_path: str, page_num: int, context: str, layout: list[dict[str, Any]]) -> None:
+    if not REFERENCE_ARTIFACTS_ENABLED or not layout:
+        return
+    _put_json(_layout_key(pdf_path, page_num, context), layout)
+    _count("layouts_stored")
+
+
+# ---------------------------------------------------------------------------
+# Warm-up on job creation
+# ---------------------------------------------------------------------------
+
+def _warm_signature() -> str:
+    return repr((EXTRACTOR_VERSION, [(stage, get_policy(stage)) for stage in REFERENCE_WARMUP_STAGES]))
+
+
+async def _warm_file(pdf_path: str, digest: str) -> None:
+    key = ("warmed", digest)
+    signature = _warm_signature()
+    if await asyncio.to_thread(_get_json, key) == signature:
+        _count("files_already_warm")
+        return
+    pages = await run_cpu_background(prefetch_page_maps, pdf_path)
+    await asyncio.gather(*(
+        run_cpu_background(render_page, pdf_path, pg, get_policy(stage))
+        for stage in REFERENCE_WARMUP_STAGES
+        for pg in range(1, pages + 1)
+    ))
+    await asyncio.to_thread(_put_json, key, signature)
+    _count("files_warmed")
+    _count("pages_warmed", pages)
+    logger.info("warmed reference %s (%d pages)", pdf_path, pages)
+
+
+async def _warm_once(pdf_path: str) -> None:
+    digest = await asyncio.to_thread(file_hash, pdf_path)
+    task = _warming.get(digest)
+    if task is None:
+        task = _warming[digest] = asyncio.create_task(_warm_file(pdf_path, digest))
+        task.add_done_callback(lambda _: _warming.pop(digest, None))
+    await task
+
+
+async def warm_up(job: JobMetadata, reference_dir: str) -> None:
+    """Extract page maps and render page images of the job's reference files."""
+    if not REFERENCE_WARMUP_ENABLED:
+        return
+    paths = [str(Path(reference_dir) / pair.filename) for pair in job.pairs]
+    outcomes = await asyncio.gather(*(_warm_once(path) for path in paths), return_exceptions=True)
+    for path, outcome in zip(paths, outcomes):
+        if isinstance(outcome, Exception):
+            _count("warmup_errors")
+            logger.warning("reference warm-up failed job=%s %s: %s", job.job_id, path, outcome)
+
+
+def artifact_metrics() -> dict[str, Any]:
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    return {
+        "enabled": REFERENCE_ARTIFACTS_ENABLED,
+        "warmup_enabled": REFERENCE_WARMUP_ENABLED,
+        "warmup_stages": list(REFERENCE_WARMUP_STAGES),
+        **snapshot,
+        "warming": len(_warming),
+    }
@@ -0,0 +1,83 @@
+"""
+Content-addressed cache for rasterized PDF pages.
+
+Renders are keyed by (file content hash, page, image policy), so every pipeline
+and every chat request that needs the same page image shares one render, even
+across jobs that uploaded the same file. Section crops are rasterized directly
+from their clip rectangle and cached by (file hash, page, bbox, image policy).
+"""
+
+import io
+import logging
+import os
+
+import fitz
+
+from .disk_cache import DiskCache
+from .doc_pool import open_fitz
+from .image_policy import ImagePolicy
+from .pdf_utils import file_hash
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+_cache = DiskCache("renders", RENDER_CACHE_MAX_BYTES)
+
+
+def _encode(pix: fitz.Pixmap, policy: ImagePolicy) -> bytes:
+    if policy.format == "png":
+        return pix.tobytes("png")
+    if policy.format == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=policy.quality)
+    # WebP is not written by MuPDF; go through PIL
+    from PIL import Image
+
+    mode = "RGBA" if pix.alpha else "RGB"
+    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    buf = io.BytesIO()
+    img.save(buf, format="WEBP", quality=policy.quality)
+    return buf.getvalue()
+
+
+def _rasterize(
+    pdf_path: str, page_num: int, policy: ImagePolicy,
+    clip: tuple[float, float, float, float] | None = None,
+) -> bytes:
+    with open_fitz(pdf_path) as doc:
+        page = doc[page_num - 1]
+        area = fitz.Rect(clip) & page.rect if clip is not None else page.rect
+        scale = policy.dpi_for(area.width, area.height) / 72
+        pix = page.get_pixmap(
+            matrix=fitz.Matrix(scale, scale),
+            clip=area if clip is not None else None,
+        )
+    return _encode(pix, policy)
+
+
+def render_page(pdf_path: str, page_num: int, policy: ImagePolicy) -> bytes:
+    """Render a 1-based page, serving it from the cache when already rendered."""
+    key = ("page", file_hash(pdf_path), page_num, policy)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = _rasterize(pdf_path, page_num, policy)
+    _cache.put(key, data)
+    logger.debug("rendered %s p%d with %s (%d bytes)", pdf_path, page_num, policy, len(data))
+    return data
+
+
+def render_clip(
+    pdf_path: str, page_num: int, bbox: list[float], policy: ImagePolicy,
+) -> bytes:
+    """Render only the bbox region (PDF points) of a 1-based page, cached per region."""
+    clip = tuple(round(float(v), 1) for v in bbox)
+    key = ("clip", file_hash(pdf_path), page_num, clip, policy)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = _rasterize(pdf_path, page_num, policy, clip=clip)
+    _cache.put(key, data)
+    return data
@@ -1,20 +1,19 @@
 """
 Per-section comparison analysis.
 
-Crops section regions from page images and sends to GPT for comparison.
+Renders section regions from the PDFs and sends them to GPT for comparison.
 Returns a list of checks per section.
 """
 
 import base64
-import io
-import json
 import logging
+from collections.abc import Callable
 from typing import Any
 
-from PIL import Image
-
 from ..models import CheckStatus, SectionCheck, SectionCheckResult
-from .paired_sections import SCALE, _get_client
+from .image_policy import get_policy, image_content
+from .paired_sections import _create_completion, _response_json
+from .render_cache import render_clip
 from .section_instructions import get_instructions_for_section
 
 logger = logging.getLogger(__name__)
@@ -74,37 +73,37 @@ SECTION_SCHEMA: dict[str, Any] = {
 }
 
 
-def _crop_section(page_png: bytes, bbox: list[float]) -> bytes:
-    """Crop a section region from a full page PNG image."""
-    img = Image.open(io.BytesIO(page_png))
-    pixel_bbox = (
-        int(bbox[0] * SCALE),
-        int(bbox[1] * SCALE),
-        int(bbox[2] * SCALE),
-        int(bbox[3] * SCALE),
-    )
-    pixel_bbox = (
-        max(0, pixel_bbox[0]),
-        max(0, pixel_bbox[1]),
-        min(img.width, pixel_bbox[2]),
-        min(img.height, pixel_bbox[3]),
-    )
-    cropped = img.crop(pixel_bbox)
-    buf = io.BytesIO()
-    cropped.save(buf, format="PNG")
-    return buf.getvalue()
+def _crop_section(
+    pdf_path: str, page_num: int, bbox: list[float], stage: str = "section",
+) -> bytes:
+    """Render a section region of a PDF page directly with the stage's image policy."""
+    return render_clip(pdf_path, page_num, bbox, get_policy(stage))
 
 
 def _render_numbered_items(items: list[str]) -> str:
     return "\n".join(f"{i}. {item}" for i, item in enumerate(items, start=1))
 
 
-async def analyze_section(
-    ref_crop: bytes,
-    test_crop: bytes,
-    section_name: str,
-) -> SectionCheckResult:
-    """Compare two cropped section images using GPT. Returns multiple checks."""
+def _to_checks(checks_raw: list[Any]) -> list[SectionCheck]:
+    checks = []
+    for c in checks_raw:
+        status = c.get("status", "maybe")
+        if status not in ("ok", "maybe", "issue"):
+            status = "maybe"
+        checks.append(
+            SectionCheck(
+                check_name=c.get("check_name", "Check"),
+                status=CheckStatus(status),
+                explanation=c.get("explanation", ""),
+            )
+        )
+    return checks
+
+
+def _section_request(
+    ref_crop: bytes, test_crop: bytes, section_name: str,
+) -> tuple[dict[str, Any], bool]:
+    """Build the comparison request; also returns whether section-specific instructions matched."""
     instructions = get_instructions_for_section(section_name)
     generic_items = instructions["generic_items"]
     specific_items = instructions["specific_items"]
@@ -124,17 +123,15 @@ async def analyze_section(
         )
     instruction_text = "\n\n".join(instruction_text_parts)
 
-    client = _get_client()
-
     b64_ref = base64.b64encode(ref_crop).decode("ascii")
     b64_test = base64.b64encode(test_crop).decode("ascii")
 
     user_content: list[dict[str, Any]] = [
         {"type": "text", "text": f'Section: "{section_name}"'},
         {"type": "text", "text": "=== REFERENCE ==="},
-        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64_ref}"}},
+        image_content("section", b64_ref),
         {"type": "text", "text": "=== TEST ==="},
-        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64_test}"}},
+        image_content("section", b64_test),
     ]
     if instruction_text:
         user_content.append({"type": "text", "text": instruction_text})
@@ -151,39 +148,40 @@ async def analyze_section(
         seed=SEED,
         response_format={"type": "json_schema", "json_schema": SECTION_SCHEMA},
     )
+    return kwargs, matched
 
-    try:
-        resp = await client.chat.completions.create(**kwargs)
-    except TypeError:
-        kwargs.pop("response_format", None)
-        kwargs.pop("seed", None)
-        resp = await client.chat.completions.create(**kwargs)
-
-    raw = (resp.choices[0].message.content or "{}").strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
-        if raw.endswith("```"):
-            raw = raw[:-3]
-        raw = raw.strip()
-
-    parsed = json.loads(raw)
-    checks_raw = parsed.get("checks", [])
-
-    checks = []
-    for c in checks_raw:
-        status = c.get("status", "maybe")
-        if status not in ("ok", "maybe", "issue"):
-            status = "maybe"
-        checks.append(
-            SectionCheck(
-                check_name=c.get("check_name", "Check"),
-                status=CheckStatus(status),
-                explanation=c.get("explanation", ""),
-            )
-        )
 
+def _section_from_response(resp: Any, section_name: str, matched: bool) -> SectionCheckResult:
+    parsed = _response_json(resp)
     return SectionCheckResult(
         section_name=section_name,
-        checks=checks,
+        checks=_to_checks(parsed.get("checks", [])),
         matched_instructions=matched,
     )
+
+
+async def analyze_section(
+    ref_crop: bytes,
+    test_crop: bytes,
+    section_name: str,
+    on_partial: Callable[[SectionCheckResult], None] | None = None,
+) -> SectionCheckResult:
+    """Compare two cropped section images using GPT. Returns multiple checks.
+
+    With LLM_STREAMING, on_partial receives the checks parsed so far while the
+    response is still arriving.
+    """
+    kwargs, matched = _section_request(ref_crop, test_crop, section_name)
+
+    def partial_handler(items: dict[str, list[Any]]) -> None:
+        on_partial(SectionCheckResult(
+            section_name=section_name,
+            checks=_to_checks(items["checks"]),
+            matched_instructions=matched,
+        ))
+
+    resp = await _create_completion(
+        "section", kwargs, cache=True,
+        stream_keys=("checks",), on_partial=partial_handler if on_partial else None,
+    )
+    return _section_from_response(resp, section_name, matched)
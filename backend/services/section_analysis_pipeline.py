@@ -11,13 +11,14 @@ from ..models import (
     SectionCheckResult,
     SectionPageAnalysisResult,
 )
-from . import analysis_store, job_store, section_analysis_store
-from .paired_sections import _render_page_image
+from . import analysis_store, job_store, llm_cache, llm_telemetry, page_identity, section_analysis_store
+from .cpu_pool import run_cpu
+from .llm_scheduler import PIPELINE_CONCURRENCY
 from .section_analysis import _crop_section, analyze_section
 
 logger = logging.getLogger(__name__)
 
-MAX_CONCURRENCY = 4
+MAX_CONCURRENCY = PIPELINE_CONCURRENCY
 PROGRESS_PERSIST_INTERVAL = 10
 UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
 MATCH_THRESHOLD = 75
@@ -57,20 +58,77 @@ def _match_sections(
     return matched, ref_only, test_only
 
 
+def _error_result(section_name: str, error: Exception | str) -> SectionCheckResult:
+    return SectionCheckResult(
+        section_name=section_name,
+        checks=[SectionCheck(
+            check_name="Analysis error",
+            status=CheckStatus.maybe,
+            explanation=f"Analysis failed: {error}",
+        )],
+        matched_instructions=False,
+    )
+
+
+def _presence_results(ref_only: list[str], test_only: list[str]) -> list[SectionCheckResult]:
+    results: list[SectionCheckResult] = []
+
+    # Flag sections only on reference (missing from test)
+    for name in ref_only:
+        results.append(SectionCheckResult(
+            section_name=name,
+            checks=[SectionCheck(
+                check_name="Section presence",
+                status=CheckStatus.issue,
+                explanation="Section missing on test page",
+            )],
+            matched_instructions=False,
+        ))
+
+    # Flag sections only on test (missing from reference)
+    for name in test_only:
+        results.append(SectionCheckResult(
+            section_name=name,
+            checks=[SectionCheck(
+                check_name="Section presence",
+                status=CheckStatus.issue,
+                explanation="Section missing on reference page",
+            )],
+            matched_instructions=False,
+        ))
+    return results
+
+
+def _identical_result(section_name: str) -> SectionCheckResult:
+    return SectionCheckResult(
+        section_name=section_name,
+        checks=[SectionCheck(
+            check_name="Identical page",
+            status=CheckStatus.skipped,
+            explanation=page_identity.IDENTICAL_EXPLANATION,
+        )],
+        matched_instructions=False,
+    )
+
+
 async def _analyze_page_sections(
     job_id: str, pair_id: str,
     ref_path: str, test_path: str, page_num: int,
-) -> None:
-    """Analyze all sections on a single page pair."""
-    ref_analysis = analysis_store.get(job_id, pair_id, "reference", page_num)
-    test_analysis = analysis_store.get(job_id, pair_id, "test", page_num)
+    identical: bool = False,
+) -> bool:
+    """Analyze all sections on a single page pair (without GPT if the pages are identical).
+
+    Returns whether any section checks were skipped as identical.
+    """
+    ref_analysis = analysis_store.get_final(job_id, pair_id, "reference", page_num)
+    test_analysis = analysis_store.get_final(job_id, pair_id, "test", page_num)
 
     if not ref_analysis and not test_analysis:
         section_analysis_store.store(
             job_id, pair_id, page_num,
             SectionPageAnalysisResult(page_number=page_num, results=[]),
         )
-        return
+        return False
 
     ref_sections = {s.name: s for s in (ref_analysis.sections if ref_analysis else [])}
     test_sections = {s.name: s for s in (test_analysis.sections if test_analysis else [])}
@@ -80,71 +138,49 @@ async def _analyze_page_sections(
         list(ref_sections.keys()), list(test_sections.keys()),
     )
 
-    # Render full page images
-    ref_image, test_image = await asyncio.gather(
-        asyncio.to_thread(_render_page_image, ref_path, page_num),
-        asyncio.to_thread(_render_page_image, test_path, page_num),
-    )
-
     results: list[SectionCheckResult] = []
 
+    def publish_partial(result: SectionCheckResult) -> None:
+        section_analysis_store.store(
+            job_id, pair_id, page_num,
+            SectionPageAnalysisResult(page_number=page_num, results=[*results, result], partial=True),
+        )
+
     # Analyze matched section pairs
     for ref_name, test_name in matched:
+        if identical:
+            results.append(_identical_result(ref_name))
+            continue
         ref_sec = ref_sections[ref_name]
         test_sec = test_sections[test_name]
 
-        ref_crop = _crop_section(ref_image, ref_sec.bbox)
-        test_crop = _crop_section(test_image, test_sec.bbox)
-
         try:
-            result = await analyze_section(ref_crop, test_crop, ref_name)
+            ref_crop, test_crop = await asyncio.gather(
+                run_cpu(_crop_section, ref_path, page_num, ref_sec.bbox),
+                run_cpu(_crop_section, test_path, page_num, test_sec.bbox),
+            )
+            result = await analyze_section(ref_crop, test_crop, ref_name, on_partial=publish_partial)
             results.append(result)
         except Exception as e:
             logger.error("section analysis error %s p%d %s: %s", pair_id, page_num, ref_name, e)
-            results.append(SectionCheckResult(
-                section_name=ref_name,
-                checks=[SectionCheck(
-                    check_name="Analysis error",
-                    status=CheckStatus.maybe,
-                    explanation=f"Analysis failed: {e}",
-                )],
-                matched_instructions=False,
-            ))
-
-    # Flag sections only on reference (missing from test)
-    for name in ref_only:
-        results.append(SectionCheckResult(
-            section_name=name,
-            checks=[SectionCheck(
-                check_name="Section presence",
-                status=CheckStatus.issue,
-                explanation="Section missing on test page",
-            )],
-            matched_instructions=False,
-        ))
+            results.append(_error_result(ref_name, e))
 
-    # Flag sections only on test (missing from reference)
-    for name in test_only:
-        results.append(SectionCheckResult(
-            section_name=name,
-            checks=[SectionCheck(
-                check_name="Section presence",
-                status=CheckStatus.issue,
-                explanation="Section missing on reference page",
-            )],
-            matched_instructions=False,
-        ))
+    results += _presence_results(ref_only, test_only)
 
     section_analysis_store.store(
         job_id, pair_id, page_num,
         SectionPageAnalysisResult(page_number=page_num, results=results),
     )
+    return identical and bool(matched)
 
 
-async def run_section_analysis(job_id: str) -> None:
+async def run_section_analysis(job_id: str, bypass_cache: bool = False) -> None:
     job = job_store.get_job(job_id)
     if not job:
         return
+    # Task-local: only this run's LLM calls skip the response cache
+    llm_cache.set_bypass(bypass_cache)
+    llm_telemetry.set_job(job_id)
 
     # Section detection must be done
     if job.analysis_status != AnalysisStatus.done:
@@ -162,7 +198,9 @@ async def run_section_analysis(job_id: str) -> None:
     job.section_analysis_status = AnalysisStatus.running
     job.section_analysis_total = len(work_items)
     job.section_analysis_progress = 0
+    job.section_analysis_skipped = 0
     job_store.persist_job(job)
+    identical = await page_identity.identical_pages(job)
 
     semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
     completed = 0
@@ -171,7 +209,10 @@ async def run_section_analysis(job_id: str) -> None:
         nonlocal completed
         async with semaphore:
             try:
-                await _analyze_page_sections(job_id, pair_id, ref_path, test_path, pg)
+                is_identical = pg in identical.get(pair_id, ())
+                job.section_analysis_skipped += await _analyze_page_sections(
+                    job_id, pair_id, ref_path, test_path, pg, identical=is_identical,
+                )
             except Exception as e:
                 logger.error("section analysis pipeline error job=%s pair=%s p%d: %s", job_id, pair_id, pg, e)
             finally:
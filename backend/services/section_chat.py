@@ -15,9 +15,11 @@ from typing import Any
 
 from rapidfuzz import fuzz
 
-from . import analysis_store
+from . import analysis_store, llm_telemetry
+from .cpu_pool import run_cpu
+from .image_policy import get_policy, image_content
 from .page_map import extract_page_map
-from .paired_sections import _get_client, _render_page_image
+from .paired_sections import _create_completion
 from .section_analysis import _crop_section
 
 logger = logging.getLogger(__name__)
@@ -76,7 +78,7 @@ def _to_data_url(image_bytes: bytes | None) -> str | None:
     if not image_bytes:
         return None
     b64 = base64.b64encode(image_bytes).decode("ascii")
-    return f"data:image/png;base64,{b64}"
+    return f"data:{get_policy('chat').mime_type};base64,{b64}"
 
 
 def _build_text_excerpt(elements: list[dict]) -> str:
@@ -99,22 +101,26 @@ async def _collect_section_context(
     ref_path = str(UPLOADS_DIR / job_id / "reference" / filename)
     test_path = str(UPLOADS_DIR / job_id / "test" / filename)
 
-    ref_analysis = analysis_store.get(job_id, pair_id, "reference", page)
-    test_analysis = analysis_store.get(job_id, pair_id, "test", page)
+    ref_analysis = analysis_store.get_final(job_id, pair_id, "reference", page)
+    test_analysis = analysis_store.get_final(job_id, pair_id, "test", page)
 
     ref_section = _find_section(ref_analysis, section_name)
     test_section = _find_section(test_analysis, section_name)
 
-    ref_image, test_image = await asyncio.gather(
-        asyncio.to_thread(_render_page_image, ref_path, page),
-        asyncio.to_thread(_render_page_image, test_path, page),
-    )
+    async def crop(pdf_path: str, section) -> bytes | None:
+        if not section:
+            return None
+        return await run_cpu(_crop_section, pdf_path, page, section.bbox, "chat")
 
-    ref_crop = _crop_section(ref_image, ref_section.bbox) if ref_section else None
-    test_crop = _crop_section(test_image, test_section.bbox) if test_section else None
+    ref_crop, test_crop = await asyncio.gather(
+        crop(ref_path, ref_section),
+        crop(test_path, test_section),
+    )
 
-    ref_map = await asyncio.to_thread(extract_page_map, ref_path, page)
-    test_map = await asyncio.to_thread(extract_page_map, test_path, page)
+    ref_map, test_map = await asyncio.gather(
+        run_cpu(extract_page_map, ref_path, page),
+        run_cpu(extract_page_map, test_path, page),
+    )
 
     ref_elements = _filter_elements(ref_map, ref_section)
     test_elements = _filter_elements(test_map, test_section)
@@ -141,12 +147,12 @@ def _build_user_content(
     if ref_crop:
         b64 = base64.b64encode(ref_crop).decode("ascii")
         content.append({"type": "text", "text": "=== OLD / REFERENCE IMAGE ==="})
-        content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}})
+        content.append(image_content("chat", b64))
 
     if test_crop:
         b64 = base64.b64encode(test_crop).decode("ascii")
         content.append({"type": "text", "text": "=== NEW / TEST IMAGE ==="})
-        content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}})
+        content.append(image_content("chat", b64))
 
     if ref_elements:
         content.append({
@@ -193,6 +199,7 @@ async def chat_with_section(
     message: str,
 ) -> str:
     """Send a grounded chat message about a section to GPT."""
+    llm_telemetry.set_job(job_id)
     context = await _collect_section_context(job_id, pair_id, filename, section_name, page)
 
     user_content = _build_user_content(
@@ -204,13 +211,13 @@ async def chat_with_section(
         message=message,
     )
 
-    client = _get_client()
-    resp = await client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
+    resp = await _create_completion("chat", dict(
         model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_content},
-        ],
+        messages=messages,
         max_tokens=MAX_TOKENS,
-    )
+    ))
     return resp.choices[0].message.content or ""
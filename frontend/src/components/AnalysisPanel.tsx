@@ -16,36 +16,42 @@ const STATUS_DOT: Record<CheckStatus, string> = {
   ok: 'bg-green-500',
   maybe: 'bg-yellow-400',
   issue: 'bg-red-500',
+  skipped: 'bg-slate-300',
 }
 
 const STATUS_BADGE: Record<CheckStatus, string> = {
   ok: 'bg-green-100 text-green-700',
   maybe: 'bg-yellow-100 text-yellow-700',
   issue: 'bg-red-100 text-red-700',
+  skipped: 'bg-slate-100 text-slate-500',
 }
 
 const STATUS_LABELS: Record<CheckStatus, string> = {
   ok: 'Pass',
   maybe: 'Unclear',
   issue: 'Fail',
+  skipped: 'Skipped',
 }
 
 const STATUS_PRIORITY: Record<CheckStatus, number> = {
   issue: 0,
   maybe: 1,
   ok: 2,
+  skipped: 3,
 }
 
 const CARD_INDICATOR: Record<CheckStatus, string> = {
   ok: 'bg-green-500',
   maybe: 'bg-yellow-400',
   issue: 'bg-red-500',
+  skipped: 'bg-slate-300',
 }
 
 const CARD_ACCENT: Record<CheckStatus, string> = {
   ok: 'border-l-2 border-l-green-400',
   maybe: 'border-l-2 border-l-yellow-400',
   issue: 'border-l-2 border-l-red-400',
+  skipped: 'border-l-2 border-l-slate-300',
 }
 
 const RECTANGLE_CLASS =
@@ -85,7 +91,8 @@ function sortChecksBySeverity<T extends AnyCheck>(checks: T[]): T[] {
 function getAggregateStatus(checks: AnyCheck[]): CheckStatus | null {
   if (checks.some((c) => c.status === 'issue')) return 'issue'
   if (checks.some((c) => c.status === 'maybe')) return 'maybe'
-  if (checks.length > 0) return 'ok'
+  if (checks.some((c) => c.status === 'ok')) return 'ok'
+  if (checks.length > 0) return 'skipped'
   return null
 }
 
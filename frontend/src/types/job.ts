@@ -26,6 +26,7 @@ export interface PdfPair {
   status: PairStatus
   page_count_reference: number
   page_count_test: number
+  identical_pages: number[] | null
 }
 
 export type AnalysisStatus = 'idle' | 'running' | 'done' | 'failed'
@@ -42,9 +43,10 @@ export interface PageAnalysis {
   page_width: number
   page_height: number
   sections: Section[]
+  partial?: boolean
 }
 
-export type CheckStatus = 'ok' | 'maybe' | 'issue'
+export type CheckStatus = 'ok' | 'maybe' | 'issue' | 'skipped'
 
 export interface GlobalCheckResult {
   check_name: string
@@ -72,6 +74,7 @@ export interface SectionCheckResult {
 export interface SectionPageAnalysisResult {
   page_number: number
   results: SectionCheckResult[]
+  partial?: boolean
 }
 
 export interface JobMetadata {
@@ -91,4 +94,12 @@ export interface JobMetadata {
   section_analysis_status: AnalysisStatus
   section_analysis_progress: number
   section_analysis_total: number
+  batch_status: AnalysisStatus
+  batch_ids: string[]
+  batch_error: string | null
+  identical_pages: number
+  analysis_mirrored: number
+  analysis_skipped: number
+  global_analysis_skipped: number
+  section_analysis_skipped: number
 }
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pdfplumber
+import pytest
+
+from backend.services.page_map import _extract_page_elements
+from backend.services.pdf_utils import file_hash
+
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "backend" / "uploads"
+
+
+@pytest.fixture(scope="session")
+def sample_pdfs() -> list[Path]:
+    """The PDFs under backend/uploads, one per distinct content."""
+    found: dict[str, Path] = {}
+    for path in sorted(UPLOADS_DIR.rglob("*.pdf")):
+        found.setdefault(file_hash(str(path)), path)
+    if not found:
+        pytest.skip("no sample PDFs under backend/uploads")
+    return list(found.values())
+
+
+@pytest.fixture(scope="session")
+def plumber_pages(sample_pdfs) -> list[tuple[Path, int, dict]]:
+    """(path, page_num, raw elements) of every sample page, extracted with pdfplumber."""
+    pages = []
+    for path in sample_pdfs:
+        with pdfplumber.open(str(path)) as pdf:
+            for page_num, page in enumerate(pdf.pages, start=1):
+                try:
+                    pages.append((path, page_num, _extract_page_elements(page)))
+                finally:
+                    page.close()
+    return pages
@@ -0,0 +1,247 @@
+"""
+Grid-indexed rect and proximity merging against the original loops.
+
+_recursive_rect_merge and _merge_nearby are run on PageElements and their
+output compared with the baseline dict-based implementations copied below,
+on randomized element sets and on every page of the sample uploads.
+"""
+
+import copy
+import random
+
+from backend.services.page_map import (
+    ELEMENT_TYPES,
+    MERGE_TOLERANCE,
+    PROXIMITY_GAP,
+    _ElementsBuilder,
+    _merge_nearby,
+    _recursive_rect_merge,
+)
+
+RANDOM_CASES = 1000
+
+
+# ---------------------------------------------------------------------------
+# Baseline: the merges before the spatial index
+# ---------------------------------------------------------------------------
+
+def _contains(outer, inner, tol=MERGE_TOLERANCE):
+    return (inner[0] >= outer[0] - tol and
+            inner[1] >= outer[1] - tol and
+            inner[2] <= outer[2] + tol and
+            inner[3] <= outer[3] + tol)
+
+
+def _touches(a, b, tol=MERGE_TOLERANCE):
+    return (a[0] <= b[2] + tol and b[0] <= a[2] + tol and
+            a[1] <= b[3] + tol and b[1] <= a[3] + tol)
+
+
+def _bbox_area(b):
+    return max(0, b[2] - b[0]) * max(0, b[3] - b[1])
+
+
+def _group_bbox(group):
+    x0 = min(e["bbox"][0] for e in group)
+    y0 = min(e["bbox"][1] for e in group)
+    x1 = max(e["bbox"][2] for e in group)
+    y1 = max(e["bbox"][3] for e in group)
+    return [x0, y0, x1, y1]
+
+
+def _baseline_rect_merge(elements, page_width, page_height, max_page_fraction=0.5):
+    page_area = page_width * page_height
+    elements = [
+        e for e in elements
+        if not (e["type"] == "rect" and _bbox_area(e["bbox"]) / page_area > max_page_fraction)
+    ]
+
+    rects = [e for e in elements if e["type"] == "rect"]
+    others = [e for e in elements if e["type"] != "rect"]
+
+    if not rects:
+        return elements
+
+    rects.sort(key=lambda e: _bbox_area(e["bbox"]), reverse=True)
+    rect_groups = [[r] for r in rects]
+    free = list(others)
+
+    changed = True
+    while changed:
+        changed = False
+
+        still_free = []
+        for el in free:
+            absorbed = False
+            for group in rect_groups:
+                if _contains(_group_bbox(group), el["bbox"]):
+                    group.append(el)
+                    absorbed = True
+                    changed = True
+                    break
+            if not absorbed:
+                still_free.append(el)
+        free = still_free
+
+        merged_flags = [False] * len(rect_groups)
+        for i in range(len(rect_groups)):
+            if merged_flags[i]:
+                continue
+            union_i = _group_bbox(rect_groups[i])
+            for j in range(i + 1, len(rect_groups)):
+                if merged_flags[j]:
+                    continue
+                union_j = _group_bbox(rect_groups[j])
+                if _contains(union_i, union_j):
+                    rect_groups[i].extend(rect_groups[j])
+                    merged_flags[j] = True
+                    changed = True
+                elif _contains(union_j, union_i):
+                    rect_groups[j].extend(rect_groups[i])
+                    merged_flags[i] = True
+                    changed = True
+                    break
+        rect_groups = [g for i, g in enumerate(rect_groups) if not merged_flags[i]]
+
+        merged_flags = [False] * len(rect_groups)
+        for i in range(len(rect_groups)):
+            if merged_flags[i]:
+                continue
+            union_i = _group_bbox(rect_groups[i])
+            for j in range(i + 1, len(rect_groups)):
+                if merged_flags[j]:
+                    continue
+                if _touches(union_i, _group_bbox(rect_groups[j])):
+                    rect_groups[i].extend(rect_groups[j])
+                    merged_flags[j] = True
+                    changed = True
+        rect_groups = [g for i, g in enumerate(rect_groups) if not merged_flags[i]]
+
+    result = []
+    for group in rect_groups:
+        texts = [e["content"] for e in group if e.get("content")]
+        result.append({
+            "type": "merged",
+            "bbox": _group_bbox(group),
+            "content": " | ".join(texts) if texts else None,
+            "child_count": len(group),
+        })
+    result.extend(free)
+    return result
+
+
+def _baseline_merge_nearby(elements, gap=PROXIMITY_GAP):
+    if len(elements) <= 1:
+        return elements
+
+    clusters = [
+        [[*e["bbox"]], {e["type"]}, [e.get("content", "") or ""], 1]
+        for e in elements
+    ]
+
+    changed = True
+    while changed:
+        changed = False
+        merged_flags = [False] * len(clusters)
+        new_clusters = []
+        for i in range(len(clusters)):
+            if merged_flags[i]:
+                continue
+            bbox_i, types_i, texts_i, count_i = clusters[i]
+            for j in range(i + 1, len(clusters)):
+                if merged_flags[j]:
+                    continue
+                bbox_j, types_j, texts_j, count_j = clusters[j]
+                if (bbox_i[0] <= bbox_j[2] + gap and bbox_j[0] <= bbox_i[2] + gap and
+                        bbox_i[1] <= bbox_j[3] + gap and bbox_j[1] <= bbox_i[3] + gap):
+                    bbox_i[0] = min(bbox_i[0], bbox_j[0])
+                    bbox_i[1] = min(bbox_i[1], bbox_j[1])
+                    bbox_i[2] = max(bbox_i[2], bbox_j[2])
+                    bbox_i[3] = max(bbox_i[3], bbox_j[3])
+                    types_i.update(types_j)
+                    texts_i.extend(texts_j)
+                    count_i += count_j
+                    clusters[i][3] = count_i
+                    merged_flags[j] = True
+                    changed = True
+            new_clusters.append([bbox_i, types_i, texts_i, count_i])
+        clusters = new_clusters
+
+    result = []
+    for bbox, types, texts, _ in clusters:
+        text_content = [t for t in texts if t]
+        has_text = "text" in types or "merged" in types
+        only_text = types <= {"text", "merged"}
+        if only_text and has_text:
+            btype = "text_block"
+        elif not has_text:
+            btype = "drawing_block"
+        else:
+            btype = "mixed_block"
+        result.append({
+            "type": btype,
+            "bbox": bbox,
+            "content": " ".join(text_content) if text_content else None,
+        })
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def _as_dicts(elements) -> list[dict]:
+    """PageElements rows in the unrounded dict schema of the baseline."""
+    result = []
+    for code, bbox, content, child_count in zip(
+        elements.types.tolist(), elements.bboxes.tolist(), elements.contents, elements.child_counts.tolist(),
+    ):
+        el = {"type": ELEMENT_TYPES[code], "bbox": bbox, "content": content}
+        if child_count:
+            el["child_count"] = child_count
+        result.append(el)
+    return result
+
+
+def _assert_same_merges(elements, width: float, height: float) -> None:
+    """Both merge stages, as _build_page_map runs them, match the baseline."""
+    rects = _recursive_rect_merge(elements, width, height)
+    assert _as_dicts(rects) == _baseline_rect_merge(copy.deepcopy(_as_dicts(elements)), width, height)
+
+    expected = _baseline_merge_nearby(copy.deepcopy(_as_dicts(rects)))
+    for i, e in enumerate(expected):
+        e["bbox"] = [round(v, 1) for v in e["bbox"]]
+        e["id"] = f"E{i+1}"
+    assert _merge_nearby(rects).to_dicts() == expected
+
+
+def _random_elements(rng: random.Random, width: float, height: float):
+    elements = _ElementsBuilder()
+    for _ in range(rng.randint(0, 120)):
+        kind = rng.choice(("text", "rect", "rect", "line", "curve", "image"))
+        x, y = rng.uniform(-20, width + 20), rng.uniform(-20, height + 20)
+        w = rng.choice((rng.uniform(0, 30), rng.uniform(0, 300), 0))
+        h = rng.choice((rng.uniform(0, 20), rng.uniform(0, 300), 0))
+        if rng.random() < 0.3:
+            # Snapped coordinates: exact touches, shared edges and nesting
+            x, y, w, h = (round(v / 10) * 10 for v in (x, y, w, h))
+        elements.add(kind, (x, y, x + w, y + h), f"w{rng.randint(0, 9)}" if kind == "text" else None)
+    return elements.build()
+
+
+def test_random_elements() -> None:
+    for seed in range(RANDOM_CASES):
+        rng = random.Random(seed)
+        width, height = rng.choice(((612, 792), (200, 200), (842, 595)))
+        try:
+            _assert_same_merges(_random_elements(rng, width, height), width, height)
+        except AssertionError as e:
+            raise AssertionError(f"seed {seed}") from e
+
+
+def test_sample_pages(plumber_pages) -> None:
+    for path, page_num, raw in plumber_pages:
+        try:
+            _assert_same_merges(raw["elements"], raw["width"], raw["height"])
+        except AssertionError as e:
+            raise AssertionError(f"{path} p{page_num}") from e
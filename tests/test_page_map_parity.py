@@ -0,0 +1,88 @@
+"""
+PyMuPDF page-map backend against the pdfplumber reference.
+
+Every sample page is extracted with both backends. Over all pages, text,
+curve and image counts must agree within MAX_COUNT_DIFF, and at least
+MIN_WORD_MATCH of the pdfplumber words must be found in the PyMuPDF output
+with the same text and x0/x1/bottom within WORD_TOLERANCE_PT. The top edge
+is not compared: PyMuPDF word boxes start at the font ascender, pdfminer's
+at the font size. Rect and line counts are not compared either (see the
+note at PAGE_MAP_BACKEND in services/page_map.py).
+
+Timings: python -m backend.page_map_benchmark.
+"""
+
+from collections import Counter
+
+import fitz
+import pytest
+
+from backend.services.page_map import ELEMENT_TYPES, TEXT, _extract_page_elements_fitz
+
+MAX_COUNT_DIFF = 0.02
+MIN_WORD_MATCH = 0.98
+WORD_TOLERANCE_PT = 1.0
+PAGE_SIZE_TOLERANCE_PT = 0.01
+
+
+@pytest.fixture(scope="module")
+def page_pairs(plumber_pages) -> list[tuple[str, dict, dict]]:
+    """(label, pdfplumber raw, pymupdf raw) per sample page."""
+    pairs = []
+    for path, page_num, plumber_raw in plumber_pages:
+        with fitz.open(str(path)) as doc:
+            pairs.append((f"{path} p{page_num}", plumber_raw, _extract_page_elements_fitz(doc[page_num - 1])))
+    return pairs
+
+
+def _counts(raw: dict) -> Counter:
+    return Counter(ELEMENT_TYPES[code] for code in raw["elements"].types.tolist())
+
+
+def _words(raw: dict) -> list[tuple[str, list[float]]]:
+    elements = raw["elements"]
+    return [
+        (content, bbox)
+        for code, bbox, content in zip(elements.types.tolist(), elements.bboxes.tolist(), elements.contents)
+        if code == TEXT
+    ]
+
+
+def _matched_words(reference: list, candidate: list) -> int:
+    by_text: dict[str, list[list[float]]] = {}
+    for content, bbox in candidate:
+        by_text.setdefault(content, []).append(bbox)
+    matched = 0
+    for content, bbox in reference:
+        boxes = by_text.get(content, [])
+        for i, other in enumerate(boxes):
+            if all(abs(bbox[k] - other[k]) <= WORD_TOLERANCE_PT for k in (0, 2, 3)):
+                matched += 1
+                del boxes[i]
+                break
+    return matched
+
+
+def test_page_sizes(page_pairs) -> None:
+    for label, plumber_raw, fitz_raw in page_pairs:
+        assert fitz_raw["width"] == pytest.approx(plumber_raw["width"], abs=PAGE_SIZE_TOLERANCE_PT), label
+        assert fitz_raw["height"] == pytest.approx(plumber_raw["height"], abs=PAGE_SIZE_TOLERANCE_PT), label
+
+
+@pytest.mark.parametrize("kind", ["text", "curve", "image"])
+def test_element_counts(page_pairs, kind: str) -> None:
+    reference = sum(_counts(plumber_raw)[kind] for _, plumber_raw, _ in page_pairs)
+    candidate = sum(_counts(fitz_raw)[kind] for _, _, fitz_raw in page_pairs)
+    assert abs(candidate - reference) <= MAX_COUNT_DIFF * reference, (
+        f"{kind}: pdfplumber {reference}, pymupdf {candidate}"
+    )
+
+
+def test_word_positions(page_pairs) -> None:
+    words = matched = 0
+    for _, plumber_raw, fitz_raw in page_pairs:
+        reference = _words(plumber_raw)
+        words += len(reference)
+        matched += _matched_words(reference, _words(fitz_raw))
+    assert words
+    assert matched >= MIN_WORD_MATCH * words, f"{matched}/{words} words matched"
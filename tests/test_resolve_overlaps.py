@@ -0,0 +1,98 @@
+"""
+_resolve_overlaps (union-find sweep) against the original all-pairs loop.
+
+Regions are generated at random, snapped to a coarse grid so that shared
+edges, nested boxes and chains of overlaps are common; empty and inverted
+regions are included. Every case must give the same sections, in the same
+order, as the baseline.
+"""
+
+import copy
+import random
+from typing import Any
+
+import pytest
+
+from backend.services.paired_sections import _overlap_groups, _rect_intersection_area, _resolve_overlaps
+
+CONTENT_TYPES = ("table", "chart", "text", "metadata", "mixed")
+SEEDS_PER_CASE = 500
+
+
+def _baseline_resolve_overlaps(sections: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """_resolve_overlaps before the sweep: restart an all-pairs scan after every merge."""
+    out = [dict(s) for s in sections]
+    changed = True
+    while changed:
+        changed = False
+        i = 0
+        while i < len(out):
+            j = i + 1
+            while j < len(out):
+                if _rect_intersection_area(out[i]["region"], out[j]["region"]) > 0:
+                    a, b = out[i]["region"], out[j]["region"]
+                    out[i]["region"] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    out[i]["name"] = out[i]["name"] + " + " + out[j]["name"]
+                    if out[i]["content_type"] == "metadata":
+                        out[i]["content_type"] = out[j]["content_type"]
+                    elif out[j]["content_type"] != "metadata" and out[i]["content_type"] != out[j]["content_type"]:
+                        out[i]["content_type"] = "mixed"
+                    if "element_ids" in out[i] and "element_ids" in out[j]:
+                        out[i]["element_ids"] = out[i]["element_ids"] + out[j]["element_ids"]
+                    out.pop(j)
+                    changed = True
+                else:
+                    j += 1
+            i += 1
+    return out
+
+
+def _random_sections(rng: random.Random, max_sections: int, grid: float, with_ids: bool) -> list[dict[str, Any]]:
+    sections = []
+    for k in range(rng.randint(0, max_sections)):
+        x = round(rng.uniform(0, 612) / grid) * grid
+        y = round(rng.uniform(0, 792) / grid) * grid
+        # Negative sizes give inverted regions, zero sizes empty ones
+        w = round(rng.uniform(-20, 300) / grid) * grid
+        h = round(rng.uniform(-20, 200) / grid) * grid
+        section = {"name": f"S{k}", "content_type": rng.choice(CONTENT_TYPES), "region": [x, y, x + w, y + h]}
+        if with_ids:
+            section["element_ids"] = [f"E{k}_{i}" for i in range(rng.randint(0, 3))]
+        sections.append(section)
+    return sections
+
+
+@pytest.mark.parametrize(
+    "max_sections,grid,with_ids",
+    [(6, 25.0, False), (15, 25.0, True), (40, 10.0, True), (80, 50.0, False), (30, 0.5, True)],
+)
+def test_matches_baseline(max_sections: int, grid: float, with_ids: bool) -> None:
+    for seed in range(SEEDS_PER_CASE):
+        rng = random.Random(seed)
+        sections = _random_sections(rng, max_sections, grid, with_ids)
+        expected = _baseline_resolve_overlaps(copy.deepcopy(sections))
+        assert _resolve_overlaps(copy.deepcopy(sections)) == expected, f"seed {seed}"
+
+
+def test_input_unchanged() -> None:
+    sections = _random_sections(random.Random(1), 20, 25.0, True)
+    before = copy.deepcopy(sections)
+    _resolve_overlaps(sections)
+    assert sections == before
+
+
+def test_groups_partition_and_do_not_overlap() -> None:
+    for seed in range(SEEDS_PER_CASE):
+        regions = [s["region"] for s in _random_sections(random.Random(seed), 40, 10.0, False)]
+        groups = _overlap_groups(regions)
+        assert sorted(i for group in groups for i in group) == list(range(len(regions)))
+        assert [group[0] for group in groups] == sorted(group[0] for group in groups)
+        unions = [
+            [min(regions[i][0] for i in g), min(regions[i][1] for i in g),
+             max(regions[i][2] for i in g), max(regions[i][3] for i in g)]
+            for g in groups
+            if any(regions[i][2] > regions[i][0] and regions[i][3] > regions[i][1] for i in g)
+        ]
+        for a in range(len(unions)):
+            for b in range(a + 1, len(unions)):
+                assert _rect_intersection_area(unions[a], unions[b]) == 0, f"seed {seed}"